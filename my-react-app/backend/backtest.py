@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Walk-Forward Backtest
+
+Evaluates the live models and the fallback predictor on every date of the
+training history, as if each date were the latest bar when the prediction was
+made, and reports the mean absolute error, the mean absolute percentage error
+and the directional accuracy per horizon.
+
+Everything is computed for all dates of a ticker at once:
+
+- Models are rolled forward over the horizon like forecast_engine.ForecastEngine,
+  but with one batched predict per step covering every forecast origin, and the
+  indicators of the predicted closes updated as array operations.
+- The fallback signals are computed by fallback_predictor.predict_fallback_arrays
+  over sliding 30-bar windows, one row per date. Its path covers 5 days, so it
+  is scored at horizons up to 5.
+- A naive forecast (the last close, unchanged) is scored as a baseline.
+
+The indicators are causal (rolling windows and ewm(adjust=False)), so a
+prediction made at a date only sees bars up to that date. The live models were
+trained on this same history, though: pass --start with the end of the
+training period to score them out of sample only.
+
+Tickers run in parallel worker processes:
+
+    python backtest.py                       # every ticker in ml/processed_stock_data
+    python backtest.py AAPL MSFT --horizons 1 5 --start 2024-01-01
+    python backtest.py --source market_data/history/processed --workers 1
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from indicators import add_technical_indicators
+from forecast_engine import model_feature_columns, model_output_width
+from fallback_predictor import predict_fallback_arrays, SIGNAL_COLUMNS, WINDOW
+from model_registry import load_model, LIVE_MODELS_DIR
+
+logger = logging.getLogger('backtest')
+
+PROCESSED_STOCK_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                        'ml', 'processed_stock_data')
+
+# Days ahead that are scored; the last is the API's default horizon
+HORIZONS = (1, 5, 10, 30)
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Closes kept per origin while rolling forward: the 20 returns of Volatility
+CLOSE_WINDOW = 21
+
+
+def load_history(ticker, source=PROCESSED_STOCK_DATA_DIR):
+    """
+    Load a ticker's daily bars from a directory of CSVs or a history store.
+
+    Args:
+        ticker: Stock ticker symbol
+        source: Directory of {TICKER}_processed.csv / {TICKER}.csv files, or
+            a history_store directory
+
+    Returns:
+        DataFrame of PRICE_COLUMNS indexed by date, oldest bar first
+    """
+    if os.path.exists(os.path.join(source, 'index.json')):
+        from history_store import HistoryStore
+        return HistoryStore(source).frame(ticker)[PRICE_COLUMNS]
+    for file_name in (f'{ticker}_processed.csv', f'{ticker}.csv'):
+        path = os.path.join(source, file_name)
+        if os.path.exists(path):
+            data = pd.read_csv(path, parse_dates=['Date'], index_col='Date', float_precision='round_trip')
+            return data[PRICE_COLUMNS].sort_index()
+    raise FileNotFoundError(f"No history for {ticker} in {source}")
+
+
+def source_tickers(source=PROCESSED_STOCK_DATA_DIR):
+    """Return the tickers available in a CSV directory or history store."""
+    if os.path.exists(os.path.join(source, 'index.json')):
+        from history_store import HistoryStore
+        return HistoryStore(source).tickers
+    return sorted(f[:-len('_processed.csv')] if f.endswith('_processed.csv') else f[:-4]
+                  for f in os.listdir(source) if f.endswith('.csv'))
+
+
+def _ewm(values, span):
+    return pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+class _RolloutState:
+    """
+    Features of many forecast origins, advanced one predicted close at a time.
+
+    Array counterpart of forecast_engine._SeriesState: each row is one origin,
+    the non-close price columns carry forward and the indicators are updated
+    from the last CLOSE_WINDOW closes and the EMA state.
+    """
+
+    def __init__(self, frame, origins):
+        close = frame['Close'].to_numpy(dtype=np.float64)
+        padded = np.concatenate([np.full(CLOSE_WINDOW - 1, np.nan), close])
+        self.closes = sliding_window_view(padded, CLOSE_WINDOW)[origins].copy()
+        self.ema12 = _ewm(close, 12)[origins]
+        self.ema26 = _ewm(close, 26)[origins]
+        self.signal = frame['Signal_Line'].to_numpy(dtype=np.float64)[origins]
+        self.values = {c: frame[c].to_numpy(dtype=np.float64)[origins] for c in frame.columns}
+
+    def advance(self, close):
+        """Record a predicted close for every origin."""
+        closes = np.concatenate([self.closes[:, 1:], close[:, None]], axis=1)
+        self.closes = closes
+        self.ema12 = self.ema12 + (close - self.ema12) * (2 / 13)
+        self.ema26 = self.ema26 + (close - self.ema26) * (2 / 27)
+        macd = self.ema12 - self.ema26
+        self.signal = self.signal + (macd - self.signal) * (2 / 10)
+        delta = np.diff(closes[:, -15:], axis=1)
+        returns = closes[:, 1:] / closes[:, :-1] - 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = np.maximum(delta, 0).mean(axis=1) / np.maximum(-delta, 0).mean(axis=1)
+            rsi = 100 - 100 / (1 + rs)
+        self.values.update({
+            'Close': close,
+            'MA5': closes[:, -5:].mean(axis=1),
+            'MA10': closes[:, -10:].mean(axis=1),
+            'MA20': closes[:, -20:].mean(axis=1),
+            'RSI': rsi,
+            'MACD': macd,
+            'Signal_Line': self.signal,
+            'Daily_Return': returns[:, -1],
+            'Volatility': returns[:, -20:].std(axis=1, ddof=1),
+            'Close_Std10': closes[:, -10:].std(axis=1, ddof=1),
+        })
+
+    def features(self, columns):
+        count = len(self.closes)
+        return np.column_stack([self.values.get(c, np.full(count, np.nan)) for c in columns])
+
+
+def model_forecasts(model, frame, origins, horizon):
+    """
+    Forecast `horizon` daily closes from every origin with one model.
+
+    Args:
+        model: Loaded estimator
+        frame: Prices with technical indicators and Close_Std10, oldest bar first
+        origins: Row positions in frame to forecast from
+        horizon: Number of days to forecast
+
+    Returns:
+        Array of shape (origins, horizon) with the predicted closes
+    """
+    columns = model_feature_columns(model, frame.columns)
+    input_shape = getattr(model, 'input_shape', None)
+    sequence_input = input_shape is not None and len(input_shape) == 3
+    predict_fn = getattr(model, 'predict_on_batch', None) or model.predict
+
+    def predict(features):
+        if sequence_input:
+            features = features.reshape(len(features), features.shape[1], 1)
+        return np.asarray(predict_fn(features), dtype=np.float64).reshape(len(features), -1)
+
+    state = _RolloutState(frame, origins)
+    if model_output_width(model) >= horizon:
+        return predict(state.features(columns))[:, :horizon]
+    forecasts = np.empty((len(origins), horizon))
+    for step in range(horizon):
+        forecasts[:, step] = predict(state.features(columns))[:, 0]
+        if step + 1 < horizon:
+            state.advance(forecasts[:, step])
+    return forecasts
+
+
+def fallback_forecasts(prepared):
+    """
+    Run the fallback predictor as of every row of a prepared frame.
+
+    Args:
+        prepared: Prices with technical indicators, NaN rows dropped, as
+            passed to run_fallback_prediction
+
+    Returns:
+        Array of shape (rows, 5) with the daily path of predicted closes
+    """
+    count = len(prepared)
+    arrays = {}
+    for column in SIGNAL_COLUMNS:
+        if column in prepared.columns:
+            padded = np.concatenate([np.full(WINDOW - 1, np.nan), prepared[column].to_numpy(dtype=np.float64)])
+            arrays[column] = sliding_window_view(padded, WINDOW)
+        else:
+            arrays[column] = np.full((count, WINDOW), np.nan)
+    lengths = np.minimum(np.arange(1, count + 1), WINDOW)
+    present = {column: np.full(count, column in prepared.columns) for column in SIGNAL_COLUMNS}
+    return predict_fallback_arrays(arrays, lengths, present)['rawPredictions']
+
+
+def score(forecasts, close, origins, horizons, direction=True):
+    """
+    Score forecasts against the closes that followed.
+
+    Args:
+        forecasts: Array of shape (origins, days), column h-1 being h days ahead
+        close: Every close of the ticker
+        origins: Row positions in close the forecasts were made at
+        horizons: Days ahead to score (those beyond the forecast are skipped)
+        direction: Whether to count directional hits
+
+    Returns:
+        Dictionary mapping horizon to sums: count, absError, pctError, hits
+    """
+    scores = {}
+    for h in horizons:
+        if h > forecasts.shape[1]:
+            continue
+        valid = origins + h < len(close)
+        predicted = forecasts[valid, h - 1]
+        actual = close[origins[valid] + h]
+        base = close[origins[valid]]
+        error = np.abs(predicted - actual)
+        scores[h] = {
+            'count': int(valid.sum()),
+            'absError': float(error.sum()),
+            'pctError': float((error / actual).sum() * 100),
+            'hits': int((np.sign(predicted - base) == np.sign(actual - base)).sum()) if direction else None,
+        }
+    return scores
+
+
+def backtest_ticker(ticker, source=PROCESSED_STOCK_DATA_DIR, models_dir=LIVE_MODELS_DIR, horizons=HORIZONS,
+                    start=None, end=None):
+    """
+    Backtest the model, the fallback and the naive forecast for one ticker.
+
+    This is a module-level function so it can run in a worker process.
+
+    Returns:
+        Dictionary with the ticker, the number of origins, the model backend
+        (None without a model) and per-predictor scores from score()
+    """
+    history = load_history(ticker, source)
+    frame = add_technical_indicators(history.copy())
+    frame['Close_Std10'] = frame['Close'].rolling(10).std()
+    valid = ~frame.drop(columns='Close_Std10').isna().any(axis=1).to_numpy()
+    dates = frame.index
+    in_range = valid.copy()
+    if start is not None:
+        in_range &= dates >= pd.Timestamp(start)
+    if end is not None:
+        in_range &= dates < pd.Timestamp(end)
+    origins = np.flatnonzero(in_range)
+    close = frame['Close'].to_numpy(dtype=np.float64)
+    result = {'ticker': ticker, 'origins': len(origins), 'backend': None, 'scores': {}}
+    if not len(origins):
+        return result
+
+    result['scores']['naive'] = score(np.repeat(close[origins, None], max(horizons), axis=1), close, origins,
+                                      horizons, direction=False)
+
+    # The fallback sees the frame with NaN rows dropped, as in update_predictions
+    prepared_rows = np.flatnonzero(valid)
+    fallback = fallback_forecasts(frame.drop(columns='Close_Std10').iloc[prepared_rows])
+    result['scores']['fallback'] = score(fallback[np.searchsorted(prepared_rows, origins)], close, origins, horizons)
+
+    try:
+        model, backend, _ = load_model(models_dir, ticker)
+    except FileNotFoundError:
+        logger.warning(f"No model for {ticker}, scoring the fallback only")
+        return result
+    result['backend'] = backend
+    result['scores']['model'] = score(model_forecasts(model, frame, origins, max(horizons)), close, origins, horizons)
+    return result
+
+
+def combine(results):
+    """Sum the per-ticker scores into one set of scores across tickers."""
+    combined = {}
+    for result in results:
+        for predictor, scores in result.get('scores', {}).items():
+            for h, sums in scores.items():
+                total = combined.setdefault(predictor, {}).setdefault(h, dict.fromkeys(sums, 0))
+                for key, value in sums.items():
+                    total[key] = None if value is None else total[key] + value
+    return combined
+
+
+def metrics(sums):
+    """Turn score sums into MAE, MAPE (%) and directional accuracy."""
+    count = sums['count']
+    return {
+        'count': count,
+        'mae': sums['absError'] / count if count else None,
+        'mape': sums['pctError'] / count if count else None,
+        'directionalAccuracy': sums['hits'] / count if count and sums['hits'] is not None else None,
+    }
+
+
+def run_backtest(tickers, source=PROCESSED_STOCK_DATA_DIR, models_dir=LIVE_MODELS_DIR, horizons=HORIZONS,
+                 start=None, end=None, workers=None):
+    """
+    Backtest several tickers in parallel.
+
+    Args:
+        tickers: Ticker symbols to backtest
+        source: CSV directory or history store to read bars from
+        models_dir: Directory of the live models
+        horizons: Days ahead to score
+        start: Optional first forecast date (inclusive)
+        end: Optional last forecast date (exclusive)
+        workers: Worker processes (default: one per CPU, 1 runs serially)
+
+    Returns:
+        List of per-ticker results; failed tickers have an 'error'
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(tickers), 1))
+    args = [(ticker, source, models_dir, tuple(horizons), start, end) for ticker in tickers]
+    outcomes = []
+    if workers == 1:
+        for a in args:
+            try:
+                outcomes.append(backtest_ticker(*a))
+            except Exception as e:
+                outcomes.append(e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(backtest_ticker, *a) for a in args]
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append(e)
+
+    results = []
+    for ticker, outcome in zip(tickers, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Backtest of {ticker} failed: {outcome}")
+            results.append({'ticker': ticker, 'error': str(outcome)})
+        else:
+            results.append(outcome)
+    return results
+
+
+def _format(value, spec):
+    return '-' if value is None else format(value, spec)
+
+
+def main():
+    """Backtest the live models and the fallback over the training history."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Walk-forward backtest of the live models and the fallback')
+    parser.add_argument('tickers', nargs='*', help='Tickers to backtest (default: every ticker in the source)')
+    parser.add_argument('--source', default=PROCESSED_STOCK_DATA_DIR, help='CSV directory or history store')
+    parser.add_argument('--models-dir', default=LIVE_MODELS_DIR, help='Directory of the live models')
+    parser.add_argument('--horizons', type=int, nargs='+', default=list(HORIZONS), help='Days ahead to score')
+    parser.add_argument('--start', help='First forecast date, YYYY-MM-DD')
+    parser.add_argument('--end', help='Forecast dates before this date, YYYY-MM-DD')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--per-ticker', action='store_true', help='Also report every ticker separately')
+    parser.add_argument('--json', help='Write the per-ticker and combined metrics to this file')
+    args = parser.parse_args()
+
+    tickers = [ticker.upper() for ticker in args.tickers] or source_tickers(args.source)
+    started = time.perf_counter()
+    results = run_backtest(tickers, args.source, args.models_dir, args.horizons, args.start, args.end, args.workers)
+    elapsed = time.perf_counter() - started
+
+    succeeded = [r for r in results if 'error' not in r]
+    groups = [('ALL', combine(succeeded))]
+    if args.per_ticker:
+        groups += [(r['ticker'], r['scores']) for r in succeeded]
+    report = {}
+    for name, scores in groups:
+        report[name] = {predictor: {h: metrics(sums) for h, sums in by_horizon.items()}
+                        for predictor, by_horizon in scores.items()}
+        for predictor, by_horizon in report[name].items():
+            for h, m in by_horizon.items():
+                logger.info(f"{name:<6} {predictor:<8} {h:>3}d  n={m['count']:<6} MAE={_format(m['mae'], '.3f'):<8} "
+                            f"MAPE={_format(m['mape'], '.2f')}%  direction={_format(m['directionalAccuracy'], '.3f')}")
+
+    origins = sum(r['origins'] for r in succeeded)
+    logger.info(f"Backtested {len(succeeded)}/{len(results)} tickers ({origins} forecast dates) in {elapsed:.2f}s")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'elapsedSeconds': elapsed, 'results': results, 'metrics': report}, f, indent=2)
+    sys.exit(1 if len(succeeded) < len(results) else 0)
+
+
+if __name__ == "__main__":
+    main()
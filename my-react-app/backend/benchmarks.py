@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Prediction Benchmarks
+
+Times the prediction hot paths offline and saves the results as JSON so runs
+can be compared across commits:
+
+    - prepare_prediction_data (API and update job) and the batched feature path
+    - run_fallback_prediction and the vectorized fallback
+    - run_prediction for each live model
+    - the /predict handler through FastAPI's test client, cold and cached
+    - model load time for each file in live_models/
+    - time from launching a fresh API process to its first successful /predict
+
+Price histories come from ml/raw_stock_data/*.csv; larger universes are
+synthetic tickers derived from those files. yfinance is replaced with stubs
+that refuse network access, so results do not depend on Yahoo.
+
+Usage:
+    python benchmarks.py                              # write benchmark_results/<commit>.json
+    python benchmarks.py --sizes 7 100 --repeat 3
+    python benchmarks.py --compare benchmark_results/<old>.json
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+import pandas as pd
+import yfinance as yf
+
+logger = logging.getLogger('benchmarks')
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(os.path.dirname(BACKEND_DIR), 'ml', 'raw_stock_data')
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmark_results')
+
+# Universe sizes used for the scaling curve
+DEFAULT_SIZES = [7, 100, 1000, 5000]
+
+# Bars of history per ticker, about what a 60-day fetch returns
+HISTORY_BARS = 42
+
+# Slowdown ratio reported as a regression by --compare
+REGRESSION_THRESHOLD = 1.2
+
+
+def _offline(*args, **kwargs):
+    raise RuntimeError("Network access is disabled while benchmarking")
+
+
+def _offline_info(ticker):
+    return {'shortName': ticker, 'marketCap': None, 'sector': None, 'industry': None}
+
+
+def stub_yfinance():
+    """Make any yfinance network call fail loudly."""
+    yf.download = _offline
+    yf.Ticker = _offline
+
+
+def load_fixtures(directory=FIXTURE_DIR):
+    """Load the raw stock CSVs into DataFrames indexed by date."""
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.csv'))):
+        data = pd.read_csv(path, parse_dates=['Date'], index_col='Date')
+        fixtures[os.path.splitext(os.path.basename(path))[0]] = data[['Open', 'High', 'Low', 'Close', 'Volume']]
+    return fixtures
+
+
+def synthetic_universe(fixtures, size, bars=HISTORY_BARS):
+    """
+    Build `size` ticker histories from the fixtures.
+
+    The first tickers are the fixtures themselves; the rest take different
+    windows of them with slightly scaled prices.
+
+    Returns:
+        Dictionary mapping ticker to a DataFrame of `bars` daily bars
+    """
+    names = list(fixtures)
+    universe = {}
+    for i in range(size):
+        source = fixtures[names[i % len(names)]]
+        end = len(source) - (i // len(names)) % (len(source) - bars)
+        window = source.iloc[end - bars:end].copy()
+        if i < len(names):
+            universe[names[i]] = window
+            continue
+        scale = 1 + (i % 97) * 1e-3
+        for column in ('Open', 'High', 'Low', 'Close'):
+            window[column] = window[column] * scale
+        universe[f'SYN{i:05d}'] = window
+    return universe
+
+
+def time_call(fn, repeat):
+    """
+    Time a call several times.
+
+    Returns:
+        Dictionary with min, median and mean seconds over the repetitions
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return {
+        'min': min(durations),
+        'median': statistics.median(durations),
+        'mean': statistics.fmean(durations),
+        'repeat': repeat,
+    }
+
+
+def _label(result):
+    return f"{result['name']}[{result['size']}]" if result['size'] else result['name']
+
+
+def record(results, name, stats, size=None, **extra):
+    """Append one benchmark result."""
+    entry = dict(name=name, size=size, **stats, **extra)
+    if size:
+        entry['perTicker'] = stats['median'] / size
+    results.append(entry)
+
+
+def log_results(results):
+    """Log the median and min time of each benchmark."""
+    for result in results:
+        logger.info(f"{_label(result):<50} median={result['median'] * 1000:10.2f} ms  min={result['min'] * 1000:10.2f} ms")
+
+
+def bench_features(results, universe, size, repeat):
+    import main
+    import update_predictions
+    tickers = list(universe)[:size]
+    record(results, 'main.prepare_prediction_data', time_call(
+        lambda: [main.prepare_prediction_data(t, universe[t]) for t in tickers], repeat), size)
+    record(results, 'update_predictions.prepare_prediction_data', time_call(
+        lambda: [update_predictions.prepare_prediction_data(t, universe[t]) for t in tickers], repeat), size)
+    record(results, 'main.prepare_batch_prediction_data', time_call(
+        lambda: main.prepare_batch_prediction_data({t: universe[t] for t in tickers}), repeat), size)
+
+
+def bench_fallback(results, prepared, size, repeat):
+    import update_predictions
+    from fallback_predictor import run_fallback_predictions
+    tickers = list(prepared)[:size]
+    record(results, 'update_predictions.run_fallback_prediction', time_call(
+        lambda: [update_predictions.run_fallback_prediction(t, prepared[t]) for t in tickers], repeat), size)
+    record(results, 'fallback_predictor.run_fallback_predictions', time_call(
+        lambda: run_fallback_predictions({t: prepared[t] for t in tickers}), repeat), size)
+
+
+def bench_run_prediction(results, prepared, model_tickers, repeat):
+    import update_predictions
+    for ticker in model_tickers:
+        outcome = {}
+
+        def run():
+            prediction = update_predictions.run_prediction(ticker, prepared[ticker])
+            outcome['method'] = prediction.get('method') if prediction else None
+
+        stats = time_call(run, repeat)
+        record(results, f'update_predictions.run_prediction.{ticker}', stats, method=outcome.get('method'))
+
+
+def bench_model_load(results):
+    from model_registry import ModelRegistry
+    registry = ModelRegistry()
+    registry.load_all()
+    stats = registry.stats()
+    for ticker, model_stats in sorted(stats['models'].items()):
+        seconds = model_stats['loadSeconds']
+        record(results, f'model_load.{ticker}', {'min': seconds, 'median': seconds, 'mean': seconds, 'repeat': 1},
+               memoryBytes=model_stats['memoryBytes'], fileBytes=model_stats['fileBytes'])
+    for ticker, error in sorted(stats['errors'].items()):
+        logger.warning(f"Could not load model for {ticker}: {error}")
+    return registry
+
+
+def bench_predict_endpoint(results, universe, registry, repeat):
+    import main
+    from fastapi.testclient import TestClient
+
+    main.model_registry = registry
+    # The registry is already loaded, so requests need not wait for the startup warm-up
+    main.models_ready.set()
+    main.fetch_stock_data = lambda ticker, days=60: universe.get(ticker)
+    client = TestClient(main.app)
+    for ticker in sorted(registry.stats()['models']):
+        status = {}
+
+        def cold():
+            main.response_cache.clear()
+            status['code'] = client.post('/predict', json={'stock_ticker': ticker}).status_code
+
+        record(results, f'/predict.cold.{ticker}', time_call(cold, repeat), status=status.get('code'))
+        record(results, f'/predict.cached.{ticker}', time_call(
+            lambda: client.post('/predict', json={'stock_ticker': ticker}), repeat))
+
+
+def bench_cold_start(results, repeat, ticker='AAPL'):
+    from startup import time_to_first_predict
+    for mode in ('eager', 'fast'):
+        durations = []
+        for _ in range(repeat):
+            timings = time_to_first_predict(ticker, {'STARTUP_MODE': mode, 'MARKET_DATA_PROVIDER': 'replay'})
+            if timings is None or timings['status'] != 200:
+                logger.warning(f"Cold start in {mode} mode did not produce a prediction: {timings}")
+                break
+            durations.append(timings['totalSeconds'])
+        if durations:
+            record(results, f'cold_start.first_predict.{mode}', {
+                'min': min(durations),
+                'median': statistics.median(durations),
+                'mean': statistics.fmean(durations),
+                'repeat': len(durations),
+            })
+
+
+def run_benchmarks(sizes, repeat, skip_models=False):
+    """
+    Run every benchmark.
+
+    Args:
+        sizes: Universe sizes for the per-ticker benchmarks
+        repeat: Repetitions per benchmark
+        skip_models: Skip the benchmarks that need TensorFlow and live models
+
+    Returns:
+        List of result dictionaries
+    """
+    stub_yfinance()
+    import main
+    import update_predictions
+    metadata_path = os.path.join(tempfile.mkdtemp(prefix='benchmarks-'), 'company_metadata.json')
+    for module in (main, update_predictions):
+        module.company_metadata.fetch = _offline_info
+        module.company_metadata.path = metadata_path
+
+    fixtures = load_fixtures()
+    universe = synthetic_universe(fixtures, max(sizes))
+    prepared = {ticker: main.prepare_prediction_data(ticker, data) for ticker, data in universe.items()}
+
+    results = []
+    # Per-ticker INFO logging would dominate the timings
+    logging.disable(logging.INFO)
+    try:
+        for size in sizes:
+            bench_features(results, universe, size, repeat)
+            bench_fallback(results, prepared, size, repeat)
+        if not skip_models:
+            registry = bench_model_load(results)
+            bench_run_prediction(results, prepared, list(fixtures), max(1, repeat // 2))
+            bench_predict_endpoint(results, universe, registry, repeat)
+            bench_cold_start(results, max(1, repeat // 2))
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+def git_commit():
+    """Return the short hash of HEAD, or 'unknown' outside a git checkout."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def compare(baseline_path, results, threshold=REGRESSION_THRESHOLD):
+    """
+    Log the median ratio of each benchmark against a previous run.
+
+    Returns:
+        Number of benchmarks slower than the threshold
+    """
+    with open(baseline_path) as f:
+        baseline = {(r['name'], r['size']): r for r in json.load(f)['results']}
+    regressions = 0
+    for result in results:
+        previous = baseline.get((result['name'], result['size']))
+        if previous is None or not previous['median']:
+            continue
+        ratio = result['median'] / previous['median']
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        logger.info(f"{_label(result):<50} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    """Run the benchmarks and save the results as JSON."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Benchmark the prediction hot paths offline')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Universe sizes to benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions per benchmark')
+    parser.add_argument('--skip-models', action='store_true', help='Skip benchmarks that load the live models')
+    parser.add_argument('--output', help='Results file (default: benchmark_results/<commit>.json)')
+    parser.add_argument('--compare', help='Previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='Slowdown ratio reported as a regression')
+    args = parser.parse_args()
+
+    results = run_benchmarks(sorted(args.sizes), args.repeat, args.skip_models)
+    log_results(results)
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'createdAt': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }, f, indent=2)
+    logger.info(f"Saved {len(results)} results to {output}")
+
+    if args.compare and compare(args.compare, results, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
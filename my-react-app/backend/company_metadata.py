@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Company Metadata Cache
+
+Keeps each ticker's yfinance `.info` fields (short name, market cap, sector,
+industry) on disk with a long TTL, so predictions never wait on the slow info
+endpoint. Lookups only read the cache; missing or stale tickers are refreshed
+in bulk, either in the background or up front by the batch job.
+
+Run this script directly to populate the cache for a list of tickers.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from market_data_provider import create_provider
+
+logger = logging.getLogger('company_metadata')
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'market_data', 'company_metadata.json')
+
+# Placeholder metadata from the replay provider is kept apart from the real cache
+REPLAY_PATH = os.path.join(os.path.dirname(__file__), 'market_data', 'replay_company_metadata.json')
+
+# Company details rarely change, so entries are kept for a week
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+
+class CompanyMetadataCache:
+    """Disk-backed per-ticker metadata with TTL and background refresh."""
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, fetch=None, max_workers=8, provider=None):
+        provider = provider or create_provider()
+        self.path = path or (REPLAY_PATH if provider.name == 'replay' else DEFAULT_PATH)
+        self.ttl = ttl
+        self.fetch = fetch or provider.info
+        self.max_workers = max_workers
+        self._entries = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _load(self):
+        # Called with the lock held; reads the file on first use only
+        if self._entries is not None:
+            return self._entries
+        self._entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable metadata cache {self.path}: {e}")
+        return self._entries
+
+    def _save(self):
+        # Called with the lock held; write to a temp file so readers never see a partial file
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, ticker, now=None):
+        """
+        Return the cached metadata for a ticker without fetching anything.
+
+        Args:
+            ticker: Stock ticker symbol
+            now: Optional UNIX time used for the staleness check
+
+        Returns:
+            Dictionary of INFO_FIELDS, or None if the ticker is missing or stale
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._load().get(ticker)
+        if entry is None or now - entry.get('fetchedAt', 0) > self.ttl:
+            return None
+        return entry
+
+    def stale(self, tickers, now=None):
+        """Return the tickers that are missing from the cache or past the TTL."""
+        return [ticker for ticker in tickers if self.get(ticker, now) is None]
+
+    def name(self, ticker):
+        """
+        Return the company's short name, or the ticker if it is not cached yet.
+
+        A miss schedules a background refresh instead of blocking the caller.
+        """
+        entry = self.get(ticker)
+        if entry is None:
+            self.refresh_async([ticker])
+            # Serve an expired entry's name rather than none at all
+            with self._lock:
+                entry = self._load().get(ticker)
+        return (entry or {}).get('shortName') or ticker
+
+    def market_cap(self, ticker):
+        """Return the cached market cap, or None if unknown."""
+        entry = self.get(ticker)
+        return entry.get('marketCap') if entry else None
+
+    def refresh(self, tickers, now=None):
+        """
+        Fetch metadata for the given tickers concurrently and persist it.
+
+        Tickers whose fetch fails keep any entry they already had.
+
+        Args:
+            tickers: Ticker symbols to fetch
+            now: Optional UNIX time stored as the fetch time
+
+        Returns:
+            Number of tickers refreshed
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return 0
+        now = time.time() if now is None else now
+
+        def fetch_one(ticker):
+            try:
+                return ticker, self.fetch(ticker)
+            except Exception as e:
+                logger.warning(f"Could not fetch company info for {ticker}: {e}")
+                return ticker, None
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tickers))) as executor:
+            results = list(executor.map(fetch_one, tickers))
+
+        refreshed = 0
+        with self._lock:
+            entries = self._load()
+            for ticker, info in results:
+                if info is not None:
+                    entries[ticker] = dict(info, fetchedAt=now)
+                    refreshed += 1
+            if refreshed:
+                self._save()
+        logger.info(f"Refreshed company metadata for {refreshed}/{len(tickers)} tickers")
+        return refreshed
+
+    def refresh_stale(self, tickers, now=None):
+        """Refresh only the tickers that are missing or stale."""
+        return self.refresh(self.stale(tickers, now), now)
+
+    def refresh_async(self, tickers):
+        """
+        Refresh missing or stale tickers on a background thread.
+
+        Tickers already queued are skipped, so repeated misses for the same
+        ticker trigger a single fetch.
+
+        Returns:
+            Future of the refresh, or None if there was nothing to do
+        """
+        stale = self.stale(tickers)
+        with self._lock:
+            queued = [t for t in dict.fromkeys(stale) if t not in self._pending]
+            if not queued:
+                return None
+            self._pending.update(queued)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='company-metadata')
+
+        def run():
+            try:
+                return self.refresh(queued)
+            finally:
+                with self._lock:
+                    self._pending.difference_update(queued)
+
+        return self._executor.submit(run)
+
+
+def main():
+    """Populate the metadata cache for the given tickers."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Populate the company metadata cache')
+    parser.add_argument('tickers', nargs='+', help='Ticker symbols to fetch')
+    parser.add_argument('--path', help='Metadata cache file (default: market_data/company_metadata.json)')
+    parser.add_argument('--force', action='store_true', help='Refetch tickers that are still fresh')
+    args = parser.parse_args()
+
+    cache = CompanyMetadataCache(path=args.path)
+    tickers = [ticker.upper() for ticker in args.tickers]
+    if args.force:
+        cache.refresh(tickers)
+    else:
+        cache.refresh_stale(tickers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Drift Monitor
+
+Checks whether the features the live models see have drifted away from the
+data they were trained on, without keeping or re-reading either history.
+
+For each ticker and feature a baseline is built once from the training data
+(ml/processed_stock_data) and saved next to the model as
+live_models/{TICKER}_drift.json: the mean and variance, and the decile edges
+with the share of training bars between them. The update job then feeds
+every new bar from prepare_prediction_data into running statistics kept in
+market_data/drift/{TICKER}.json: exponentially weighted counts over the
+same bins and an exponentially weighted mean and variance, each updated in
+O(1) per bar. Bars already seen are skipped, so the live state can also be
+rebuilt from the job's recent window when the file is missing.
+
+Drift is scored per feature with the population stability index (PSI) and a
+KS-style maximum distance between the binned distributions:
+
+    python drift_monitor.py build     # baselines for every model in live_models/
+    python drift_monitor.py report
+"""
+
+import os
+import sys
+import json
+import math
+import bisect
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from indicators import add_technical_indicators, FEATURE_COLUMNS
+
+logger = logging.getLogger('drift_monitor')
+
+LIVE_MODELS_DIR = os.path.join(os.path.dirname(__file__), 'live_models')
+DRIFT_STATE_DIR = os.path.join(os.path.dirname(__file__), 'market_data', 'drift')
+# Drift measured on replayed market data is kept apart from the live state
+REPLAY_DRIFT_STATE_DIR = os.path.join(os.path.dirname(__file__), 'market_data', 'replay_drift')
+BASELINE_SUFFIX = '_drift.json'
+
+# Features monitored, as produced by prepare_prediction_data
+DRIFT_FEATURES = ['Close', 'Volume'] + FEATURE_COLUMNS
+
+# Quantile bins of the training distribution
+BINS = 10
+
+# Half-life in bars of the live statistics, so they describe the recent regime
+HALF_LIFE = 20
+DECAY = 0.5 ** (1 / HALF_LIFE)
+
+# Conventional PSI thresholds: below 0.1 stable, above 0.25 a significant shift
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+
+# Live bars needed before a feature is scored
+MIN_BARS = 20
+
+# Floor for bin shares so empty bins do not make the PSI infinite
+EPSILON = 1e-4
+
+STATUS_ORDER = ['insufficient', 'ok', 'warning', 'drift']
+
+
+class RunningStats:
+    """Welford's running mean and variance."""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+
+class FeatureBaseline:
+    """Training distribution of one feature: running stats and quantile bins."""
+
+    def __init__(self, stats, edges, shares):
+        self.stats = stats
+        self.edges = edges
+        self.shares = shares
+
+    @classmethod
+    def build(cls, values):
+        """Summarize the training values of a feature in one pass."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        stats = RunningStats()
+        for value in values:
+            stats.update(float(value))
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, BINS + 1)[1:-1])).tolist()
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        return cls(stats, edges, (counts / max(len(values), 1)).tolist())
+
+    def to_dict(self):
+        return {'stats': self.stats.to_dict(), 'edges': self.edges, 'shares': self.shares}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(RunningStats(**data['stats']), data['edges'], data['shares'])
+
+
+class FeatureMonitor:
+    """Exponentially weighted live distribution of one feature over the baseline bins."""
+
+    def __init__(self, bins, counts=None, mean=math.nan, variance=0.0, bars=0):
+        self.counts = counts or [0.0] * bins
+        self.mean = mean
+        self.variance = variance
+        self.bars = bars
+
+    def update(self, value, edges):
+        """Add one bar; older bars fade with DECAY."""
+        self.counts = [count * DECAY for count in self.counts]
+        self.counts[bisect.bisect_right(edges, value)] += 1.0
+        if self.bars == 0:
+            self.mean = value
+        else:
+            alpha = 1 - DECAY
+            delta = value - self.mean
+            self.mean += alpha * delta
+            self.variance = (1 - alpha) * (self.variance + alpha * delta * delta)
+        self.bars += 1
+
+    def to_dict(self):
+        return {'counts': self.counts, 'mean': self.mean, 'variance': self.variance, 'bars': self.bars}
+
+
+def population_stability_index(expected, actual):
+    """PSI between two sets of bin shares."""
+    expected = np.maximum(np.asarray(expected, dtype=np.float64), EPSILON)
+    actual = np.maximum(np.asarray(actual, dtype=np.float64), EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_distance(expected, actual):
+    """Largest gap between the cumulative distributions of two sets of bin shares."""
+    return float(np.max(np.abs(np.cumsum(actual) - np.cumsum(expected))))
+
+
+def _status(psi):
+    if psi >= PSI_DRIFT:
+        return 'drift'
+    return 'warning' if psi >= PSI_WARNING else 'ok'
+
+
+class TickerDrift:
+    """Baseline and live statistics of every monitored feature of one ticker."""
+
+    def __init__(self, baselines, trained_until, monitors=None, last_date=None):
+        self.baselines = baselines
+        self.trained_until = trained_until
+        self.monitors = monitors or {feature: FeatureMonitor(len(b.shares)) for feature, b in baselines.items()}
+        self.last_date = last_date
+
+    @classmethod
+    def from_training(cls, frame):
+        """
+        Build the baselines from a ticker's training features.
+
+        Args:
+            frame: DataFrame with a Date column or index and DRIFT_FEATURES
+
+        Returns:
+            TickerDrift with empty live statistics
+        """
+        dates = pd.DatetimeIndex(frame['Date'] if 'Date' in frame.columns else frame.index)
+        baselines = {feature: FeatureBaseline.build(frame[feature]) for feature in DRIFT_FEATURES
+                     if feature in frame.columns}
+        return cls(baselines, dates.max().strftime('%Y-%m-%d'))
+
+    def observe(self, prepared):
+        """
+        Add the bars of a prepared frame that have not been seen yet.
+
+        Bars up to the end of the training data or the last observed bar are
+        skipped, so overlapping windows from consecutive runs count once.
+
+        Args:
+            prepared: DataFrame from prepare_prediction_data
+
+        Returns:
+            Number of bars added
+        """
+        dates = pd.DatetimeIndex(prepared['Date'] if 'Date' in prepared.columns else prepared.index)
+        seen = pd.Timestamp(max(self.trained_until, self.last_date or self.trained_until))
+        new = np.flatnonzero(np.asarray(dates > seen))
+        columns = {feature: prepared[feature].to_numpy(dtype=np.float64)
+                   for feature in self.monitors if feature in prepared.columns}
+        for row in new:
+            for feature, values in columns.items():
+                value = float(values[row])
+                if math.isfinite(value):
+                    self.monitors[feature].update(value, self.baselines[feature].edges)
+        if len(new):
+            self.last_date = dates[new[-1]].strftime('%Y-%m-%d')
+        return len(new)
+
+    def report(self):
+        """
+        Score every feature against its baseline.
+
+        Returns:
+            Dictionary with the overall status, the last observed date and
+            per-feature psi, ks, meanShift (live minus training mean, in
+            training standard deviations), bars and status
+        """
+        features = {}
+        for feature, monitor in self.monitors.items():
+            baseline = self.baselines[feature]
+            if monitor.bars < MIN_BARS:
+                features[feature] = {'bars': monitor.bars, 'status': 'insufficient'}
+                continue
+            total = sum(monitor.counts)
+            shares = [count / total for count in monitor.counts]
+            psi = population_stability_index(baseline.shares, shares)
+            std = math.sqrt(baseline.stats.variance) if baseline.stats.count > 1 else math.nan
+            features[feature] = {
+                'psi': psi,
+                'ks': ks_distance(baseline.shares, shares),
+                'meanShift': (monitor.mean - baseline.stats.mean) / std if std else math.nan,
+                'bars': monitor.bars,
+                'status': _status(psi),
+            }
+        status = max((f['status'] for f in features.values()), key=STATUS_ORDER.index, default='insufficient')
+        return {'status': status, 'lastDate': self.last_date, 'trainedUntil': self.trained_until,
+                'features': features}
+
+    def baseline_dict(self):
+        return {'trainedUntil': self.trained_until,
+                'features': {feature: b.to_dict() for feature, b in self.baselines.items()}}
+
+    def live_dict(self):
+        return {'lastDate': self.last_date,
+                'features': {feature: m.to_dict() for feature, m in self.monitors.items()}}
+
+    @classmethod
+    def from_dicts(cls, baseline, live=None):
+        """Restore a state from baseline_dict() and, if present, live_dict() output."""
+        baselines = {feature: FeatureBaseline.from_dict(data) for feature, data in baseline['features'].items()}
+        monitors = None
+        if live is not None:
+            monitors = {feature: FeatureMonitor(len(baselines[feature].shares), **live['features'][feature])
+                        for feature in baselines if feature in live['features']}
+            monitors.update({feature: FeatureMonitor(len(b.shares)) for feature, b in baselines.items()
+                             if feature not in monitors})
+        return cls(baselines, baseline['trainedUntil'], monitors, live.get('lastDate') if live else None)
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class DriftMonitor:
+    """Loads, updates and saves the drift state of each ticker."""
+
+    def __init__(self, models_dir=LIVE_MODELS_DIR, state_dir=None, provider=None):
+        replay = provider is not None and provider.name == 'replay'
+        self.models_dir = models_dir
+        self.state_dir = state_dir or (REPLAY_DRIFT_STATE_DIR if replay else DRIFT_STATE_DIR)
+
+    def baseline_path(self, ticker):
+        return os.path.join(self.models_dir, f'{ticker}{BASELINE_SUFFIX}')
+
+    def state_path(self, ticker):
+        return os.path.join(self.state_dir, f'{ticker}.json')
+
+    def tickers(self):
+        """Return the tickers that have a baseline."""
+        if not os.path.isdir(self.models_dir):
+            return []
+        return sorted(f[:-len(BASELINE_SUFFIX)] for f in os.listdir(self.models_dir) if f.endswith(BASELINE_SUFFIX))
+
+    def build_baseline(self, ticker, training):
+        """
+        Build and save a ticker's baseline from its training features, resetting its live state.
+
+        Args:
+            ticker: Stock ticker symbol
+            training: DataFrame of training bars with DRIFT_FEATURES
+        """
+        drift = TickerDrift.from_training(training)
+        _write_json(self.baseline_path(ticker), drift.baseline_dict())
+        if os.path.exists(self.state_path(ticker)):
+            os.remove(self.state_path(ticker))
+        return drift
+
+    def load(self, ticker):
+        """Return the ticker's TickerDrift, or None if it has no baseline."""
+        path = self.baseline_path(ticker)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            baseline = json.load(f)
+        live = None
+        if os.path.exists(self.state_path(ticker)):
+            try:
+                with open(self.state_path(ticker)) as f:
+                    live = json.load(f)
+            except ValueError as e:
+                logger.warning(f"Discarding unreadable drift state for {ticker}: {e}")
+        return TickerDrift.from_dicts(baseline, live)
+
+    def observe(self, ticker, prepared):
+        """
+        Add a ticker's new bars to its live statistics and report drift.
+
+        Args:
+            ticker: Stock ticker symbol
+            prepared: DataFrame from prepare_prediction_data
+
+        Returns:
+            The report from TickerDrift.report(), or None if the ticker has no baseline
+        """
+        drift = self.load(ticker)
+        if drift is None:
+            return None
+        if drift.observe(prepared):
+            _write_json(self.state_path(ticker), drift.live_dict())
+        report = drift.report()
+        drifted = [feature for feature, f in report['features'].items() if f['status'] == 'drift']
+        if drifted:
+            logger.warning(f"Feature drift for {ticker} since {report['trainedUntil']}: {', '.join(drifted)}")
+        return report
+
+
+def training_features(ticker, source=None):
+    """Return a ticker's training bars with the indicators prepare_prediction_data adds."""
+    from backtest import load_history, PROCESSED_STOCK_DATA_DIR
+    history = load_history(ticker, source or PROCESSED_STOCK_DATA_DIR)
+    return add_technical_indicators(history.copy()).dropna()
+
+
+def main():
+    """Build drift baselines or report the drift of every monitored ticker."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Feature drift against the training data')
+    parser.add_argument('command', choices=['build', 'report'])
+    parser.add_argument('tickers', nargs='*', help='Tickers (default: every model, or every baseline)')
+    parser.add_argument('--models-dir', default=LIVE_MODELS_DIR, help='Directory of the live models and baselines')
+    parser.add_argument('--state-dir', help='Directory of the live drift state')
+    parser.add_argument('--source', help='Training data: CSV directory or history store')
+    args = parser.parse_args()
+
+    monitor = DriftMonitor(args.models_dir, args.state_dir)
+    tickers = [ticker.upper() for ticker in args.tickers]
+    if args.command == 'build':
+        tickers = tickers or sorted({f.split('_model.')[0] for f in os.listdir(args.models_dir) if '_model.' in f})
+        for ticker in tickers:
+            try:
+                drift = monitor.build_baseline(ticker, training_features(ticker, args.source))
+            except Exception as e:
+                logger.error(f"Could not build the drift baseline for {ticker}: {e}")
+                continue
+            logger.info(f"{ticker}: baseline of {len(drift.baselines)} features up to {drift.trained_until} "
+                        f"({os.path.getsize(monitor.baseline_path(ticker))} bytes)")
+        return
+
+    for ticker in tickers or monitor.tickers():
+        drift = monitor.load(ticker)
+        if drift is None:
+            logger.warning(f"{ticker}: no baseline")
+            continue
+        report = drift.report()
+        logger.info(f"{ticker:<6} {report['status']:<12} last bar {report['lastDate']}")
+        for feature, f in report['features'].items():
+            if 'psi' in f:
+                logger.info(f"    {feature:<13} psi={f['psi']:.3f} ks={f['ks']:.3f} "
+                            f"meanShift={f['meanShift']:+.2f} bars={f['bars']} {f['status']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Vectorized Fallback Predictor
+
+Array implementation of update_predictions.run_fallback_prediction. The MA,
+RSI, MACD, Bollinger, trend and volume signals, their weights, the weighted
+prediction and the confidence are computed for every ticker at once from the
+latest feature rows, giving the same per-ticker numbers as the scalar function.
+
+Run this script directly to benchmark it on synthetic tickers, or with
+--check-parity to compare it with run_fallback_prediction on random frames.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('fallback_predictor')
+
+# Rows of history the fallback looks at (data.tail(30))
+WINDOW = 30
+
+# Columns read by the signals; the optional ones are skipped when absent
+SIGNAL_COLUMNS = ['Close', 'MA50', 'RSI', 'MACD', 'Signal_Line', 'BB_Position_20',
+                  'Daily_Return', 'Volume', 'Volume_MA20']
+
+# Signal order and weights, as applied by run_fallback_prediction
+SIGNAL_WEIGHTS = [
+    ('ma', 0.2),
+    ('rsi', 0.15),
+    ('macd', 0.15),
+    ('bollinger', 0.15),
+    ('trend', 0.2),
+    ('volume', 0.15),
+]
+
+
+def stack_latest_features(frames, window=WINDOW):
+    """
+    Stack the last `window` rows of each ticker's features into 2-D arrays.
+
+    Rows are right-aligned so column -1 is the latest bar; shorter histories
+    are padded with NaN on the left.
+
+    Args:
+        frames: List of prepared feature DataFrames, one per ticker
+        window: Number of trailing rows to keep
+
+    Returns:
+        Tuple of (dict column -> float array of shape (tickers, window),
+        int array of rows available per ticker, dict column -> bool array
+        telling which tickers have that column)
+    """
+    count = len(frames)
+    arrays = {column: np.full((count, window), np.nan) for column in SIGNAL_COLUMNS}
+    present = {column: np.zeros(count, dtype=bool) for column in SIGNAL_COLUMNS}
+    lengths = np.zeros(count, dtype=np.int64)
+    for row, frame in enumerate(frames):
+        recent = frame.tail(window)
+        lengths[row] = len(recent)
+        if not len(recent):
+            continue
+        for column in SIGNAL_COLUMNS:
+            if column in recent.columns:
+                arrays[column][row, window - len(recent):] = recent[column].to_numpy(dtype=np.float64)
+                present[column][row] = True
+    return arrays, lengths, present
+
+
+def predict_fallback_arrays(arrays, lengths, present):
+    """
+    Compute the fallback prediction for every ticker with array operations.
+
+    Args:
+        arrays, lengths, present: Output of stack_latest_features
+
+    Returns:
+        Dictionary of per-ticker arrays: currentPrice, predictedPrice, change,
+        confidence, signals, rawPredictions (tickers x 5), method (0 enhanced,
+        1 simple fallback, -1 no data)
+    """
+    close = arrays['Close']
+    current_price = close[:, -1]
+    count = len(current_price)
+    with np.errstate(all='ignore'):
+        predictions = np.full((count, len(SIGNAL_WEIGHTS)), np.nan)
+        masks = np.zeros((count, len(SIGNAL_WEIGHTS)), dtype=bool)
+        simple = np.zeros(count, dtype=bool)
+
+        # 1. Moving average trend
+        ma50 = arrays['MA50'][:, -1]
+        mask = ~np.isnan(ma50)
+        ma_trend = np.where(current_price > ma50, 1.0, -1.0)
+        ma_distance = np.abs(current_price - ma50) / current_price
+        predictions[:, 0] = current_price * (1 + 0.01 * ma_trend * np.minimum(ma_distance * 100, 2.0))
+        masks[:, 0] = mask
+
+        # 2. RSI
+        rsi = arrays['RSI'][:, -1]
+        rsi_change = np.select(
+            [rsi > 70, rsi < 30],
+            [-0.01 * ((rsi - 70) / 30), 0.01 * ((30 - rsi) / 30)],
+            0.0,
+        )
+        predictions[:, 1] = current_price * (1 + rsi_change)
+        masks[:, 1] = ~np.isnan(rsi)
+
+        # 3. MACD crossovers (needs the previous bar as well)
+        macd, signal = arrays['MACD'][:, -1], arrays['Signal_Line'][:, -1]
+        prev_macd, prev_signal = arrays['MACD'][:, -2], arrays['Signal_Line'][:, -2]
+        mask = ~np.isnan(macd) & ~np.isnan(signal)
+        simple |= mask & (lengths < 2)
+        macd_change = np.select(
+            [(macd > signal) & (prev_macd <= prev_signal),
+             (macd < signal) & (prev_macd >= prev_signal),
+             macd > signal],
+            [0.015, -0.015, 0.005],
+            -0.005,
+        )
+        predictions[:, 2] = current_price * (1 + macd_change)
+        masks[:, 2] = mask
+
+        # 4. Bollinger band position
+        bb_pos = arrays['BB_Position_20'][:, -1]
+        bb_change = np.select(
+            [bb_pos < 0.2, bb_pos > 0.8],
+            [0.01 * (0.2 - bb_pos) / 0.2, -0.01 * (bb_pos - 0.8) / 0.2],
+            0.0,
+        )
+        predictions[:, 3] = current_price * (1 + bb_change)
+        masks[:, 3] = ~np.isnan(bb_pos)
+
+        # 5. Historical trend: mean daily return of the last 10 bars projected 5 days
+        mask = lengths >= 10
+        simple |= mask & ~present['Daily_Return']
+        last_returns = np.ascontiguousarray(arrays['Daily_Return'][:, -10:])
+        valid_returns = ~np.isnan(last_returns)
+        daily_changes = np.where(valid_returns, last_returns, 0.0).sum(axis=1) / valid_returns.sum(axis=1)
+        predictions[:, 4] = current_price * (1 + daily_changes * 5)
+        masks[:, 4] = mask
+
+        # 6. Volume: high volume amplifies the recent 5-day trend
+        volume, volume_ma = arrays['Volume'][:, -1], arrays['Volume_MA20'][:, -1]
+        mask = ~np.isnan(volume) & ~np.isnan(volume_ma)
+        vol_ratio = volume / volume_ma
+        high_volume = vol_ratio > 1.5
+        simple |= mask & high_volume & (lengths < 5)
+        recent_trend = close[:, -1] / close[:, -5] - 1
+        vol_change = np.where(high_volume, recent_trend * 0.5, 0.0)
+        predictions[:, 5] = current_price * (1 + vol_change)
+        masks[:, 5] = mask
+
+        # Weighted average, accumulated in signal order like the scalar sum()
+        weighted_sum = np.zeros(count)
+        total_weight = np.zeros(count)
+        for index, (_, weight) in enumerate(SIGNAL_WEIGHTS):
+            weighted_sum = weighted_sum + np.where(masks[:, index], predictions[:, index] * weight, 0.0)
+            total_weight = total_weight + np.where(masks[:, index], weight, 0.0)
+        signals = masks.sum(axis=1)
+        predicted_price = np.where(
+            signals > 0,
+            weighted_sum / total_weight,
+            current_price * (1 + 0.001 * 5),
+        )
+
+        # Daily path: fixed fractions with 3+ signals, linear steps otherwise
+        steps = np.arange(1, 6)
+        fractions = np.array([0.2, 0.4, 0.6, 0.8])
+        spread = (predicted_price - current_price)[:, None]
+        weighted_path = np.column_stack([current_price[:, None] + spread * fractions, predicted_price])
+        linear_path = current_price[:, None] + (spread / 5) * steps
+        raw_predictions = np.where((signals >= 3)[:, None], weighted_path, linear_path)
+
+        change = ((predicted_price - current_price) / current_price) * 100
+
+        # Confidence from the spread of the signal predictions, per mask pattern
+        std_dev = np.full(count, np.nan)
+        for pattern in np.unique(masks[signals >= 3], axis=0):
+            rows = np.flatnonzero((masks == pattern).all(axis=1))
+            std_dev[rows] = np.std(np.ascontiguousarray(predictions[np.ix_(rows, np.flatnonzero(pattern))]), axis=1)
+        confidence_factor = 1 - np.minimum(std_dev / current_price / 0.05, 0.5)
+        confidence = np.where(signals >= 3, 0.5 + confidence_factor * 0.3, 0.5)
+
+        # Tickers where the scalar version raises fall back to a 0.1% daily rise
+        simple_prices = current_price * (1 + 0.001 * 5)
+        predicted_price = np.where(simple, simple_prices, predicted_price)
+        change = np.where(simple, 0.5, change)
+        confidence = np.where(simple, 0.3, confidence)
+        raw_predictions = np.where(simple[:, None], current_price[:, None] * (1 + 0.001 * steps), raw_predictions)
+
+    method = np.where(simple, 1, 0)
+    method = np.where((lengths == 0) | np.isnan(current_price) | ~present['Close'], -1, method)
+    return {
+        'currentPrice': current_price,
+        'predictedPrice': predicted_price,
+        'change': change,
+        'confidence': confidence,
+        'signals': signals,
+        'rawPredictions': raw_predictions,
+        'method': method,
+    }
+
+
+def run_fallback_predictions(prepared_by_ticker, names=None):
+    """
+    Vectorized counterpart of run_fallback_prediction for many tickers.
+
+    Args:
+        prepared_by_ticker: Dictionary mapping ticker to prepared features
+        names: Optional dictionary mapping ticker to company name
+
+    Returns:
+        Dictionary mapping ticker to the prediction dictionary, or None when the
+        ticker has no data
+    """
+    tickers = list(prepared_by_ticker)
+    arrays, lengths, present = stack_latest_features([prepared_by_ticker[t] for t in tickers])
+    result = predict_fallback_arrays(arrays, lengths, present)
+    names = names or {}
+    now = datetime.now()
+
+    predictions = {}
+    for row, ticker in enumerate(tickers):
+        method = result['method'][row]
+        if method < 0:
+            predictions[ticker] = None
+            continue
+        prediction = {
+            'ticker': ticker,
+            'name': names.get(ticker, ticker) if method == 0 else ticker,
+            'currentPrice': float(result['currentPrice'][row]),
+            'predictedPrice': float(result['predictedPrice'][row]),
+            'change': float(result['change'][row]),
+            'confidence': float(result['confidence'][row]),
+            'rawPredictions': [float(p) for p in result['rawPredictions'][row]],
+            'lastUpdated': now,
+            'method': 'enhanced_fallback' if method == 0 else 'simple_fallback',
+        }
+        if method == 0:
+            prediction['signals'] = int(result['signals'][row])
+        predictions[ticker] = prediction
+    return predictions
+
+
+def synthetic_features(count, rows=WINDOW, seed=0):
+    """Build random prepared-feature arrays for `count` tickers."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (count, rows)), axis=1))
+    macd = rng.normal(0, 1, (count, rows))
+    arrays = {
+        'Close': close,
+        'MA50': close * rng.uniform(0.9, 1.1, (count, rows)),
+        'RSI': rng.uniform(0, 100, (count, rows)),
+        'MACD': macd,
+        'Signal_Line': macd + rng.normal(0, 0.5, (count, rows)),
+        'BB_Position_20': rng.uniform(-0.2, 1.2, (count, rows)),
+        'Daily_Return': rng.normal(0, 0.02, (count, rows)),
+        'Volume': rng.uniform(1e6, 5e6, (count, rows)),
+        'Volume_MA20': rng.uniform(1e6, 3e6, (count, rows)),
+    }
+    present = {column: np.ones(count, dtype=bool) for column in SIGNAL_COLUMNS}
+    return arrays, np.full(count, rows, dtype=np.int64), present
+
+
+def synthetic_frames(count, seed=0):
+    """
+    Build random prepared-feature DataFrames that exercise every fallback branch.
+
+    Frames have between 1 and WINDOW rows, optional columns are sometimes
+    missing and latest values are sometimes NaN.
+    """
+    rng = np.random.default_rng(seed)
+    arrays, _, _ = synthetic_features(count, seed=seed)
+    frames = []
+    for row in range(count):
+        rows = int(rng.integers(1, WINDOW + 1))
+        frame = pd.DataFrame({column: arrays[column][row, -rows:] for column in SIGNAL_COLUMNS})
+        for column in SIGNAL_COLUMNS[1:]:
+            if rng.random() < 0.1:
+                frame = frame.drop(columns=column)
+            elif rng.random() < 0.1:
+                frame.loc[frame.index[-1], column] = np.nan
+        frames.append(frame)
+    return frames
+
+
+def check_parity(frames, rtol=1e-9):
+    """
+    Compare predict_fallback_arrays with update_predictions.run_fallback_prediction.
+
+    Args:
+        frames: List of prepared feature DataFrames
+        rtol: Relative tolerance for the price, change and confidence fields
+
+    Returns:
+        Dictionary mapping each compared field to its number of mismatching frames
+    """
+    from update_predictions import run_fallback_prediction
+
+    arrays, lengths, present = stack_latest_features(frames)
+    result = predict_fallback_arrays(arrays, lengths, present)
+    methods = {0: 'enhanced_fallback', 1: 'simple_fallback', -1: None}
+    fields = ['currentPrice', 'predictedPrice', 'change', 'confidence', 'rawPredictions']
+    mismatches = dict.fromkeys(['method', 'signals'] + fields, 0)
+    for row, frame in enumerate(frames):
+        expected = run_fallback_prediction(f'PARITY{row}', frame)
+        method = methods[int(result['method'][row])]
+        if (expected or {}).get('method') != method:
+            mismatches['method'] += 1
+            continue
+        if expected is None:
+            continue
+        if method == 'enhanced_fallback' and expected['signals'] != int(result['signals'][row]):
+            mismatches['signals'] += 1
+        for field in fields:
+            a = np.asarray(result[field][row], dtype=np.float64)
+            b = np.asarray(expected[field], dtype=np.float64)
+            if not np.allclose(a, b, rtol=rtol, atol=0, equal_nan=True):
+                mismatches[field] += 1
+    return mismatches
+
+
+def main():
+    """Time the vectorized fallback on synthetic tickers, or check its parity."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Benchmark the vectorized fallback predictor')
+    parser.add_argument('--tickers', type=int, default=10000, help='Number of synthetic tickers')
+    parser.add_argument('--check-parity', type=int, metavar='FRAMES',
+                        help='Compare with run_fallback_prediction on this many random frames instead')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+    args = parser.parse_args()
+
+    if args.check_parity:
+        # Company names are not compared, so never look them up on Yahoo
+        os.environ.setdefault('MARKET_DATA_PROVIDER', 'replay')
+        # The scalar path logs an error for every frame that takes the simple fallback
+        for name in ('prediction_updater', 'company_metadata'):
+            logging.getLogger(name).setLevel(logging.CRITICAL)
+        mismatches = check_parity(synthetic_frames(args.check_parity, args.seed))
+        bad = {field: count for field, count in mismatches.items() if count}
+        if bad:
+            logger.error(f"Mismatching frames {bad}")
+        else:
+            logger.info(f"All {args.check_parity} frames match run_fallback_prediction")
+        sys.exit(1 if bad else 0)
+
+    arrays, lengths, present = synthetic_features(args.tickers, seed=args.seed)
+    start = time.perf_counter()
+    predict_fallback_arrays(arrays, lengths, present)
+    logger.info(f"Predicted {args.tickers} tickers in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Feature Snapshots
+
+Optional on-disk copies of the prepared prediction features, kept only for
+debugging and auditing. Features are passed between pipeline stages in memory;
+snapshots are written in a typed binary format so they load back with their
+original dtypes.
+
+Set PREDICTION_FEATURES_FORMAT to 'npy' or 'parquet' to enable snapshots by
+default. Parquet requires pyarrow; 'npy' only needs NumPy.
+"""
+
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('feature_snapshots')
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'predicting_data')
+SNAPSHOT_FORMATS = ('npy', 'parquet')
+
+# Format used when a caller does not choose one (None disables snapshots)
+DEFAULT_FORMAT = os.environ.get('PREDICTION_FEATURES_FORMAT') or None
+
+
+def save_features(ticker, features, fmt=DEFAULT_FORMAT, directory=SNAPSHOT_DIR):
+    """
+    Write a snapshot of a ticker's prepared features.
+
+    Args:
+        ticker: Stock ticker symbol
+        features: Prepared features DataFrame
+        fmt: 'npy', 'parquet' or None to skip writing
+        directory: Output directory
+
+    Returns:
+        Path of the snapshot, or None if nothing was written
+    """
+    if not fmt:
+        return None
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Unsupported snapshot format {fmt!r}, expected one of {', '.join(SNAPSHOT_FORMATS)}")
+
+    os.makedirs(directory, exist_ok=True)
+    output_path = os.path.join(directory, f'{ticker}.{fmt}')
+    if fmt == 'parquet':
+        features.to_parquet(output_path, index=False)
+    else:
+        np.save(output_path, features.to_records(index=False), allow_pickle=True)
+    logger.info(f"Saved feature snapshot for {ticker} to {output_path}")
+    return output_path
+
+
+def load_features(path):
+    """Load a snapshot written by save_features back into a DataFrame."""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.DataFrame.from_records(np.load(path, allow_pickle=True))
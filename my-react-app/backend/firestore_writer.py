@@ -0,0 +1,152 @@
+"""
+Batched Firestore Writer
+
+Buffers prediction documents and commits them to Firestore in chunked batch
+writes with retries, instead of one set() round trip per ticker.
+
+The writer only needs a client exposing collection().document() and batch(),
+so it works with firestore.client(), a client pointed at the Firestore
+emulator (set FIRESTORE_EMULATOR_HOST), or the InMemoryFirestore stand-in.
+"""
+
+import time
+import copy
+import logging
+import threading
+
+logger = logging.getLogger('firestore_writer')
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_SIZE = 500
+
+
+class BatchPredictionWriter:
+    """Collects documents for one collection and commits them in chunks."""
+
+    def __init__(self, db, collection='predictions', batch_size=MAX_BATCH_SIZE,
+                 max_retries=3, retry_delay=1.0):
+        self.db = db
+        self.collection = collection
+        self.batch_size = min(max(batch_size, 1), MAX_BATCH_SIZE)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.commit_latencies = []
+        self.committed = []
+        self.failed = []
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def add(self, doc_id, data):
+        """Buffer a document, committing a chunk once the buffer is full."""
+        with self._lock:
+            self._pending.append((doc_id, data))
+            if len(self._pending) < self.batch_size:
+                return
+            chunk, self._pending = self._pending, []
+        self._commit_chunk(chunk)
+
+    def flush(self):
+        """
+        Commit every buffered document.
+
+        Returns:
+            Number of documents committed by this writer so far
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.batch_size):
+            self._commit_chunk(pending[start:start + self.batch_size])
+        return len(self.committed)
+
+    def _commit_chunk(self, chunk):
+        doc_ids = [doc_id for doc_id, _ in chunk]
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                batch = self.db.batch()
+                for doc_id, data in chunk:
+                    batch.set(self.db.collection(self.collection).document(doc_id), data)
+                start = time.perf_counter()
+                batch.commit()
+                latency = time.perf_counter() - start
+            except Exception as e:
+                logger.warning(f"Batch commit of {len(chunk)} documents failed (attempt {attempt}/{self.max_retries}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+                continue
+
+            with self._lock:
+                self.commit_latencies.append(latency)
+                self.committed.extend(doc_ids)
+            logger.info(f"Committed {len(chunk)} documents to '{self.collection}' in {latency * 1000:.1f} ms")
+            return True
+
+        logger.error(f"Giving up on batch of {len(chunk)} documents: {', '.join(doc_ids)}")
+        with self._lock:
+            self.failed.extend(doc_ids)
+        return False
+
+    def latency_summary(self):
+        """Return commit count and total/mean/max commit latency in seconds."""
+        latencies = self.commit_latencies
+        if not latencies:
+            return {'commits': 0, 'total': 0.0, 'mean': 0.0, 'max': 0.0}
+        return {
+            'commits': len(latencies),
+            'total': sum(latencies),
+            'mean': sum(latencies) / len(latencies),
+            'max': max(latencies),
+        }
+
+
+class InMemoryFirestore:
+    """
+    Local stand-in for a Firestore client covering the calls the updater makes.
+
+    Documents are stored in self.collections as {collection: {doc_id: data}}.
+    """
+
+    def __init__(self):
+        self.collections = {}
+        self.commits = 0
+
+    def collection(self, name):
+        return _InMemoryCollection(self, name)
+
+    def batch(self):
+        return _InMemoryBatch(self)
+
+
+class _InMemoryCollection:
+    def __init__(self, db, name):
+        self._db = db
+        self.name = name
+
+    def document(self, doc_id):
+        return _InMemoryDocument(self._db, self.name, doc_id)
+
+
+class _InMemoryDocument:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self.collection = collection
+        self.id = doc_id
+
+    def set(self, data):
+        self._db.collections.setdefault(self.collection, {})[self.id] = copy.deepcopy(data)
+
+
+class _InMemoryBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, document, data):
+        if len(self._writes) >= MAX_BATCH_SIZE:
+            raise ValueError(f"Batch cannot contain more than {MAX_BATCH_SIZE} writes")
+        self._writes.append((document, copy.deepcopy(data)))
+
+    def commit(self):
+        for document, data in self._writes:
+            document.set(data)
+        self._db.commits += 1
+        self._writes = []
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Forecast Engine
+
+Rolls a next-day price model forward over a multi-day horizon on NumPy arrays.
+Each ticker keeps incremental indicator state (see indicators.IndicatorState),
+so after every predicted close the moving averages, RSI, MACD, returns and
+volatility are recomputed in O(1) instead of going stale. Models whose output
+already covers the horizon are called once (direct multi-horizon output).
+
+The feature layout is taken from the model: scikit-learn style estimators
+report feature_names_in_, and the LSTM models trained in
+ml/Updated_MLE_Pipeline.ipynb take LSTM_FEATURES as a (samples, 7, 1) tensor.
+
+forecast_response builds the /predict response from a forecast, so the API
+and the update job (which stores it for precomputed serving) return the same
+fields with the same meaning.
+
+Run this script directly to time the rollout.
+"""
+
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from indicators import IndicatorState, RollingStd, FEATURE_COLUMNS
+
+logger = logging.getLogger('forecast_engine')
+
+# Default number of days forecast
+DEFAULT_HORIZON = 30
+
+# Inputs of the LSTM models: OHLCV, 5-day moving average and 10-day standard
+# deviation of the close, in training order
+LSTM_FEATURES = ['Open', 'High', 'Low', 'Close', 'Volume', 'MA5', 'Close_Std10']
+
+# Columns of the price history that are not model inputs
+NON_FEATURE_COLUMNS = ('Date', 'Ticker')
+
+
+def model_input_width(model):
+    """Return the number of input features the model expects, or None if unknown."""
+    input_shape = getattr(model, 'input_shape', None)
+    if input_shape is not None:
+        return input_shape[1] if len(input_shape) == 3 else input_shape[-1]
+    return getattr(model, 'n_features_in_', None)
+
+
+def model_output_width(model):
+    """Return the number of values the model predicts per sample."""
+    output_shape = getattr(model, 'output_shape', None)
+    if output_shape is not None:
+        return output_shape[-1] or 1
+    return getattr(model, 'n_outputs_', 1)
+
+
+def model_feature_columns(model, history_columns):
+    """
+    Work out the feature columns the model was trained on.
+
+    Args:
+        model: Loaded estimator
+        history_columns: Columns of the price history
+
+    Returns:
+        List of feature column names, in model input order
+    """
+    names = getattr(model, 'feature_names_in_', None)
+    if names is not None:
+        return list(names)
+    if model_input_width(model) == len(LSTM_FEATURES):
+        return list(LSTM_FEATURES)
+    # Prepared-feature layout: the price history followed by the indicators
+    return [c for c in history_columns if c not in NON_FEATURE_COLUMNS and c not in FEATURE_COLUMNS] + FEATURE_COLUMNS
+
+
+def model_inputs(model, frame):
+    """
+    Arrange each row of a prepared frame in the model's input layout.
+
+    Rows with a missing feature (the start of a rolling window) are dropped.
+
+    Args:
+        model: Loaded estimator
+        frame: DataFrame of prices and technical indicators, oldest row first
+
+    Returns:
+        Array of shape (rows, features), or (rows, features, 1) for sequence models
+    """
+    columns = model_feature_columns(model, frame.columns)
+    if 'Close_Std10' in columns and 'Close_Std10' not in frame.columns:
+        frame = frame.assign(Close_Std10=frame['Close'].rolling(10).std())
+    features = frame.reindex(columns=columns).dropna().to_numpy(dtype=np.float64)
+    input_shape = getattr(model, 'input_shape', None)
+    if input_shape is not None and len(input_shape) == 3:
+        features = features.reshape(len(features), features.shape[1], 1)
+    return features
+
+
+class _SeriesState:
+    """Latest feature values of one ticker, advanced one predicted close at a time."""
+
+    def __init__(self, history):
+        self.indicators = IndicatorState()
+        self.close_std10 = RollingStd(10)
+        features = {}
+        for close in history['Close'].to_numpy(dtype=np.float64):
+            features = self.indicators.update(close)
+            features['Close_Std10'] = self.close_std10.update(float(close))
+        self.values = {c: float(v) for c, v in history.iloc[-1].items()
+                       if c not in NON_FEATURE_COLUMNS and np.isscalar(v) and not isinstance(v, str)}
+        self.values.update(features)
+
+    def advance(self, close):
+        """Record a predicted close; other price columns carry forward."""
+        self.values.update(self.indicators.update(close))
+        self.values['Close_Std10'] = self.close_std10.update(float(close))
+        self.values['Close'] = float(close)
+
+    def row(self, columns):
+        return [self.values.get(column, np.nan) for column in columns]
+
+
+class ForecastEngine:
+    """Multi-step forecaster for one model."""
+
+    def __init__(self, model, feature_columns=None):
+        self.model = model
+        self.feature_columns = feature_columns
+        self.output_width = model_output_width(model)
+        input_shape = getattr(model, 'input_shape', None)
+        self._sequence_input = input_shape is not None and len(input_shape) == 3
+        # Keras' predict() sets up a data pipeline per call; predict_on_batch does not
+        self._predict_fn = getattr(model, 'predict_on_batch', None) or model.predict
+
+    def _predict(self, features):
+        if self._sequence_input:
+            features = features.reshape(len(features), features.shape[1], 1)
+        return np.asarray(self._predict_fn(features), dtype=np.float64).reshape(len(features), -1)
+
+    def forecast(self, histories, horizon=DEFAULT_HORIZON):
+        """
+        Forecast daily closes for several tickers at once.
+
+        Args:
+            histories: List of price history DataFrames (oldest bar first, with
+                at least a Close column), one per ticker
+            horizon: Number of days to forecast
+
+        Returns:
+            Array of shape (tickers, horizon) with the predicted closes
+        """
+        if not histories:
+            return np.empty((0, horizon))
+        columns = self.feature_columns or model_feature_columns(self.model, histories[0].columns)
+        states = [_SeriesState(history) for history in histories]
+        features = np.array([state.row(columns) for state in states], dtype=np.float64)
+
+        if self.output_width >= horizon:
+            return self._predict(features)[:, :horizon]
+
+        forecasts = np.empty((len(states), horizon))
+        for step in range(horizon):
+            next_closes = self._predict(features)[:, 0]
+            forecasts[:, step] = next_closes
+            if step + 1 < horizon:
+                for row, state in enumerate(states):
+                    state.advance(next_closes[row])
+                    features[row] = state.row(columns)
+        return forecasts
+
+
+def forecast_response(ticker, name, current_price, raw_predictions, source='live'):
+    """
+    Create the /predict response for one ticker from its forecast.
+
+    Args:
+        ticker: Stock ticker symbol
+        name: Company name
+        current_price: Last closing price the forecast starts from
+        raw_predictions: Predicted daily closes, one per day of the horizon
+        source: 'live' or 'precomputed'
+
+    Returns:
+        Response dictionary; predictedPrice is the last day of the horizon
+    """
+    raw_predictions = [float(p) for p in raw_predictions]
+    predicted_price = raw_predictions[-1]
+    change = ((predicted_price - current_price) / current_price) * 100
+    return {
+        'ticker': ticker,
+        'name': name,
+        'currentPrice': float(current_price),
+        'predictedPrice': float(predicted_price),
+        'change': float(change),
+        'confidence': 0.85,  # Higher confidence since we're using the ML model
+        'rawPredictions': raw_predictions,
+        'lastUpdated': datetime.now().isoformat(),
+        'method': 'ml_model',
+        'predictionDays': len(raw_predictions),
+        'source': source
+    }
+
+
+class _LinearModel:
+    """Tiny NumPy model used to time the rollout without model overhead."""
+
+    def __init__(self, width, seed=0):
+        self.weights = np.random.default_rng(seed).normal(0, 0.01, width)
+        self.weights[3] = 1.0
+        self.n_features_in_ = width
+
+    def predict(self, features):
+        return features @ self.weights
+
+
+def main():
+    """Time a rollout on synthetic bars with a NumPy model or a saved model."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Time the multi-step forecast rollout')
+    parser.add_argument('--model', help='joblib model file (default: a NumPy linear model)')
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help='Days to forecast')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed repetitions')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 60)))
+    history = pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+                            'Close': close, 'Volume': rng.uniform(1e6, 5e6, 60)})
+
+    if args.model:
+        import joblib
+        model = joblib.load(args.model)
+    else:
+        model = _LinearModel(len(LSTM_FEATURES))
+    engine = ForecastEngine(model)
+    engine.forecast([history], args.horizon)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        engine.forecast([history], args.horizon)
+    elapsed = (time.perf_counter() - start) / args.repeat
+    logger.info(f"{args.horizon}-day forecast took {elapsed * 1000:.2f} ms per ticker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+History Store
+
+Columnar on-disk store of daily bars for a whole universe, memory-mapped so
+reading a window costs microseconds and no ticker is loaded until touched.
+
+A store is a directory holding:
+
+    values.npy   float64 array of shape (columns, rows), each column contiguous
+    dates.npy    int64 days since 1970-01-01, one per row
+    index.json   column names and each ticker's (start, stop) row range
+
+Rows are grouped by ticker and sorted by date within a ticker, so a ticker's
+last N bars or a date range within it are plain slices of the mapped arrays
+(zero-copy NumPy views). Both files are opened with np.load(mmap_mode='r');
+resident memory is the pages actually read, whatever the universe size.
+
+Stores are built from, and exported back to, the per-ticker CSV layout of
+ml/raw_stock_data and ml/processed_stock_data:
+
+    python history_store.py build                           # ml/raw_stock_data -> market_data/history/raw
+    python history_store.py build --source ../ml/processed_stock_data --path market_data/history/processed
+    python history_store.py export --output /tmp/csv
+    python history_store.py bench
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('history_store')
+
+RAW_STOCK_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ml', 'raw_stock_data')
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_data', 'history', 'raw')
+
+# Columns of the CSV layout that are not stored as values
+NON_VALUE_COLUMNS = ('Date', 'Ticker')
+
+
+def _csv_files(source):
+    """Return {ticker: path} for the CSVs in a directory, ticker taken from the file name."""
+    files = {}
+    for file_name in sorted(os.listdir(source)):
+        if file_name.endswith('.csv'):
+            stem = file_name[:-4]
+            ticker = stem[:-len('_processed')] if stem.endswith('_processed') else stem
+            files[ticker] = os.path.join(source, file_name)
+    return files
+
+
+def _count_rows(path):
+    with open(path, 'rb') as f:
+        lines = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b''))
+    return max(lines - 1, 0)
+
+
+def _read_csv(path):
+    # round_trip keeps the float values written by to_csv unchanged
+    data = pd.read_csv(path, float_precision='round_trip')
+    data['Date'] = pd.to_datetime(data['Date'])
+    return data.sort_values('Date', kind='stable')
+
+
+def build_store(source, path=DEFAULT_PATH):
+    """
+    Build a store from a directory of per-ticker CSVs.
+
+    Files are read one at a time into pre-sized memory-mapped arrays, so
+    building does not hold the whole universe in memory. The store is
+    written to a temporary directory and swapped in when complete.
+
+    Args:
+        source: Directory of {TICKER}.csv or {TICKER}_processed.csv files
+        path: Store directory
+
+    Returns:
+        Number of tickers stored
+    """
+    files = _csv_files(source)
+    if not files:
+        raise ValueError(f"No CSV files found in {source}")
+    rows = {ticker: _count_rows(file_path) for ticker, file_path in files.items()}
+    total = sum(rows.values())
+
+    first = pd.read_csv(next(iter(files.values())), nrows=1)
+    columns = [c for c in first.columns if c not in NON_VALUE_COLUMNS]
+
+    tmp_path = f'{path}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    values = np.lib.format.open_memmap(os.path.join(tmp_path, 'values.npy'), mode='w+',
+                                       dtype=np.float64, shape=(len(columns), total))
+    dates = np.lib.format.open_memmap(os.path.join(tmp_path, 'dates.npy'), mode='w+',
+                                      dtype=np.int64, shape=(total,))
+
+    ranges = {}
+    integer_columns = set(columns)
+    offset = 0
+    for ticker, file_path in files.items():
+        data = _read_csv(file_path)
+        if len(data) != rows[ticker]:
+            raise ValueError(f"{file_path} has {len(data)} rows, expected {rows[ticker]}")
+        stop = offset + len(data)
+        dates[offset:stop] = data['Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        for i, column in enumerate(columns):
+            if not pd.api.types.is_integer_dtype(data[column]):
+                integer_columns.discard(column)
+            values[i, offset:stop] = data[column].to_numpy(dtype=np.float64)
+        ranges[ticker] = [offset, stop]
+        offset = stop
+    values.flush()
+    dates.flush()
+    del values, dates
+
+    with open(os.path.join(tmp_path, 'index.json'), 'w') as f:
+        json.dump({
+            'columns': columns,
+            # Header of the source CSVs, so exports keep the column order
+            'layout': list(first.columns),
+            # Written back as integers on export so the CSVs round-trip exactly
+            'integerColumns': [c for c in columns if c in integer_columns],
+            'tickers': ranges,
+            'rows': total,
+            'source': os.path.abspath(source),
+            'processed': any(p.endswith('_processed.csv') for p in files.values()),
+        }, f, indent=1)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    os.replace(tmp_path, path)
+    logger.info(f"Stored {total} bars of {len(files)} tickers and {len(columns)} columns in {path}")
+    return len(files)
+
+
+def _day(value):
+    """Return a date as int64 days since 1970-01-01, the encoding of dates.npy."""
+    return np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64)
+
+
+class HistoryStore:
+    """Read-only, memory-mapped view of a store built by build_store."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        with open(os.path.join(path, 'index.json')) as f:
+            index = json.load(f)
+        self.columns = index['columns']
+        self.integer_columns = index.get('integerColumns', [])
+        self.processed = index.get('processed', False)
+        self.layout = index.get('layout', ['Date'] + self.columns + ['Ticker'])
+        self._ranges = {ticker: tuple(bounds) for ticker, bounds in index['tickers'].items()}
+        self._column_index = {column: i for i, column in enumerate(self.columns)}
+        # Plain ndarray views of the maps: slicing an np.memmap costs more than the read itself
+        self.values = np.asarray(np.load(os.path.join(path, 'values.npy'), mmap_mode='r'))
+        self.dates = np.asarray(np.load(os.path.join(path, 'dates.npy'), mmap_mode='r'))
+
+    @property
+    def tickers(self):
+        return list(self._ranges)
+
+    def __contains__(self, ticker):
+        return ticker in self._ranges
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def column_index(self, column):
+        """Return the row of values holding the given column."""
+        return self._column_index[column]
+
+    def _bounds(self, ticker):
+        try:
+            return self._ranges[ticker]
+        except KeyError:
+            raise KeyError(f"{ticker} is not in the history store at {self.path}")
+
+    def window(self, ticker, bars=None):
+        """
+        Return a ticker's last bars as zero-copy views.
+
+        Args:
+            ticker: Stock ticker symbol
+            bars: Number of most recent bars (default: all)
+
+        Returns:
+            Tuple of (dates as datetime64[D], values of shape (columns, bars))
+        """
+        start, stop = self._bounds(ticker)
+        if bars is not None:
+            start = max(stop - bars, start)
+        return self.dates[start:stop].view('datetime64[D]'), self.values[:, start:stop]
+
+    def column(self, ticker, column, bars=None):
+        """Return one column of a ticker's last bars as a zero-copy 1-D view."""
+        start, stop = self._bounds(ticker)
+        if bars is not None:
+            start = max(stop - bars, start)
+        return self.values[self._column_index[column], start:stop]
+
+    def date_range(self, start=None, end=None, tickers=None):
+        """
+        Return every ticker's bars with start <= date < end as zero-copy views.
+
+        Args:
+            start: First date (inclusive), anything pd.Timestamp accepts
+            end: Last date (exclusive)
+            tickers: Optional subset of tickers (default: all)
+
+        Returns:
+            Dictionary mapping ticker to (dates, values) for tickers with bars in range
+        """
+        lo = None if start is None else _day(start)
+        hi = None if end is None else _day(end)
+        result = {}
+        for ticker in tickers or self._ranges:
+            first, stop = self._bounds(ticker)
+            dates = self.dates[first:stop]
+            a = 0 if lo is None else int(np.searchsorted(dates, lo, 'left'))
+            b = len(dates) if hi is None else int(np.searchsorted(dates, hi, 'left'))
+            if b > a:
+                result[ticker] = (dates[a:b].view('datetime64[D]'), self.values[:, first + a:first + b])
+        return result
+
+    def frame(self, ticker, bars=None):
+        """Return a ticker's last bars as a DataFrame indexed by date (a copy)."""
+        dates, values = self.window(ticker, bars)
+        data = pd.DataFrame(np.array(values.T), columns=self.columns,
+                            index=pd.DatetimeIndex(dates.astype('datetime64[ns]'), name='Date'))
+        for column in self.integer_columns:
+            data[column] = data[column].astype(np.int64)
+        return data
+
+    def export_csv(self, output):
+        """
+        Write every ticker back to the per-ticker CSV layout the store was built from.
+
+        Returns:
+            Number of files written
+        """
+        os.makedirs(output, exist_ok=True)
+        suffix = '_processed' if self.processed else ''
+        for ticker in self._ranges:
+            data = self.frame(ticker).reset_index()
+            data['Ticker'] = ticker
+            data[self.layout].to_csv(os.path.join(output, f'{ticker}{suffix}.csv'), index=False)
+        return len(self._ranges)
+
+
+def main():
+    """Build, export or time a history store."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Memory-mapped columnar history store')
+    parser.add_argument('command', choices=['build', 'export', 'bench'])
+    parser.add_argument('--path', default=DEFAULT_PATH, help='Store directory')
+    parser.add_argument('--source', default=RAW_STOCK_DATA_DIR, help='CSV directory to build from')
+    parser.add_argument('--output', help='Directory to export CSVs to')
+    parser.add_argument('--bars', type=int, default=60, help='Window length timed by bench')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_store(args.source, args.path)
+    elif args.command == 'export':
+        if not args.output:
+            parser.error('export needs --output')
+        count = HistoryStore(args.path).export_csv(args.output)
+        logger.info(f"Exported {count} tickers to {args.output}")
+    else:
+        store = HistoryStore(args.path)
+        tickers = store.tickers
+        repeat = 10000
+        start = time.perf_counter()
+        for i in range(repeat):
+            store.window(tickers[i % len(tickers)], args.bars)
+        logger.info(f"Window of {args.bars} bars: {(time.perf_counter() - start) / repeat * 1e6:.1f} us")
+        start = time.perf_counter()
+        for _ in range(repeat // 10):
+            store.date_range('2024-01-01', '2024-07-01')
+        logger.info(f"Half-year range over {len(tickers)} tickers: "
+                    f"{(time.perf_counter() - start) / (repeat // 10) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Technical Indicators
+
+Shared feature engineering for the API and the update job. The pandas
+implementation (add_technical_indicators) computes the indicators over a whole
+window, while IndicatorEngine keeps rolling state per ticker and updates every
+indicator in O(1) when a new bar is appended.
+
+The incremental accumulators mirror the algorithms pandas uses for rolling
+mean (Kahan summation), rolling variance (Welford with Kahan summation) and
+ewm(adjust=False) in the pandas version pinned in requirements.txt, so both
+paths produce bit-for-bit identical values. Run this script directly to check
+that parity on ml/raw_stock_data/*.csv.
+"""
+
+import os
+import sys
+import json
+import math
+import logging
+import argparse
+from collections import deque
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('indicators')
+
+# Columns added to the price history, in the order the models expect them
+FEATURE_COLUMNS = ['MA5', 'MA10', 'MA20', 'RSI', 'MACD', 'Signal_Line', 'Daily_Return', 'Volatility']
+
+RAW_STOCK_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml', 'raw_stock_data')
+
+NaN = float('nan')
+
+
+def add_technical_indicators(df):
+    """
+    Add the technical indicator columns to a price history in place.
+
+    Args:
+        df: DataFrame with a Close column, oldest bar first
+
+    Returns:
+        The same DataFrame with FEATURE_COLUMNS added
+    """
+    # Moving averages
+    df['MA5'] = df['Close'].rolling(window=5).mean()
+    df['MA10'] = df['Close'].rolling(window=10).mean()
+    df['MA20'] = df['Close'].rolling(window=20).mean()
+
+    # Calculate RSI (Relative Strength Index)
+    delta = df['Close'].diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
+    rs = gain / loss
+    df['RSI'] = 100 - (100 / (1 + rs))
+
+    # Calculate MACD (Moving Average Convergence Divergence)
+    ema12 = df['Close'].ewm(span=12, adjust=False).mean()
+    ema26 = df['Close'].ewm(span=26, adjust=False).mean()
+    df['MACD'] = ema12 - ema26
+    df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
+
+    # Calculate daily returns
+    df['Daily_Return'] = df['Close'].pct_change()
+
+    # Calculate volatility (standard deviation of returns)
+    df['Volatility'] = df['Daily_Return'].rolling(window=20).std()
+
+    return df
+
+
+def _divide(numerator, denominator):
+    """Divide with NumPy semantics: x/0 is a signed inf and 0/0 is NaN."""
+    if denominator == 0:
+        if numerator != numerator or numerator == 0:
+            return NaN
+        return math.copysign(math.inf, numerator) * math.copysign(1.0, denominator)
+    return numerator / denominator
+
+
+class RollingMean:
+    """Fixed-window mean matching Series.rolling(window).mean()."""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = None
+
+    def update(self, val):
+        """Append a value and return the mean of the current window."""
+        if self.prev_value is None:
+            self.prev_value = val
+        if len(self.values) == self.window:
+            self._remove(self.values.popleft())
+        self.values.append(val)
+        self._add(val)
+        return self.value()
+
+    def _add(self, val):
+        if val == val:
+            self.nobs += 1
+            y = val - self.compensation_add
+            t = self.sum_x + y
+            self.compensation_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct += 1
+            if val == self.prev_value:
+                self.num_consecutive_same_value += 1
+            else:
+                self.num_consecutive_same_value = 1
+            self.prev_value = val
+
+    def _remove(self, val):
+        if val == val:
+            self.nobs -= 1
+            y = -val - self.compensation_remove
+            t = self.sum_x + y
+            self.compensation_remove = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct -= 1
+
+    def value(self):
+        if self.nobs < self.window or self.nobs == 0:
+            return NaN
+        result = self.sum_x / self.nobs
+        if self.num_consecutive_same_value >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+
+class RollingStd:
+    """Fixed-window sample standard deviation matching Series.rolling(window).std()."""
+
+    def __init__(self, window, ddof=1):
+        self.window = window
+        self.ddof = ddof
+        self.values = deque()
+        self.nobs = 0.0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = None
+
+    def update(self, val):
+        """Append a value and return the standard deviation of the current window."""
+        if self.prev_value is None:
+            self.prev_value = val
+        if len(self.values) == self.window:
+            self._remove(self.values.popleft())
+        self.values.append(val)
+        self._add(val)
+        return self.value()
+
+    def _add(self, val):
+        if val != val:
+            return
+        self.nobs += 1
+        if val == self.prev_value:
+            self.num_consecutive_same_value += 1
+        else:
+            self.num_consecutive_same_value = 1
+        self.prev_value = val
+
+        prev_mean = self.mean_x - self.compensation_add
+        y = val - self.compensation_add
+        t = y - self.mean_x
+        self.compensation_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (val - prev_mean) * (val - self.mean_x)
+
+    def _remove(self, val):
+        if val == val:
+            self.nobs -= 1
+            if self.nobs:
+                prev_mean = self.mean_x - self.compensation_remove
+                y = val - self.compensation_remove
+                t = y - self.mean_x
+                self.compensation_remove = t + self.mean_x - y
+                self.mean_x = self.mean_x - t / self.nobs
+                self.ssqdm_x = self.ssqdm_x - (val - prev_mean) * (val - self.mean_x)
+            else:
+                self.mean_x = 0.0
+                self.ssqdm_x = 0.0
+
+    def value(self):
+        if self.nobs < max(self.window, 1) or self.nobs <= self.ddof:
+            return NaN
+        if self.nobs == 1 or self.num_consecutive_same_value >= self.nobs:
+            return 0.0
+        variance = self.ssqdm_x / (self.nobs - self.ddof)
+        return 0.0 if variance < 0 else math.sqrt(variance)
+
+
+class ExponentialMean:
+    """Exponential moving average matching Series.ewm(span=span, adjust=False).mean()."""
+
+    def __init__(self, span):
+        self.span = span
+        com = float((span - 1) / 2)
+        self.alpha = 1. / (1. + com)
+        self.old_wt_factor = 1. - self.alpha
+        self.weighted = None
+        self.old_wt = 1.
+        self.nobs = 0
+
+    def update(self, cur):
+        """Append a value and return the updated average."""
+        is_observation = cur == cur
+        if self.weighted is None:
+            self.weighted = cur
+            self.nobs = int(is_observation)
+            self.old_wt = 1.
+        else:
+            self.nobs += is_observation
+            if self.weighted == self.weighted:
+                self.old_wt *= self.old_wt_factor
+                if is_observation:
+                    if self.weighted != cur:
+                        self.weighted = self.old_wt * self.weighted + self.alpha * cur
+                        self.weighted /= (self.old_wt + self.alpha)
+                    self.old_wt = 1.
+            elif is_observation:
+                self.weighted = cur
+        return self.value()
+
+    def value(self):
+        return self.weighted if self.weighted is not None and self.nobs >= 1 else NaN
+
+
+class IndicatorState:
+    """Rolling indicator state for a single ticker."""
+
+    def __init__(self):
+        self.last_close = None
+        self.ma5 = RollingMean(5)
+        self.ma10 = RollingMean(10)
+        self.ma20 = RollingMean(20)
+        self.gain = RollingMean(14)
+        self.loss = RollingMean(14)
+        self.ema12 = ExponentialMean(12)
+        self.ema26 = ExponentialMean(26)
+        self.signal = ExponentialMean(9)
+        self.volatility = RollingStd(20)
+        self.bars = 0
+
+    def update(self, close):
+        """
+        Append a closing price and return the indicators for that bar.
+
+        Returns:
+            Dictionary keyed by FEATURE_COLUMNS (NaN while a window is filling)
+        """
+        close = float(close)
+        if self.last_close is None:
+            delta = daily_return = NaN
+        else:
+            delta = close - self.last_close
+            daily_return = close / self.last_close - 1
+
+        rs = _divide(self.gain.update(delta if delta > 0 else 0.0),
+                     self.loss.update(-(delta if delta < 0 else 0.0)))
+        macd = self.ema12.update(close) - self.ema26.update(close)
+
+        features = {
+            'MA5': self.ma5.update(close),
+            'MA10': self.ma10.update(close),
+            'MA20': self.ma20.update(close),
+            'RSI': 100 - _divide(100, 1 + rs),
+            'MACD': macd,
+            'Signal_Line': self.signal.update(macd),
+            'Daily_Return': daily_return,
+            'Volatility': self.volatility.update(daily_return),
+        }
+        self.last_close = close
+        self.bars += 1
+        return features
+
+    def to_dict(self):
+        """Serialize the state to JSON-compatible primitives."""
+        def encode(accumulator):
+            state = dict(vars(accumulator))
+            if 'values' in state:
+                state['values'] = list(state['values'])
+            return state
+
+        return {
+            'last_close': self.last_close,
+            'bars': self.bars,
+            'accumulators': {name: encode(acc) for name, acc in vars(self).items()
+                             if isinstance(acc, (RollingMean, RollingStd, ExponentialMean))},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restore a state produced by to_dict."""
+        state = cls()
+        state.last_close = data['last_close']
+        state.bars = data['bars']
+        for name, values in data['accumulators'].items():
+            accumulator = getattr(state, name)
+            for key, value in values.items():
+                setattr(accumulator, key, deque(value) if key == 'values' else value)
+        return state
+
+
+class IndicatorEngine:
+    """Incremental indicator state for many tickers with save/restore."""
+
+    def __init__(self):
+        self.states = {}
+
+    def append(self, ticker, close):
+        """Append one closing price for the ticker and return its indicators."""
+        state = self.states.get(ticker)
+        if state is None:
+            state = self.states[ticker] = IndicatorState()
+        return state.update(close)
+
+    def warm(self, ticker, closes):
+        """
+        Rebuild the ticker's state from a price history.
+
+        Returns:
+            DataFrame with one row of indicators per close
+        """
+        self.states[ticker] = IndicatorState()
+        rows = [self.append(ticker, close) for close in closes]
+        return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+    def save(self, path):
+        """Persist every ticker's state to a JSON file."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({ticker: state.to_dict() for ticker, state in self.states.items()}, f)
+
+    @classmethod
+    def load(cls, path):
+        """Restore an engine saved with save()."""
+        engine = cls()
+        with open(path) as f:
+            for ticker, data in json.load(f).items():
+                engine.states[ticker] = IndicatorState.from_dict(data)
+        return engine
+
+
+def check_parity(closes):
+    """
+    Compare the incremental engine with add_technical_indicators.
+
+    Args:
+        closes: Sequence of closing prices, oldest first
+
+    Returns:
+        Dictionary mapping each feature column to its number of mismatching bars
+    """
+    expected = add_technical_indicators(pd.DataFrame({'Close': np.asarray(closes, dtype=np.float64)}))
+    actual = IndicatorEngine().warm('parity', closes)
+    mismatches = {}
+    for column in FEATURE_COLUMNS:
+        a = actual[column].to_numpy()
+        b = expected[column].to_numpy()
+        same = (a.view(np.int64) == b.view(np.int64)) | (np.isnan(a) & np.isnan(b))
+        mismatches[column] = int((~same).sum())
+    return mismatches
+
+
+def main():
+    """Check bit-for-bit parity of the incremental engine on the raw CSV files."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Check incremental indicator parity with pandas')
+    parser.add_argument('--source', default=RAW_STOCK_DATA_DIR, help='Directory of raw stock CSV files')
+    args = parser.parse_args()
+
+    failures = 0
+    for file_name in sorted(os.listdir(args.source)):
+        if not file_name.endswith('.csv'):
+            continue
+        closes = pd.read_csv(os.path.join(args.source, file_name))['Close']
+        mismatches = check_parity(closes)
+        bad = {column: count for column, count in mismatches.items() if count}
+        if bad:
+            failures += 1
+            logger.error(f"{file_name}: mismatching bars {bad}")
+        else:
+            logger.info(f"{file_name}: all {len(closes)} bars identical")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
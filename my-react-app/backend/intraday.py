@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Intraday Refresh
+
+Keeps predictions current during the trading session instead of only after
+the daily update run. Minute bars arrive as a stream, polled from the market
+data provider or replayed minute by minute, and each batch is folded into a
+partial daily bar per ticker. The indicators of that partial bar come from the
+ticker's IndicatorState, warmed once on the daily history and advanced by
+one bar on a copy, so nothing is recomputed over the history. Models are taken
+from the update job's registry, loaded once per process, and each ticker's
+predictions over the daily history are made once per session; a refresh only
+runs the model on the partial bar's row.
+
+Each refresh cycle re-runs the prediction only for tickers whose partial close
+has moved more than REFRESH_THRESHOLD since their last prediction, largest
+moves first. A cycle stops after MAX_REFRESH_PER_CYCLE predictions or
+CYCLE_TIME_BUDGET seconds; the remaining tickers wait for the next cycle.
+Predictions are published like the daily run's, to Firestore and the local
+prediction store (the forecast of the daily bars with the partial bar
+appended), with intradayAsOf set to the last minute included.
+
+    python intraday.py --dry-run                                    # poll Yahoo every minute
+    MARKET_DATA_PROVIDER=replay python intraday.py --dry-run --replay-step 15
+"""
+
+import sys
+import copy
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from indicators import IndicatorState
+from ticker_registry import TickerRegistry, parse_shard
+from firestore_writer import BatchPredictionWriter, InMemoryFirestore, MAX_BATCH_SIZE
+from market_data_provider import SESSION_OPEN, SESSION_MINUTES, OHLCV_COLUMNS
+import update_predictions
+from forecast_engine import model_inputs
+from update_predictions import (fetch_market_data, fetch_stock_data, prepare_prediction_data, model_prediction,
+                                run_fallback_prediction, forecast_ticker, live_model, update_firebase_prediction,
+                                initialize_firebase)
+
+logger = logging.getLogger('intraday')
+
+# Relative move of the partial close since the last prediction that triggers a new one
+REFRESH_THRESHOLD = 0.005
+
+# Most predictions per refresh cycle, and the time after which a cycle stops starting new ones
+MAX_REFRESH_PER_CYCLE = 25
+CYCLE_TIME_BUDGET = 10.0
+
+# Seconds between two polls of the live provider
+POLL_INTERVAL = 60
+
+# Trailing rows that determine the model features of the latest row (Close_Std10)
+FEATURE_WINDOW = 10
+
+
+class PartialBar:
+    """Daily bar of the current session, built from the minute bars seen so far."""
+
+    def __init__(self):
+        self.open = self.high = self.low = self.close = None
+        self.volume = 0.0
+        self.last_minute = None
+        self.minutes = 0
+
+    def add(self, bars):
+        """
+        Fold minute bars into the daily bar, ignoring minutes already seen.
+
+        Args:
+            bars: DataFrame of 1-minute OHLCV bars indexed by minute
+
+        Returns:
+            Number of new minutes
+        """
+        if self.last_minute is not None:
+            bars = bars[bars.index > self.last_minute]
+        if bars.empty:
+            return 0
+        high, low = float(bars['High'].max()), float(bars['Low'].min())
+        if self.open is None:
+            self.open, self.high, self.low = float(bars['Open'].iloc[0]), high, low
+        else:
+            self.high, self.low = max(self.high, high), min(self.low, low)
+        self.close = float(bars['Close'].iloc[-1])
+        self.volume += float(bars['Volume'].sum())
+        self.last_minute = bars.index[-1]
+        self.minutes += len(bars)
+        return len(bars)
+
+
+class IntradayTicker:
+    """
+    One ticker's session: prepared daily features, indicator state, the partial
+    bar and the model with its predictions over the daily history.
+    """
+
+    def __init__(self, ticker, stock_data, session_date, model=None):
+        history = stock_data[stock_data.index < session_date]
+        self.ticker = ticker
+        self.session_date = session_date
+        self.history = history[OHLCV_COLUMNS]
+        self.prepared = prepare_prediction_data(ticker, history)
+        if self.prepared is None or self.prepared.empty:
+            raise ValueError(f"no prepared features before {session_date.date()}")
+        # Same closes as prepare_prediction_data, so the state matches its last row
+        self.state = IndicatorState()
+        for close in history['Close'].to_numpy(dtype=float):
+            self.state.update(close)
+        self.bar = PartialBar()
+        # The daily run's prediction was made from the previous close
+        self.predicted_close = float(history['Close'].iloc[-1])
+        # The daily rows do not change during the session, so they are predicted once
+        self.model = model
+        self.history_predictions = self._predict(model_inputs(model, self.prepared)) if model is not None else None
+
+    def _predict(self, features):
+        # predict_on_batch skips Keras' per-call data pipeline and progress bar
+        predict = getattr(self.model, 'predict_on_batch', None) or self.model.predict
+        return np.asarray(predict(features), dtype=np.float64).ravel().tolist()
+
+    def move(self):
+        """Relative change of the partial close since the last prediction."""
+        if self.bar.close is None:
+            return 0.0
+        return abs(self.bar.close / self.predicted_close - 1)
+
+    def frame(self):
+        """
+        Return the prepared features with the partial bar appended as today's row.
+
+        Indicators come from a copy of the state advanced by the partial close;
+        other columns (market cap, S&P 500 fields) carry forward.
+        """
+        features = copy.deepcopy(self.state).update(self.bar.close)
+        row = self.prepared.iloc[-1].to_dict()
+        row.update({'Date': self.session_date, 'Open': self.bar.open, 'High': self.bar.high,
+                    'Low': self.bar.low, 'Close': self.bar.close, 'Volume': self.bar.volume})
+        row.update(features)
+        if 'Stock_Return' in row:
+            row['Stock_Return'] = features['Daily_Return']
+        return pd.concat([self.prepared, pd.DataFrame([row], columns=self.prepared.columns)], ignore_index=True)
+
+    def predict(self):
+        """
+        Return the prediction with the partial bar as the latest row.
+
+        With a model, only today's row is run; the result matches run_prediction
+        on frame(). Tickers without a model use the fallback on the last 30 rows.
+        """
+        frame = self.frame()
+        if self.model is None:
+            return run_fallback_prediction(self.ticker, frame)
+        try:
+            latest = self._predict(model_inputs(self.model, frame.tail(FEATURE_WINDOW))[-1:])
+            return model_prediction(self.ticker, self.bar.close, self.history_predictions + latest)
+        except Exception as e:
+            logger.error(f"Error running the {self.ticker} model intraday: {e}")
+            return run_fallback_prediction(self.ticker, frame)
+
+    def daily_bars(self):
+        """Return the daily OHLCV bars with the partial bar appended as today's bar."""
+        bar = pd.DataFrame([[self.bar.open, self.bar.high, self.bar.low, self.bar.close, self.bar.volume]],
+                           columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([self.session_date], name=self.history.index.name))
+        return pd.concat([self.history, bar])
+
+
+class IntradayRefresher:
+    """Ingests minute bars for a universe and refreshes the predictions that moved."""
+
+    def __init__(self, tickers, db, threshold=REFRESH_THRESHOLD, max_per_cycle=MAX_REFRESH_PER_CYCLE,
+                 time_budget=CYCLE_TIME_BUDGET, batch_size=MAX_BATCH_SIZE):
+        self.tickers = list(tickers)
+        self.db = db
+        self.threshold = threshold
+        self.max_per_cycle = max_per_cycle
+        self.time_budget = time_budget
+        self.batch_size = batch_size
+        self.session_date = None
+        self.sessions = {}
+
+    def start_session(self, session_date):
+        """Warm every ticker's state and model predictions from the daily bars before the session date."""
+        start = time.perf_counter()
+        self.session_date = session_date
+        self.sessions = {}
+        # The market data cache never stores the open session's bar, so fetching
+        # during trading hours does not persist a partial close as final
+        market_data = fetch_market_data(self.tickers)
+        for ticker in self.tickers:
+            try:
+                stock_data = fetch_stock_data(ticker, market_data=market_data)
+                if stock_data is None:
+                    continue
+                self.sessions[ticker] = IntradayTicker(ticker, stock_data, session_date, live_model(ticker))
+            except Exception as e:
+                logger.error(f"Could not start the intraday session for {ticker}: {e}")
+        logger.info(f"Started session {session_date.date()} for {len(self.sessions)}/{len(self.tickers)} tickers "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    def ingest(self, bars):
+        """
+        Fold polled minute bars into the partial bars.
+
+        A minute from a later date starts a new session first.
+
+        Args:
+            bars: Dictionary mapping ticker to a DataFrame of minute bars, or None
+
+        Returns:
+            Number of new minutes
+        """
+        frames = {ticker: frame for ticker, frame in bars.items() if frame is not None and not frame.empty}
+        if not frames:
+            return 0
+        latest = max(frame.index[-1] for frame in frames.values()).normalize()
+        if self.session_date is None or latest > self.session_date:
+            self.start_session(latest)
+        added = 0
+        for ticker, frame in frames.items():
+            session = self.sessions.get(ticker)
+            if session is not None:
+                added += session.bar.add(frame[frame.index.normalize() == self.session_date])
+        return added
+
+    def refresh(self):
+        """
+        Re-predict the tickers that moved past the threshold, within the cycle's budget.
+
+        Returns:
+            Dictionary with the number of candidates, refreshed, deferred and
+            failed tickers, and the cycle's duration in seconds
+        """
+        start = time.perf_counter()
+        candidates = sorted(((session.move(), ticker) for ticker, session in self.sessions.items()
+                             if session.move() >= self.threshold), reverse=True)
+        writer = BatchPredictionWriter(self.db, batch_size=self.batch_size) if self.batch_size > 0 else None
+        refreshed = failed = 0
+        for _, ticker in candidates:
+            if refreshed + failed >= self.max_per_cycle or time.perf_counter() - start >= self.time_budget:
+                break
+            session = self.sessions[ticker]
+            try:
+                prediction = session.predict()
+            except Exception as e:
+                logger.error(f"Intraday prediction for {ticker} failed: {e}")
+                prediction = None
+            # Failed tickers also wait for the next move instead of retrying every cycle
+            session.predicted_close = session.bar.close
+            if prediction is None:
+                failed += 1
+                continue
+            prediction['intradayAsOf'] = session.bar.last_minute.isoformat()
+            update_firebase_prediction(self.db, prediction, writer)
+            try:
+                if session.model is not None:
+                    forecast = forecast_ticker(ticker, session.daily_bars(), model=session.model)
+                    forecast['intradayAsOf'] = prediction['intradayAsOf']
+                    update_predictions.prediction_store.put(forecast)
+            except Exception as e:
+                logger.error(f"Error saving the forecast for {ticker} to the local store: {e}")
+            refreshed += 1
+        if writer is not None:
+            writer.flush()
+        return {
+            'candidates': len(candidates),
+            'refreshed': refreshed,
+            'failed': failed,
+            'deferred': len(candidates) - refreshed - failed,
+            'seconds': time.perf_counter() - start,
+        }
+
+
+class MinutePoller:
+    """Polls the market data provider for today's minute bars."""
+
+    done = False
+
+    def __init__(self, provider, tickers, interval=POLL_INTERVAL):
+        self.provider = provider
+        self.tickers = list(tickers)
+        self.interval = interval
+
+    def poll(self):
+        return self.provider.intraday(self.tickers)
+
+    def wait(self):
+        time.sleep(self.interval)
+
+
+class ReplayMinuteStream:
+    """Replays the provider's session `step` minutes per poll, without waiting."""
+
+    def __init__(self, provider, tickers, step=1):
+        self.provider = provider
+        self.tickers = list(tickers)
+        self.step = pd.Timedelta(minutes=step)
+        self.clock = pd.Timestamp(provider.now()).normalize() + pd.Timedelta(SESSION_OPEN + ':00')
+        self.close = self.clock + pd.Timedelta(minutes=SESSION_MINUTES)
+
+    @property
+    def done(self):
+        return self.clock >= self.close
+
+    def poll(self):
+        end = min(self.clock + self.step, self.close)
+        bars = self.provider.intraday(self.tickers, self.clock, end)
+        self.clock = end
+        return bars
+
+    def wait(self):
+        pass
+
+
+def run(refresher, stream, cycles=None):
+    """
+    Poll, ingest and refresh until the stream ends or `cycles` cycles have run.
+
+    Returns:
+        Totals of the refresh statistics over all cycles
+    """
+    totals = {'cycles': 0, 'minutes': 0, 'refreshed': 0, 'failed': 0, 'maxCycleSeconds': 0.0}
+    while True:
+        try:
+            minutes = refresher.ingest(stream.poll())
+        except Exception as e:
+            logger.error(f"Error polling minute bars: {e}")
+            minutes = 0
+        stats = refresher.refresh()
+        totals['cycles'] += 1
+        totals['minutes'] += minutes
+        totals['refreshed'] += stats['refreshed']
+        totals['failed'] += stats['failed']
+        totals['maxCycleSeconds'] = max(totals['maxCycleSeconds'], stats['seconds'])
+        if stats['candidates']:
+            logger.info(f"Cycle {totals['cycles']}: {minutes} new minutes, refreshed {stats['refreshed']}/"
+                        f"{stats['candidates']} moved tickers ({stats['deferred']} deferred) in {stats['seconds']:.2f}s")
+        if stream.done or (cycles is not None and totals['cycles'] >= cycles):
+            return totals
+        stream.wait()
+
+
+def main():
+    """Refresh predictions from intraday minute bars."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Refresh predictions from intraday minute bars')
+    parser.add_argument('--universe', help='Ticker universe file (default: TICKER_UNIVERSE_FILE or tickers.txt)')
+    parser.add_argument('--shard', type=parse_shard, default=(0, 1), metavar='i/N', help='Only refresh shard i of N')
+    parser.add_argument('--dry-run', action='store_true', help='Write to an in-memory Firestore stand-in')
+    parser.add_argument('--threshold', type=float, default=REFRESH_THRESHOLD,
+                        help=f'Relative move that triggers a new prediction (default: {REFRESH_THRESHOLD})')
+    parser.add_argument('--max-refresh', type=int, default=MAX_REFRESH_PER_CYCLE, help='Predictions per cycle')
+    parser.add_argument('--time-budget', type=float, default=CYCLE_TIME_BUDGET, help='Seconds per cycle')
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL, help='Seconds between polls')
+    parser.add_argument('--replay-step', type=int, default=1,
+                        help='Minutes replayed per cycle with MARKET_DATA_PROVIDER=replay')
+    parser.add_argument('--cycles', type=int, help='Stop after this many cycles')
+    args = parser.parse_args()
+
+    tickers = TickerRegistry.load(args.universe).shard(*args.shard)
+    db = InMemoryFirestore() if args.dry_run else initialize_firebase()
+    refresher = IntradayRefresher(tickers, db, args.threshold, args.max_refresh, args.time_budget)
+    provider = update_predictions.market_data_provider
+    if provider.name == 'replay':
+        stream = ReplayMinuteStream(provider, tickers, args.replay_step)
+    else:
+        stream = MinutePoller(provider, tickers, args.poll_interval)
+
+    try:
+        totals = run(refresher, stream, args.cycles)
+    except KeyboardInterrupt:
+        logger.info("Intraday refresh stopped")
+        return
+    logger.info(f"Intraday refresh finished: {totals['cycles']} cycles, {totals['minutes']} minutes ingested, "
+                f"{totals['refreshed']} predictions refreshed, {totals['failed']} failed, "
+                f"slowest cycle {totals['maxCycleSeconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
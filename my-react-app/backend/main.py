@@ -1,14 +1,31 @@
 # main.py
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import joblib
-import yfinance as yf
+from typing import List
 import numpy as np
 import pandas as pd
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
+from datetime import timedelta
 import os
-from datetime import datetime, timedelta
+import time
+import asyncio
 import logging
+import threading
+from startup import StartupReport
+from model_registry import ModelRegistry, ModelNotLoadedError, tensorflow_available
+from onnx_models import onnxruntime_available
+from ticker_registry import TickerRegistry
+from market_data_provider import create_provider
+from market_data_cache import MarketDataCache
+from feature_snapshots import save_features, DEFAULT_FORMAT as DEFAULT_SNAPSHOT_FORMAT
+from response_cache import ResponseCache
+from company_metadata import CompanyMetadataCache
+from prediction_store import PredictionStore, DEFAULT_MAX_AGE
+from stage_executor import StageExecutors, StageTimeoutError
+from indicators import add_technical_indicators
+from forecast_engine import ForecastEngine, forecast_response, DEFAULT_HORIZON
+from metrics import MetricsRegistry
 
 # Configure logging
 logging.basicConfig(
@@ -17,8 +34,100 @@ logging.basicConfig(
 )
 logger = logging.getLogger('prediction_api')
 
+# Startup phase timings measured from process start, reported by /ready
+startup_report = StartupReport()
+
+# 'eager' loads the models before the server accepts requests; 'fast' starts
+# listening at once and warms the models on a background thread
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'eager')
+
+# Longest a request waits for the background warm-up in fast startup mode
+MODEL_WAIT_TIMEOUT = float(os.environ.get('MODEL_WAIT_TIMEOUT', 60))
+
+# Set once every model is loaded and has run a first forecast
+models_ready = threading.Event()
+
+# Tickers the API accepts predictions for (tickers.txt or TICKER_UNIVERSE_FILE)
+SUPPORTED_TICKERS = TickerRegistry.load()
+
 app = FastAPI()
 
+# Live models are loaded once at startup and shared across requests
+model_registry = ModelRegistry()
+
+# Market data comes from Yahoo, or from offline replay when MARKET_DATA_PROVIDER=replay
+market_data_provider = create_provider()
+
+# Daily bars are served from a local store that only downloads new bars
+market_data_cache = MarketDataCache(provider=market_data_provider)
+
+# Prediction responses keyed on (ticker, last bar), with TTL and LRU eviction
+response_cache = ResponseCache()
+
+# Company names come from a disk cache refreshed in the background
+company_metadata = CompanyMetadataCache(provider=market_data_provider)
+
+# Blocking request work runs on separate I/O and CPU pools with timeouts
+stage_executors = StageExecutors()
+
+# 'live' computes every prediction on request; 'precomputed' serves the latest
+# forecast stored by update_predictions.py for the requested horizon and only
+# computes live when there is none or it is older than PREDICTION_MAX_AGE seconds
+PREDICTION_SERVING = os.environ.get('PREDICTION_SERVING', 'live')
+PREDICTION_MAX_AGE = float(os.environ.get('PREDICTION_MAX_AGE', DEFAULT_MAX_AGE))
+
+# Forecasts written by the update job, keyed by ticker and horizon
+prediction_store = PredictionStore(provider=market_data_provider)
+
+# Prometheus metrics served at /metrics
+metrics = MetricsRegistry()
+STAGE_SECONDS = metrics.histogram('tikr_stage_duration_seconds', 'Time spent in each prediction stage', ['stage'])
+REQUEST_SECONDS = metrics.histogram('tikr_request_duration_seconds', 'Prediction request latency', ['endpoint'])
+PREDICTIONS = metrics.counter('tikr_predictions_total', 'Prediction results by ticker and outcome', ['ticker', 'outcome'])
+PRECOMPUTED_LOOKUPS = metrics.counter('tikr_precomputed_lookups_total', 'Prediction store lookups by result', ['result'])
+
+# Outcome label recorded for each HTTP status
+OUTCOMES = {200: 'ok', 400: 'rejected', 503: 'model_unavailable', 504: 'timeout'}
+
+def register_state_metrics():
+    """Export cache, model registry and executor state as scrape-time metrics."""
+    def cache_stat(key):
+        return lambda: [({}, response_cache.stats()[key])]
+    
+    for key, name, kind in [('hits', 'tikr_response_cache_hits_total', 'counter'),
+                            ('misses', 'tikr_response_cache_misses_total', 'counter'),
+                            ('coalesced', 'tikr_response_cache_coalesced_total', 'counter'),
+                            ('evictions', 'tikr_response_cache_evictions_total', 'counter'),
+                            ('entries', 'tikr_response_cache_entries', 'gauge')]:
+        metrics.callback(name, f'Prediction response cache {key}', cache_stat(key), kind)
+    
+    metrics.callback('tikr_models_loaded', 'Models loaded in the registry',
+                     lambda: [({}, len(model_registry))])
+    metrics.callback('tikr_model_load_errors', 'Tickers whose model failed to load or is missing',
+                     lambda: [({}, len(model_registry.stats()['errors']))])
+    metrics.callback('tikr_model_memory_bytes', 'Memory allocated while loading each model',
+                     lambda: [({'ticker': t}, s['memoryBytes']) for t, s in model_registry.stats()['models'].items()])
+    metrics.callback('tikr_model_load_seconds', 'Time taken to load each model',
+                     lambda: [({'ticker': t}, s['loadSeconds']) for t, s in model_registry.stats()['models'].items()])
+    metrics.callback('tikr_ready', 'Whether the models are loaded and warm',
+                     lambda: [({}, int(models_ready.is_set()))])
+    metrics.callback('tikr_supported_tickers', 'Tickers in the supported universe',
+                     lambda: [({}, len(SUPPORTED_TICKERS))])
+    metrics.callback('tikr_requests_in_flight', 'Prediction requests being processed',
+                     lambda: [({}, stage_executors.stats()['inFlight'])])
+    metrics.callback('tikr_requests_queued', 'Prediction requests waiting for a concurrency slot',
+                     lambda: [({}, stage_executors.stats()['queued'])])
+    metrics.callback('tikr_stage_timeouts_total', 'Request stages that exceeded their timeout',
+                     lambda: [({'stage': stage}, s['timeouts']) for stage, s in stage_executors.stats()['stages'].items()],
+                     'counter')
+
+register_state_metrics()
+
+def record_prediction(ticker, status):
+    """Count one prediction result, without letting unknown symbols add label values."""
+    PREDICTIONS.inc(ticker=ticker if ticker in SUPPORTED_TICKERS else 'unsupported',
+                    outcome=OUTCOMES.get(status, 'error'))
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -27,8 +136,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Number of days forecast by the iterative model rollout (the horizon the update job stores)
+PREDICTION_DAYS = DEFAULT_HORIZON
+
+# Longest horizon a client may request
+MAX_PREDICTION_DAYS = 90
+
 class PredictionRequest(BaseModel):
     stock_ticker: str
+    horizon: int = PREDICTION_DAYS
+
+class BatchPredictionRequest(BaseModel):
+    stock_tickers: List[str]
+    horizon: int = PREDICTION_DAYS
+
+def warmup_history(bars=30):
+    """Synthetic price history used to run a first forecast through each model."""
+    close = np.linspace(100.0, 110.0, bars)
+    return pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+                         'Close': close, 'Volume': np.full(bars, 1e6)})
+
+def warm_models():
+    """
+    Load every live model and run one forecast through each, so the first
+    request does not pay for lazy initialization in the inference runtime.
+    """
+    model_registry.load_all(expected_tickers=SUPPORTED_TICKERS)
+    for model_stats in model_registry.stats()['models'].values():
+        STAGE_SECONDS.observe(model_stats['loadSeconds'], stage='model_load')
+    startup_report.mark('model_load')
+    
+    history = warmup_history()
+    for ticker in model_registry.stats()['models']:
+        try:
+            forecast_prices(model_registry.get(ticker), [history], 1)
+        except Exception as e:
+            logger.warning(f"Warm-up forecast failed for {ticker}: {e}")
+    startup_report.mark('warmup')
+    models_ready.set()
+    startup_report.ready()
+
+async def wait_for_models():
+    """Hold requests that arrive before the background warm-up has finished."""
+    if not models_ready.is_set():
+        await asyncio.get_running_loop().run_in_executor(None, models_ready.wait, MODEL_WAIT_TIMEOUT)
+
+@app.on_event("startup")
+def load_models():
+    """Preload every live model so requests never deserialize one."""
+    startup_report.mark('imports')
+    if STARTUP_MODE == 'fast':
+        threading.Thread(target=warm_models, name='model-warmup', daemon=True).start()
+    else:
+        warm_models()
+    # Fill in missing company names without delaying startup
+    company_metadata.refresh_async(SUPPORTED_TICKERS)
+
+@app.on_event("shutdown")
+def stop_executors():
+    stage_executors.shutdown()
 
 def fetch_stock_data(ticker, days=60):
     """
@@ -42,15 +208,16 @@ def fetch_stock_data(ticker, days=60):
         DataFrame with historical stock data
     """
     try:
-        end_date = datetime.now()
+        end_date = market_data_provider.now()
         start_date = end_date - timedelta(days=days)
         
         logger.info(f"Fetching data for {ticker} from {start_date.date()} to {end_date.date()}")
         
-        # Get daily data for the historical period
-        data = yf.download(ticker, start=start_date, end=end_date)
+        # Serve daily data from the local store, downloading only new bars
+        with STAGE_SECONDS.time(stage='fetch'):
+            data = market_data_cache.get_history(ticker, days=days, now=end_date)
         
-        if data.empty:
+        if data is None or data.empty:
             logger.warning(f"No data returned for {ticker}")
             return None
             
@@ -61,13 +228,15 @@ def fetch_stock_data(ticker, days=60):
         logger.error(f"Error fetching data for {ticker}: {e}")
         return None
 
-def prepare_prediction_data(ticker, stock_data):
+def prepare_prediction_data(ticker, stock_data, snapshot_format=DEFAULT_SNAPSHOT_FORMAT):
     """
     Prepare data for prediction with enhanced feature engineering.
     
     Args:
         ticker: Stock ticker symbol
         stock_data: DataFrame with historical stock data
+        snapshot_format: Optional 'npy' or 'parquet' to also save the
+            features to predicting_data/ for debugging (default: disabled)
     
     Returns:
         DataFrame with features for prediction
@@ -76,142 +245,321 @@ def prepare_prediction_data(ticker, stock_data):
         # Make a copy of the data to avoid modifying the original
         df = stock_data.copy()
         
-        # Basic features
-        # Moving averages
-        df['MA5'] = df['Close'].rolling(window=5).mean()
-        df['MA10'] = df['Close'].rolling(window=10).mean()
-        df['MA20'] = df['Close'].rolling(window=20).mean()
-        
-        # Calculate RSI (Relative Strength Index)
-        delta = df['Close'].diff()
-        gain = delta.where(delta > 0, 0).rolling(window=14).mean()
-        loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-        
-        # Calculate MACD (Moving Average Convergence Divergence)
-        ema12 = df['Close'].ewm(span=12, adjust=False).mean()
-        ema26 = df['Close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = ema12 - ema26
-        df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        
-        # Calculate daily returns
-        df['Daily_Return'] = df['Close'].pct_change()
-        
-        # Calculate volatility (standard deviation of returns)
-        df['Volatility'] = df['Daily_Return'].rolling(window=20).std()
+        # Add moving averages, RSI, MACD, daily returns and volatility
+        add_technical_indicators(df)
         
         # Drop NaN values
         df = df.dropna()
         
-        # Ensure predicting_data directory exists
-        predicting_data_dir = os.path.join(os.path.dirname(__file__), 'predicting_data')
-        os.makedirs(predicting_data_dir, exist_ok=True)
-        
         # Add ticker column
         df['Ticker'] = ticker
         
         # Reset index to get Date as a column
         df = df.reset_index()
         
-        # Save to CSV for model prediction
-        output_path = os.path.join(predicting_data_dir, f'{ticker}.csv')
-        df.to_csv(output_path, index=False)
-        logger.info(f"Saved prediction data for {ticker} to {output_path}")
+        # Optionally keep a typed snapshot of the features for auditing
+        save_features(ticker, df, snapshot_format)
         
         return df
     except Exception as e:
         logger.error(f"Error preparing prediction data for {ticker}: {e}")
         return None
 
+def fetch_stock_data_batch(tickers, days=60):
+    """
+    Fetch historical stock data for several tickers with one bulk download.
+    
+    Args:
+        tickers: List of stock ticker symbols
+        days: Number of days of historical data to fetch (default: 60)
+    
+    Returns:
+        Dictionary mapping each ticker to its DataFrame, or None on failure
+    """
+    try:
+        logger.info(f"Fetching data for {len(tickers)} tickers")
+        with STAGE_SECONDS.time(stage='fetch'):
+            histories = market_data_cache.get_histories(tickers, days=days, now=market_data_provider.now())
+        return {ticker: (data if data is not None and not data.empty else None) for ticker, data in histories.items()}
+    except Exception as e:
+        logger.error(f"Error fetching data for {', '.join(tickers)}: {e}")
+        return {ticker: None for ticker in tickers}
+
+def prepare_batch_prediction_data(stock_data_by_ticker):
+    """
+    Prepare prediction features for several tickers in one call.
+    
+    Each history goes through the shared add_technical_indicators, giving the
+    same per-ticker frames as prepare_prediction_data without writing them to disk.
+    
+    Args:
+        stock_data_by_ticker: Dictionary mapping ticker to historical DataFrame
+    
+    Returns:
+        Dictionary mapping each ticker to its prepared DataFrame (None if empty)
+    """
+    prepared = {ticker: None for ticker in stock_data_by_ticker}
+    for ticker, data in stock_data_by_ticker.items():
+        if data is None:
+            continue
+        df = add_technical_indicators(data.copy()).dropna()
+        if df.empty:
+            continue
+        df['Ticker'] = ticker
+        prepared[ticker] = df.reset_index()
+    return prepared
+
+def forecast_prices(model, histories, days=PREDICTION_DAYS):
+    """
+    Roll the model forward one day at a time for every ticker at once.
+    
+    Indicators are recomputed incrementally after each predicted close, and
+    models with a multi-day output are called only once.
+    
+    Args:
+        model: Loaded estimator
+        histories: List of historical price DataFrames, one per ticker
+        days: Number of days to forecast
+    
+    Returns:
+        List with one list of daily predicted prices per history
+    """
+    return ForecastEngine(model).forecast(histories, days).tolist()
+
+def check_horizon(horizon):
+    """Reject forecast horizons outside 1..MAX_PREDICTION_DAYS."""
+    if not 1 <= horizon <= MAX_PREDICTION_DAYS:
+        raise HTTPException(status_code=400, detail=f"Horizon must be between 1 and {MAX_PREDICTION_DAYS} days")
+
+def get_company_name(ticker):
+    """Look up the company's short name, falling back to the ticker while it is fetched."""
+    with STAGE_SECONDS.time(stage='metadata'):
+        return company_metadata.name(ticker)
+
+def build_prediction_response(ticker, prepared_data, raw_predictions):
+    """Create the /predict response for one ticker from its forecast."""
+    # The forecast starts from the last closing price
+    return forecast_response(ticker, get_company_name(ticker), prepared_data['Close'].iloc[-1], raw_predictions)
+
+def precomputed_prediction(ticker, horizon):
+    """
+    Return the update job's stored forecast when serving precomputed predictions.
+
+    The job stores the default horizon's forecast for every ticker with a
+    model, in the live response schema; other horizons, tickers without a
+    stored forecast and entries older than PREDICTION_MAX_AGE are computed live.
+    """
+    if PREDICTION_SERVING != 'precomputed':
+        return None
+    try:
+        prediction = prediction_store.get(ticker, horizon, max_age=PREDICTION_MAX_AGE)
+    except Exception as e:
+        logger.error(f"Error reading stored prediction for {ticker}: {e}")
+        prediction = None
+    PRECOMPUTED_LOOKUPS.inc(result='miss' if prediction is None else 'hit')
+    if prediction is None:
+        return None
+    return dict(prediction, source='precomputed')
+
+def prediction_cache_key(stock_data):
+    """Return the timestamp of the last market bar, used to key cached responses."""
+    return pd.Timestamp(stock_data.index[-1]).isoformat()
+
+def compute_prediction(ticker, model, stock_data, horizon=PREDICTION_DAYS):
+    """Build features, run the forecast and create the response."""
+    # Prepare data for prediction
+    with STAGE_SECONDS.time(stage='prepare'):
+        prepared_data = prepare_prediction_data(ticker, stock_data)
+    if prepared_data is None:
+        raise HTTPException(status_code=500, detail=f"Failed to prepare prediction data for {ticker}")
+    
+    # Forecast the horizon by rolling the model forward
+    with STAGE_SECONDS.time(stage='predict'):
+        raw_predictions = forecast_prices(model, [stock_data], horizon)[0]
+    
+    return build_prediction_response(ticker, prepared_data, raw_predictions)
+
 @app.post("/predict")
-def predict(request: PredictionRequest):
+async def predict(request: PredictionRequest):
     ticker = request.stock_ticker.upper()
+    start = time.perf_counter()
+    status = 500
     
     try:
         # Check if ticker is supported
-        supported_tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'TSLA', 'NVDA', 
-                            'JPM', 'V', 'WMT', 'DIS', 'NFLX', 'INTC', 'AMD', 'PYPL']
-        
-        if ticker not in supported_tickers:
-            raise HTTPException(status_code=400, detail=f"Ticker {ticker} is not supported. Supported tickers: {', '.join(supported_tickers)}")
-        
-        # Fetch latest stock data
-        stock_data = fetch_stock_data(ticker)
-        if stock_data is None:
-            raise HTTPException(status_code=500, detail=f"Failed to fetch data for {ticker}")
-        
-        # Prepare data for prediction
-        prepared_data = prepare_prediction_data(ticker, stock_data)
-        if prepared_data is None:
-            raise HTTPException(status_code=500, detail=f"Failed to prepare prediction data for {ticker}")
-        
-        # Load the model
-        model_path = os.path.join(os.path.dirname(__file__), 'live_models', f'{ticker}_model.joblib')
-        if not os.path.exists(model_path):
-            raise HTTPException(status_code=500, detail=f"Model not found for {ticker}")
-        
-        model = joblib.load(model_path)
-        logger.info(f"Loaded model for {ticker}")
-        
-        # Get the current price (last closing price)
-        current_price = prepared_data['Close'].iloc[-1]
-        
-        # Prepare data for prediction
-        X_features = prepared_data.drop(['Date', 'Ticker'], axis=1, errors='ignore')
+        if ticker not in SUPPORTED_TICKERS:
+            raise HTTPException(status_code=400, detail=f"Ticker {ticker} is not supported. See GET /tickers for the {len(SUPPORTED_TICKERS)} supported tickers")
+        check_horizon(request.horizon)
         
-        # Make prediction for next 30 days
-        # For models that predict one day at a time, we'll use an iterative approach
-        raw_predictions = []
-        next_day_data = X_features.iloc[-1:].copy()
+        # Precomputed mode answers from the update job's latest prediction
+        stored = precomputed_prediction(ticker, request.horizon)
+        if stored is not None:
+            status = 200
+            return stored
         
-        # Generate predictions for the next 30 days
-        for i in range(30):
-            # Predict the next day
-            next_day_pred = model.predict(next_day_data)[0]
-            raw_predictions.append(float(next_day_pred))
-            
-            # Update the data for the next prediction
-            # This is a simplified approach - in a real scenario, you'd update all features
-            next_day_data['Close'] = next_day_pred
-            # Update other features based on the new Close value
-            # (This is simplified and would need to be more sophisticated in production)
-        
-        # Calculate the final predicted price (30 days out)
-        predicted_price = raw_predictions[-1]
-        
-        # Calculate change percentage
-        change = ((predicted_price - current_price) / current_price) * 100
-        
-        # Get company name
+        # Get the preloaded model before doing any data work
+        await wait_for_models()
         try:
-            ticker_info = yf.Ticker(ticker).info
-            company_name = ticker_info.get('shortName', ticker)
-        except:
-            company_name = ticker
+            model = model_registry.get(ticker)
+        except ModelNotLoadedError as e:
+            raise HTTPException(status_code=503, detail=f"Model for {ticker} is unavailable: {e}")
         
-        # Create prediction response
-        prediction_response = {
-            'ticker': ticker,
-            'name': company_name,
-            'currentPrice': float(current_price),
-            'predictedPrice': float(predicted_price),
-            'change': float(change),
-            'confidence': 0.85,  # Higher confidence since we're using the ML model
-            'rawPredictions': raw_predictions,
-            'lastUpdated': datetime.now().isoformat(),
-            'method': 'ml_model',
-            'predictionDays': 30
-        }
+        async with stage_executors.slot():
+            # Fetch latest stock data on the I/O pool
+            stock_data = await stage_executors.run('fetch', fetch_stock_data, ticker)
+            if stock_data is None:
+                raise HTTPException(status_code=500, detail=f"Failed to fetch data for {ticker}")
+            
+            # Responses only change when a new bar arrives, so cache on the last bar
+            cache_key = (ticker, request.horizon, prediction_cache_key(stock_data))
+            # Concurrent misses wait on the event loop; only the first runs on the CPU pool
+            response = await response_cache.get_or_compute(cache_key, lambda: stage_executors.run(
+                'inference', compute_prediction, ticker, model, stock_data, request.horizon
+            ))
         
-        return prediction_response
+        # The name may have been fetched since the response was cached
+        status = 200
+        return dict(response, name=get_company_name(ticker))
         
     except HTTPException as e:
         # Re-raise HTTP exceptions
+        status = e.status_code
         raise
+    except StageTimeoutError as e:
+        status = 504
+        raise HTTPException(status_code=504, detail=f"Prediction for {ticker} timed out: {e}")
     except Exception as e:
         logger.error(f"Error generating prediction for {ticker}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate prediction: {str(e)}")
+    finally:
+        record_prediction(ticker, status)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint='/predict')
+
+def predict_fetched_batch(models_by_ticker, stock_data, results, horizon=PREDICTION_DAYS):
+    """
+    Build features and forecast every fetched ticker of a batch request.
+    
+    Args:
+        models_by_ticker: Dictionary mapping ticker to its loaded model
+        stock_data: Dictionary mapping ticker to its bars (None if the fetch failed)
+        results: Dictionary of per-ticker results, filled in place
+        horizon: Number of days to forecast
+    """
+    try:
+        with STAGE_SECONDS.time(stage='prepare'):
+            prepared = prepare_batch_prediction_data(stock_data)
+    except Exception as e:
+        logger.error(f"Error preparing batch prediction data: {e}")
+        prepared = {ticker: None for ticker in stock_data}
+    
+    # Group tickers by model so each model runs once per forecast step
+    groups = {}
+    for ticker, model in models_by_ticker.items():
+        cached = None
+        if stock_data.get(ticker) is not None:
+            cached = response_cache.get((ticker, horizon, prediction_cache_key(stock_data[ticker])))
+        if cached is not None:
+            results[ticker] = dict(cached, name=get_company_name(ticker), status=200)
+        elif stock_data.get(ticker) is None:
+            results[ticker] = {'ticker': ticker, 'status': 500, 'error': f"Failed to fetch data for {ticker}"}
+        elif prepared.get(ticker) is None:
+            results[ticker] = {'ticker': ticker, 'status': 500, 'error': f"Failed to prepare prediction data for {ticker}"}
+        else:
+            groups.setdefault(id(model), (model, []))[1].append(ticker)
+    
+    for model, group_tickers in groups.values():
+        try:
+            with STAGE_SECONDS.time(stage='predict'):
+                forecasts = forecast_prices(model, [stock_data[t] for t in group_tickers], horizon)
+            for ticker, raw_predictions in zip(group_tickers, forecasts):
+                response = build_prediction_response(ticker, prepared[ticker], raw_predictions)
+                response_cache.put((ticker, horizon, prediction_cache_key(stock_data[ticker])), response)
+                results[ticker] = dict(response, status=200)
+        except Exception as e:
+            logger.error(f"Error generating predictions for {', '.join(group_tickers)}: {e}")
+            for ticker in group_tickers:
+                results[ticker] = {'ticker': ticker, 'status': 500, 'error': f"Failed to generate prediction: {str(e)}"}
+
+@app.post("/predict/batch")
+async def predict_batch(request: BatchPredictionRequest):
+    """
+    Predict several tickers in one call.
+    
+    Data for all tickers is fetched with one bulk download, features are built
+    in one pass and tickers that share a model are forecast together. Each
+    ticker gets its own entry with an HTTP-style status and either the
+    prediction or an error message.
+    """
+    check_horizon(request.horizon)
+    start = time.perf_counter()
+    tickers = list(dict.fromkeys(t.upper() for t in request.stock_tickers))
+    results = {}
+    models_by_ticker = {}
+    
+    for ticker in tickers:
+        if ticker not in SUPPORTED_TICKERS:
+            results[ticker] = {'ticker': ticker, 'status': 400, 'error': f"Ticker {ticker} is not supported"}
+            continue
+        stored = precomputed_prediction(ticker, request.horizon)
+        if stored is not None:
+            results[ticker] = dict(stored, status=200)
+            continue
+        await wait_for_models()
+        try:
+            models_by_ticker[ticker] = model_registry.get(ticker)
+        except ModelNotLoadedError as e:
+            results[ticker] = {'ticker': ticker, 'status': 503, 'error': f"Model for {ticker} is unavailable: {e}"}
+    
+    if models_by_ticker:
+        async with stage_executors.slot():
+            try:
+                stock_data = await stage_executors.run('fetch', fetch_stock_data_batch, list(models_by_ticker))
+                await stage_executors.run('inference', predict_fetched_batch, models_by_ticker, stock_data, results, request.horizon)
+            except StageTimeoutError as e:
+                for ticker in models_by_ticker:
+                    results.setdefault(ticker, {'ticker': ticker, 'status': 504, 'error': f"Prediction timed out: {e}"})
+    
+    for ticker in tickers:
+        record_prediction(ticker, results[ticker]['status'])
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint='/predict/batch')
+    return {'predictions': [results[ticker] for ticker in tickers]}
+
+@app.get("/tickers")
+def tickers():
+    """List the supported tickers."""
+    return {'count': len(SUPPORTED_TICKERS), 'tickers': list(SUPPORTED_TICKERS)}
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the models are loaded and warm, 503 until then."""
+    is_ready = models_ready.is_set()
+    return JSONResponse({
+        'ready': is_ready,
+        'startupMode': STARTUP_MODE,
+        'models': len(model_registry),
+        'backends': {'onnxruntime': onnxruntime_available(), 'tensorflow': tensorflow_available()},
+        'startup': startup_report.as_dict(),
+    }, status_code=200 if is_ready else 503)
+
+@app.get("/models")
+def models():
+    """Report load time and memory for each preloaded model."""
+    return model_registry.stats()
+
+@app.get("/cache")
+def cache_stats():
+    """Report prediction cache hit/miss counters."""
+    return response_cache.stats()
+
+@app.get("/executors")
+def executor_stats():
+    """Report concurrency limits, in-flight requests and per-stage timings."""
+    return stage_executors.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Expose stage latencies, request counters and cache/model gauges to Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
 
 @app.get("/")
 def root():
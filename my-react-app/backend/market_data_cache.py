@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Market Data Cache
+
+Persistent local store of daily OHLCV bars backed by SQLite. History is served
+from disk and only the bars after the last stored date are downloaded, so a
+warm cache answers fetch_stock_data without any network calls.
+
+Run this script directly to seed the store from ml/raw_stock_data/*.csv.
+"""
+
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+from market_data_provider import create_provider, flatten_download, OHLCV_COLUMNS, RAW_STOCK_DATA_DIR
+
+logger = logging.getLogger('market_data_cache')
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'market_data', 'ohlcv.sqlite')
+# Replayed bars are kept apart from the live store
+REPLAY_DB_PATH = os.path.join(os.path.dirname(__file__), 'market_data', 'replay.sqlite')
+
+# Minimum time between two network refreshes of the same ticker (seconds)
+DEFAULT_REFRESH_INTERVAL = 15 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    ticker TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    PRIMARY KEY (ticker, date)
+);
+CREATE TABLE IF NOT EXISTS refreshes (
+    ticker TEXT PRIMARY KEY,
+    checked_at REAL NOT NULL
+);
+"""
+
+
+class MarketDataCache:
+    """SQLite-backed daily bar store with incremental refresh from a market data provider."""
+
+    def __init__(self, db_path=None, refresh_interval=DEFAULT_REFRESH_INTERVAL, provider=None):
+        self.provider = provider or create_provider()
+        self.db_path = db_path or (REPLAY_DB_PATH if self.provider.name == 'replay' else DEFAULT_DB_PATH)
+        self.refresh_interval = refresh_interval
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._schema_ready = False
+
+    def _ticker_locks(self, tickers):
+        """Return the per-ticker refresh locks in a consistent order."""
+        with self._locks_guard:
+            return [self._locks.setdefault(ticker, threading.Lock()) for ticker in sorted(set(tickers))]
+
+    def _connect(self):
+        if not self._schema_ready:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._schema_ready:
+            conn.executescript(SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    def last_date(self, ticker):
+        """Return the date of the last stored bar for the ticker, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(date) FROM bars WHERE ticker = ?", (ticker,)).fetchone()
+        return datetime.strptime(row[0], '%Y-%m-%d').date() if row and row[0] else None
+
+    def is_fresh(self, ticker, now=None):
+        """
+        Check whether the stored history can be served without a network call.
+
+        The store is fresh when it already holds the previous business day's
+        bar, or when it was refreshed less than refresh_interval seconds ago.
+        """
+        now = now or self.provider.now()
+        last_date = self.last_date(ticker)
+        if last_date is None:
+            return False
+        previous_session = (pd.Timestamp(now).normalize() - pd.offsets.BDay(1)).date()
+        if last_date >= previous_session:
+            return True
+        with self._connect() as conn:
+            row = conn.execute("SELECT checked_at FROM refreshes WHERE ticker = ?", (ticker,)).fetchone()
+        # Checks are timed on the provider's clock, so replayed dates age correctly
+        return bool(row) and 0 <= now.timestamp() - row[0] < self.refresh_interval
+
+    def store_bars(self, ticker, data):
+        """
+        Upsert daily bars for the ticker.
+
+        Args:
+            ticker: Stock ticker symbol
+            data: DataFrame indexed by date with Open/High/Low/Close/Volume columns
+
+        Returns:
+            Number of bars written
+        """
+        data = flatten_download(data).dropna(subset=['Close'])
+        rows = [
+            (ticker, pd.Timestamp(date).strftime('%Y-%m-%d'),
+             float(row.Open), float(row.High), float(row.Low), float(row.Close), float(row.Volume))
+            for date, row in data[OHLCV_COLUMNS].iterrows()
+        ]
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _mark_checked(self, ticker, now):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO refreshes VALUES (?, ?)", (ticker, now.timestamp()))
+
+    def refresh(self, ticker, days=60, now=None):
+        """Download only the bars newer than the last stored date."""
+        return self.refresh_many([ticker], days, now)
+
+    def refresh_many(self, tickers, days=60, now=None):
+        """
+        Download the bars newer than each ticker's last stored date in one call.
+
+        The request starts at the earliest missing date across the tickers and
+        bars that are already stored are simply overwritten. Bars dated on or
+        after now's date are dropped: during the session that bar is still
+        moving, and once stored its date would count as covered and never be
+        downloaded again.
+
+        Returns:
+            Number of bars written
+        """
+        now = now or self.provider.now()
+        start_dates = {}
+        for ticker in tickers:
+            last_date = self.last_date(ticker)
+            if last_date is None:
+                start_date = now - timedelta(days=days)
+            else:
+                start_date = datetime.combine(last_date + timedelta(days=1), datetime.min.time())
+            if start_date.date() < now.date():
+                start_dates[ticker] = start_date
+            else:
+                self._mark_checked(ticker, now)
+
+        if not start_dates:
+            return 0
+
+        start_date = min(start_dates.values())
+        symbols = list(start_dates)
+        logger.info(f"Refreshing {', '.join(symbols)} bars from {start_date.date()} to {now.date()}")
+        data = self.provider.download(symbols, start_date, now)
+
+        session_start = pd.Timestamp(now.date())
+        written = 0
+        for ticker in symbols:
+            ticker_data = data.get(ticker)
+            if ticker_data is not None:
+                ticker_data = ticker_data[pd.DatetimeIndex(ticker_data.index).tz_localize(None) < session_start]
+            if ticker_data is not None and not ticker_data.empty:
+                written += self.store_bars(ticker, ticker_data)
+            self._mark_checked(ticker, now)
+        logger.info(f"Stored {written} new bars for {len(symbols)} tickers")
+        return written
+
+    def _read_windows(self, tickers, days, now):
+        """Read the requested window for several tickers with a single query."""
+        start = (now - timedelta(days=days)).strftime('%Y-%m-%d')
+        end = now.strftime('%Y-%m-%d')
+        placeholders = ', '.join('?' for _ in tickers)
+        with self._connect() as conn:
+            data = pd.read_sql_query(
+                "SELECT ticker, date, open, high, low, close, volume FROM bars "
+                f"WHERE ticker IN ({placeholders}) AND date >= ? AND date < ? ORDER BY ticker, date",
+                conn, params=(*tickers, start, end), parse_dates=['date'],
+            )
+        data.columns = ['Ticker', 'Date'] + OHLCV_COLUMNS
+        windows = {ticker: None for ticker in tickers}
+        for ticker, group in data.groupby('Ticker', sort=False):
+            windows[ticker] = group.drop(columns='Ticker').set_index('Date')
+        return windows
+
+    def get_history(self, ticker, days=60, now=None):
+        """
+        Return the last `days` calendar days of bars, refreshing if stale.
+
+        Args:
+            ticker: Stock ticker symbol
+            days: Number of days of historical data to return (default: 60)
+            now: Reference time (default: current time)
+
+        Returns:
+            DataFrame indexed by Date with OHLCV columns, or None if empty
+        """
+        return self.get_histories([ticker], days, now)[ticker]
+
+    def get_histories(self, tickers, days=60, now=None):
+        """
+        Return the last `days` calendar days of bars for several tickers.
+
+        All stale tickers are refreshed together with a single download.
+
+        Returns:
+            Dictionary mapping each ticker to its DataFrame, or None if empty
+        """
+        now = now or self.provider.now()
+        # Lock only the requested tickers so unrelated refreshes run concurrently
+        locks = self._ticker_locks(tickers)
+        for lock in locks:
+            lock.acquire()
+        try:
+            stale = [ticker for ticker in tickers if not self.is_fresh(ticker, now)]
+            if stale:
+                try:
+                    self.refresh_many(stale, days, now)
+                except Exception as e:
+                    logger.warning(f"Could not refresh {', '.join(stale)}, serving stored bars: {e}")
+                    # Back off until the next refresh interval instead of retrying per request
+                    for ticker in stale:
+                        self._mark_checked(ticker, now)
+        finally:
+            for lock in locks:
+                lock.release()
+
+        return self._read_windows(tickers, days, now)
+
+    def seed_from_csv(self, csv_path, ticker=None):
+        """Load bars from a CSV in the ml/raw_stock_data layout."""
+        ticker = ticker or os.path.splitext(os.path.basename(csv_path))[0].upper()
+        data = pd.read_csv(csv_path, parse_dates=['Date']).set_index('Date')
+        written = self.store_bars(ticker, data)
+        logger.info(f"Seeded {written} bars for {ticker} from {csv_path}")
+        return written
+
+    def seed_from_directory(self, directory=RAW_STOCK_DATA_DIR):
+        """Seed the store from every CSV in a directory."""
+        total = 0
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith('.csv'):
+                total += self.seed_from_csv(os.path.join(directory, file_name))
+        return total
+
+
+def main():
+    """Seed the market data store from raw CSV files."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Seed the local OHLCV market data store')
+    parser.add_argument('--source', default=RAW_STOCK_DATA_DIR, help='Directory of raw stock CSV files')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Path to the SQLite store')
+    args = parser.parse_args()
+
+    total = MarketDataCache(args.db).seed_from_directory(args.source)
+    logger.info(f"Seeded {total} bars into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Market Data Providers
+
+Every network read of market data goes through a provider, so the pipeline can
+run against Yahoo or fully offline. A provider exposes:
+
+    now()                          the reference time for "latest" data
+    download(tickers, start, end)  daily OHLCV bars per ticker
+    intraday(tickers, start, end)  1-minute OHLCV bars per ticker
+    info(ticker)                   company metadata (INFO_FIELDS)
+
+YFinanceProvider talks to Yahoo. ReplayProvider serves ml/raw_stock_data/*.csv
+(and deterministic synthetic series for other tickers) as of a fixed date,
+with optional injected latency, for load tests and profiling. Its minute
+bars are a deterministic session on the replay date, starting from the last
+daily close.
+
+The provider is chosen with MARKET_DATA_PROVIDER ('yfinance' or 'replay').
+Replay is configured with MARKET_DATA_REPLAY_NOW (YYYY-MM-DD, default: the
+day after the last bar in the source), MARKET_DATA_REPLAY_LATENCY (seconds
+per request) and MARKET_DATA_REPLAY_SOURCE (CSV directory).
+"""
+
+import os
+import time
+import zlib
+import logging
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('market_data_provider')
+
+RAW_STOCK_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml', 'raw_stock_data')
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Company metadata fields returned by info()
+INFO_FIELDS = ('shortName', 'marketCap', 'sector', 'industry')
+
+# First date of synthetic replay series
+SYNTHETIC_START = '2015-01-02'
+
+# Regular trading session, in exchange time
+SESSION_OPEN = '09:30'
+SESSION_MINUTES = 390
+
+
+def flatten_download(data):
+    """Drop the ticker level yfinance adds to the columns of a download."""
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy()
+        data.columns = data.columns.get_level_values(0)
+    return data
+
+
+def split_download(data, ticker):
+    """
+    Return one ticker's OHLCV columns from a (possibly multi-symbol) download.
+
+    Returns:
+        DataFrame with flat OHLCV columns, or None if the ticker is absent
+    """
+    if data is None or data.empty:
+        return None
+    if not isinstance(data.columns, pd.MultiIndex):
+        return data
+    for level in range(data.columns.nlevels):
+        if ticker in data.columns.get_level_values(level):
+            return data.xs(ticker, axis=1, level=level).dropna(how='all')
+    return None
+
+
+class YFinanceProvider:
+    """
+    Live market data from Yahoo Finance.
+
+    yfinance is imported on first use; with its dependencies it is one of the
+    slowest imports at startup, and replay runs never need it.
+    """
+
+    name = 'yfinance'
+
+    def now(self):
+        return datetime.now()
+
+    def download(self, tickers, start, end):
+        """
+        Download daily bars for several tickers in one request.
+
+        Returns:
+            Dictionary mapping each ticker to its DataFrame, or None if absent
+        """
+        import yfinance as yf
+        tickers = list(tickers)
+        data = yf.download(tickers if len(tickers) > 1 else tickers[0], start=start, end=end, group_by='ticker')
+        return {ticker: split_download(data, ticker) for ticker in tickers}
+
+    def intraday(self, tickers, start=None, end=None):
+        """
+        Download today's 1-minute bars for several tickers in one request.
+
+        Args:
+            tickers: Ticker symbols
+            start: Optional first minute to return (inclusive)
+            end: Optional minute to stop before
+
+        Returns:
+            Dictionary mapping each ticker to its DataFrame indexed by minute in
+            exchange time (without a timezone), or None if absent
+        """
+        import yfinance as yf
+        tickers = list(tickers)
+        data = yf.download(tickers if len(tickers) > 1 else tickers[0], period='1d', interval='1m',
+                           group_by='ticker', progress=False)
+        if data is not None and getattr(data.index, 'tz', None) is not None:
+            data.index = data.index.tz_localize(None)
+        bars = {}
+        for ticker in tickers:
+            frame = split_download(data, ticker)
+            if frame is not None:
+                frame = frame.dropna(subset=['Close'])
+                if start is not None:
+                    frame = frame[frame.index >= pd.Timestamp(start)]
+                if end is not None:
+                    frame = frame[frame.index < pd.Timestamp(end)]
+            bars[ticker] = frame
+        return bars
+
+    def info(self, ticker):
+        """Return the INFO_FIELDS of the ticker's yfinance info."""
+        import yfinance as yf
+        info = yf.Ticker(ticker).info
+        return {field: info.get(field) for field in INFO_FIELDS}
+
+
+class ReplayProvider:
+    """
+    Offline market data replayed from CSV files as of a fixed date.
+
+    Tickers without a CSV get a deterministic random-walk series (seeded from
+    the ticker symbol) when synthetic is enabled, so universes of any size
+    can be replayed.
+    """
+
+    name = 'replay'
+
+    def __init__(self, source=RAW_STOCK_DATA_DIR, as_of=None, latency=0.0, synthetic=True):
+        self.source = source
+        self.as_of = pd.Timestamp(as_of) if as_of else None
+        self.latency = latency
+        self.synthetic = synthetic
+        self.requests = 0
+        self._series = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _csv_path(self, ticker):
+        return os.path.join(self.source, f'{ticker}.csv')
+
+    def now(self):
+        """Return the replay clock: as_of, or the day after the last CSV bar."""
+        if self.as_of is None:
+            last_dates = [self._load(name[:-4]).index[-1] for name in os.listdir(self.source)
+                          if name.endswith('.csv')]
+            self.as_of = (max(last_dates) if last_dates else pd.Timestamp.now().normalize()) + timedelta(days=1)
+        return self.as_of.to_pydatetime()
+
+    def _load(self, ticker):
+        with self._lock:
+            if ticker in self._series:
+                return self._series[ticker]
+        path = self._csv_path(ticker)
+        if os.path.exists(path):
+            series = pd.read_csv(path, parse_dates=['Date'], index_col='Date')[OHLCV_COLUMNS]
+        elif self.synthetic:
+            series = self._synthesize(ticker)
+        else:
+            series = None
+        with self._lock:
+            self._series[ticker] = series
+        return series
+
+    def _synthesize(self, ticker):
+        end = self.as_of if self.as_of is not None else pd.Timestamp.now().normalize()
+        dates = pd.bdate_range(SYNTHETIC_START, end, name='Date')
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+        close = rng.uniform(20, 500) * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+        open_ = close * (1 + rng.normal(0, 0.005, len(dates)))
+        spread = np.abs(rng.normal(0, 0.01, len(dates)))
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * (1 + spread),
+            'Low': np.minimum(open_, close) * (1 - spread),
+            'Close': close,
+            'Volume': rng.uniform(1e6, 5e7, len(dates)).round(),
+        }, index=dates)
+
+    def download(self, tickers, start, end):
+        """
+        Return the bars with start <= date < end that exist as of the replay clock.
+
+        Sleeps for the configured latency once per request to mimic a network call.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        self.requests += 1
+        start = pd.Timestamp(start).normalize()
+        end = min(pd.Timestamp(end), pd.Timestamp(self.now()) + timedelta(days=1))
+        data = {}
+        for ticker in tickers:
+            series = self._load(ticker)
+            data[ticker] = None if series is None else series[(series.index >= start) & (series.index < end)]
+        return data
+
+    def _session(self, ticker, date):
+        """Synthesize a deterministic minute session for the date from the last daily close."""
+        with self._lock:
+            if (ticker, date) in self._sessions:
+                return self._sessions[ticker, date]
+        series = self._load(ticker)
+        before = None if series is None else series[series.index < date]
+        if before is None or before.empty:
+            return None
+        last = before.iloc[-1]
+        rng = np.random.default_rng(zlib.crc32(f'{ticker} {date.date()}'.encode()))
+        minutes = pd.date_range(date + pd.Timedelta(SESSION_OPEN + ':00'), periods=SESSION_MINUTES, freq='min',
+                                name='Datetime')
+        open_ = float(last['Close']) * (1 + rng.normal(0, 0.005))
+        close = open_ * np.exp(np.cumsum(rng.normal(0, 0.02 / np.sqrt(SESSION_MINUTES), SESSION_MINUTES)))
+        previous = np.concatenate([[open_], close[:-1]])
+        spread = np.abs(rng.normal(0, 0.0005, SESSION_MINUTES))
+        session = pd.DataFrame({
+            'Open': previous,
+            'High': np.maximum(previous, close) * (1 + spread),
+            'Low': np.minimum(previous, close) * (1 - spread),
+            'Close': close,
+            'Volume': (float(last['Volume']) / SESSION_MINUTES * rng.uniform(0.5, 1.5, SESSION_MINUTES)).round(),
+        }, index=minutes)
+        with self._lock:
+            self._sessions[ticker, date] = session
+        return session
+
+    def intraday(self, tickers, start=None, end=None):
+        """
+        Return the replay date's minute bars with start <= minute < end.
+
+        Sleeps for the configured latency once per request to mimic a network call.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        self.requests += 1
+        date = pd.Timestamp(self.now()).normalize()
+        data = {}
+        for ticker in tickers:
+            session = self._session(ticker, date)
+            if session is not None:
+                if start is not None:
+                    session = session[session.index >= pd.Timestamp(start)]
+                if end is not None:
+                    session = session[session.index < pd.Timestamp(end)]
+            data[ticker] = session
+        return data
+
+    def info(self, ticker):
+        """Return placeholder metadata using the ticker as the company name."""
+        if self.latency:
+            time.sleep(self.latency)
+        self.requests += 1
+        return {'shortName': ticker, 'marketCap': None, 'sector': None, 'industry': None}
+
+
+def create_provider(name=None):
+    """
+    Create the market data provider selected by MARKET_DATA_PROVIDER.
+
+    Args:
+        name: 'yfinance' or 'replay' (default: from the environment, else yfinance)
+    """
+    name = name or os.environ.get('MARKET_DATA_PROVIDER', 'yfinance')
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'replay':
+        provider = ReplayProvider(
+            source=os.environ.get('MARKET_DATA_REPLAY_SOURCE', RAW_STOCK_DATA_DIR),
+            as_of=os.environ.get('MARKET_DATA_REPLAY_NOW') or None,
+            latency=float(os.environ.get('MARKET_DATA_REPLAY_LATENCY', 0)),
+        )
+        logger.info(f"Replaying market data from {provider.source} as of {provider.now().date()}")
+        return provider
+    raise ValueError(f"Unknown market data provider {name!r}, expected 'yfinance' or 'replay'")
@@ -0,0 +1,196 @@
+"""
+Model Registry
+
+Loads every model in live_models/ once and keeps the estimators in memory so
+request handlers can reuse them instead of calling joblib.load per request.
+
+Models exported with onnx_models.py are served with ONNX Runtime, which avoids
+importing TensorFlow; the native .joblib file is the fallback. MODEL_BACKEND
+selects 'onnx', 'joblib' or 'auto' (the default: ONNX when an export exists and
+onnxruntime is installed).
+"""
+
+import os
+import time
+import logging
+import tracemalloc
+import importlib.util
+from functools import lru_cache
+from onnx_models import OnnxModel, onnxruntime_available, ONNX_SUFFIX
+
+logger = logging.getLogger('model_registry')
+
+LIVE_MODELS_DIR = os.path.join(os.path.dirname(__file__), 'live_models')
+MODEL_SUFFIX = '_model.joblib'
+
+# Inference backend: 'auto', 'onnx' or 'joblib'
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'auto')
+
+
+class ModelNotLoadedError(Exception):
+    """Raised when a model was not available when the registry was loaded."""
+
+
+@lru_cache(maxsize=None)
+def tensorflow_available():
+    """
+    Return True if TensorFlow is installed, without importing it.
+
+    The result is cached, so callers on the per-ticker path pay for the check once.
+    """
+    return importlib.util.find_spec('tensorflow') is not None
+
+
+def model_paths(models_dir, ticker, backend=MODEL_BACKEND):
+    """
+    Return the model files to try for a ticker, preferred backend first.
+
+    Returns:
+        List of (backend, path) pairs for the files that exist
+    """
+    candidates = []
+    onnx_file = os.path.join(models_dir, f'{ticker}{ONNX_SUFFIX}')
+    if backend != 'joblib' and os.path.exists(onnx_file) and onnxruntime_available():
+        candidates.append(('onnx', onnx_file))
+    native_file = os.path.join(models_dir, f'{ticker}{MODEL_SUFFIX}')
+    if backend != 'onnx' and os.path.exists(native_file):
+        candidates.append(('joblib', native_file))
+    return candidates
+
+
+def load_model(models_dir, ticker, backend=MODEL_BACKEND):
+    """
+    Load a ticker's model, falling back to the native file if the ONNX export fails.
+
+    Returns:
+        Tuple of (model, backend, path)
+
+    Raises:
+        FileNotFoundError: If there is no model file for the selected backend
+    """
+    candidates = model_paths(models_dir, ticker, backend)
+    if not candidates:
+        raise FileNotFoundError(f"No {'' if backend == 'auto' else backend + ' '}model file found for {ticker} in {models_dir}")
+    for index, (name, path) in enumerate(candidates):
+        try:
+            if name == 'onnx':
+                model = OnnxModel(path)
+            else:
+                # joblib is only needed for native models, which also pull in TensorFlow
+                import joblib
+                model = joblib.load(path)
+            return model, name, path
+        except Exception as e:
+            if index == len(candidates) - 1:
+                raise
+            logger.warning(f"Could not load {path}, falling back to {candidates[index + 1][1]}: {e}")
+
+
+class ModelRegistry:
+    """
+    In-process cache of the live models, keyed by ticker.
+
+    Each loaded model is stored together with the time it took to deserialize
+    and the Python heap memory allocated while loading it.
+    """
+
+    def __init__(self, models_dir=LIVE_MODELS_DIR, backend=MODEL_BACKEND):
+        self.models_dir = models_dir
+        self.backend = backend
+        self._models = {}
+        self._stats = {}
+        self._errors = {}
+        self.loaded_at = None
+
+    def load_all(self, expected_tickers=None):
+        """
+        Load the model of every ticker with a *_model.joblib or *_model.onnx
+        file in the models directory.
+
+        Args:
+            expected_tickers: Optional list of tickers that should have a model.
+                Any ticker without a model file is recorded as missing.
+
+        Returns:
+            Number of models loaded successfully
+        """
+        try:
+            model_files = os.listdir(self.models_dir)
+        except Exception as e:
+            logger.error(f"Error listing models in {self.models_dir}: {e}")
+            model_files = []
+        tickers = sorted({f[:-len(suffix)] for f in model_files for suffix in (MODEL_SUFFIX, ONNX_SUFFIX)
+                          if f.endswith(suffix)})
+
+        for ticker in tickers:
+            self.load(ticker)
+
+        missing = [t for t in expected_tickers or [] if t not in self._models and t not in self._errors]
+        for ticker in missing:
+            self._errors[ticker] = f"No model file found for {ticker} in {self.models_dir}"
+        if missing:
+            # One line for the whole universe rather than one per ticker
+            shown = ', '.join(missing[:10]) + (f" and {len(missing) - 10} more" if len(missing) > 10 else '')
+            logger.warning(f"No model file found in {self.models_dir} for {len(missing)} tickers: {shown}")
+
+        self.loaded_at = time.time()
+        logger.info(f"Model registry loaded {len(self._models)}/{len(tickers)} models from {self.models_dir}")
+        return len(self._models)
+
+    def load(self, ticker):
+        """Load a single model into the registry and record its load stats."""
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        try:
+            baseline, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            model, backend, model_path = load_model(self.models_dir, ticker, self.backend)
+            load_seconds = time.perf_counter() - start
+            current, _ = tracemalloc.get_traced_memory()
+        except Exception as e:
+            self._errors[ticker] = f"Failed to load model for {ticker}: {e}"
+            logger.error(self._errors[ticker])
+            return None
+        finally:
+            if not already_tracing:
+                tracemalloc.stop()
+
+        self._models[ticker] = model
+        self._errors.pop(ticker, None)
+        self._stats[ticker] = {
+            'path': model_path,
+            'backend': backend,
+            'fileBytes': os.path.getsize(model_path),
+            'loadSeconds': load_seconds,
+            'memoryBytes': max(current - baseline, 0),
+        }
+        logger.info(f"Loaded {backend} model for {ticker} in {load_seconds * 1000:.1f} ms")
+        return model
+
+    def get(self, ticker):
+        """
+        Return the preloaded model for the ticker.
+
+        Raises:
+            ModelNotLoadedError: If the model was missing or failed to load
+        """
+        model = self._models.get(ticker)
+        if model is None:
+            reason = self._errors.get(ticker, f"No model loaded for {ticker}")
+            raise ModelNotLoadedError(reason)
+        return model
+
+    def __contains__(self, ticker):
+        return ticker in self._models
+
+    def __len__(self):
+        return len(self._models)
+
+    def stats(self):
+        """Return load time and memory per model plus any load errors."""
+        return {
+            'loadedAt': self.loaded_at,
+            'models': dict(self._stats),
+            'errors': dict(self._errors),
+        }
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+ONNX Models
+
+Compiles the live models to ONNX so the API and the update job can run them
+with ONNX Runtime on CPU instead of importing TensorFlow. Exported files sit
+next to the originals as live_models/{TICKER}_model.onnx; the .joblib files
+stay the source of truth and the fallback.
+
+Keras models are exported with Keras' own ONNX exporter. scikit-learn
+estimators are converted with skl2onnx when it is installed.
+
+Run this script after updating live_models/ to export every model and check
+that ONNX Runtime reproduces the native predictions:
+
+    python onnx_models.py                  # export, then check parity
+    python onnx_models.py --check-only     # check existing exports
+    python onnx_models.py --best-effort    # deploy builds: never fail the build
+
+With --best-effort a model that cannot be exported or does not match is left
+without an .onnx file, so it is served from its .joblib file, and the script
+exits 0. Keras' exporter needs tf2onnx, which is not pinned in
+requirements.txt (it pins protobuf 3.20, which conflicts with the
+protobuf 5 pinned there).
+"""
+
+import os
+import sys
+import glob
+import logging
+import argparse
+import importlib.util
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('onnx_models')
+
+LIVE_MODELS_DIR = os.path.join(os.path.dirname(__file__), 'live_models')
+RAW_STOCK_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml', 'raw_stock_data')
+NATIVE_SUFFIX = '_model.joblib'
+ONNX_SUFFIX = '_model.onnx'
+
+# ONNX Runtime computes in float32, so predictions may differ from the native
+# model by rounding; prices are compared with this relative tolerance
+PARITY_TOLERANCE = 1e-4
+
+# Rows of each raw stock CSV used for the parity check
+PARITY_ROWS = 250
+
+# Threads per inference session. Requests already run in parallel on the
+# executor pool, so one thread per session keeps single-row latency lowest.
+INTRA_OP_THREADS = int(os.environ.get('ONNX_INTRA_OP_THREADS', 1))
+
+
+@lru_cache(maxsize=None)
+def onnxruntime_available():
+    """Return True if onnxruntime is installed, without importing it."""
+    return importlib.util.find_spec('onnxruntime') is not None
+
+
+class OnnxModel:
+    """
+    ONNX Runtime session with the parts of the Keras model interface the
+    forecast code uses: input_shape, output_shape, predict and predict_on_batch.
+    """
+
+    def __init__(self, path, threads=INTRA_OP_THREADS):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self._input_name = model_input.name
+        # Symbolic dimensions (the batch size) are reported as strings
+        self.input_shape = tuple(d if isinstance(d, int) else None for d in model_input.shape)
+        self.output_shape = tuple(d if isinstance(d, int) else None for d in self.session.get_outputs()[0].shape)
+
+    def predict(self, features, **kwargs):
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        return self.session.run(None, {self._input_name: features})[0]
+
+    predict_on_batch = predict
+
+
+def onnx_path(native_path):
+    """Return the ONNX file name for a native *_model.joblib file."""
+    return native_path[:-len(NATIVE_SUFFIX)] + ONNX_SUFFIX
+
+
+def export_model(model, path):
+    """
+    Write a loaded model to an ONNX file.
+
+    Args:
+        model: Keras model or scikit-learn estimator
+        path: Output .onnx path
+
+    Raises:
+        ValueError: If the model type cannot be exported
+    """
+    if hasattr(model, 'export') and hasattr(model, 'input_shape'):
+        # Unpickled Keras models are not traced until they are first called
+        model.predict_on_batch(np.zeros((1,) + tuple(model.input_shape[1:]), dtype=np.float32))
+        model.export(path, format='onnx')
+        return
+    if hasattr(model, 'n_features_in_'):
+        try:
+            from skl2onnx import to_onnx
+        except ImportError:
+            raise ValueError("skl2onnx is required to export scikit-learn models")
+        onnx_model = to_onnx(model, np.zeros((1, model.n_features_in_), dtype=np.float32))
+        with open(path, 'wb') as f:
+            f.write(onnx_model.SerializeToString())
+        return
+    raise ValueError(f"Cannot export {type(model).__name__} to ONNX")
+
+
+def parity_inputs(model, source=RAW_STOCK_DATA_DIR, rows=PARITY_ROWS):
+    """
+    Build model inputs from the last rows of every raw stock CSV.
+
+    Returns:
+        Array in the model's input layout
+    """
+    from indicators import add_technical_indicators
+    from forecast_engine import model_inputs
+    batches = []
+    for path in sorted(glob.glob(os.path.join(source, '*.csv'))):
+        history = pd.read_csv(path, parse_dates=['Date'], index_col='Date').iloc[-rows:]
+        batches.append(model_inputs(model, add_technical_indicators(history)))
+    return np.concatenate(batches)
+
+
+def check_parity(native_model, onnx_model, inputs):
+    """
+    Compare the predictions of a native model and its ONNX export.
+
+    Returns:
+        Largest relative difference between the two sets of predictions
+    """
+    # predict_on_batch skips Keras' progress bar
+    native_predict = getattr(native_model, 'predict_on_batch', None) or native_model.predict
+    expected = np.asarray(native_predict(inputs), dtype=np.float64).reshape(len(inputs), -1)
+    actual = np.asarray(onnx_model.predict(inputs), dtype=np.float64).reshape(len(inputs), -1)
+    return float(np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1e-12)))
+
+
+def main():
+    """Export the live models to ONNX and check their predictions."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Export the live models to ONNX and check parity')
+    parser.add_argument('tickers', nargs='*', help='Tickers to export (default: every model in the directory)')
+    parser.add_argument('--models-dir', default=LIVE_MODELS_DIR, help='Directory of *_model.joblib files')
+    parser.add_argument('--check-only', action='store_true', help='Check existing exports without re-exporting')
+    parser.add_argument('--tolerance', type=float, default=PARITY_TOLERANCE, help='Allowed relative difference')
+    parser.add_argument('--best-effort', action='store_true',
+                        help='Remove failed exports so those models fall back to joblib, and exit 0')
+    args = parser.parse_args()
+
+    import joblib
+    native_paths = sorted(glob.glob(os.path.join(args.models_dir, f'*{NATIVE_SUFFIX}')))
+    if args.tickers:
+        wanted = {ticker.upper() for ticker in args.tickers}
+        native_paths = [p for p in native_paths if os.path.basename(p)[:-len(NATIVE_SUFFIX)].upper() in wanted]
+
+    failures = 0
+    for native_path in native_paths:
+        ticker = os.path.basename(native_path)[:-len(NATIVE_SUFFIX)].upper()
+        path = onnx_path(native_path)
+        # Only an export written or checked by this run is removed on failure
+        checked = False
+        try:
+            native_model = joblib.load(native_path)
+            checked = True
+            if not args.check_only:
+                export_model(native_model, path)
+            difference = check_parity(native_model, OnnxModel(path), parity_inputs(native_model))
+            if difference > args.tolerance:
+                raise ValueError(f"ONNX predictions differ by up to {difference:.2e} (tolerance {args.tolerance:.0e})")
+        except Exception as e:
+            failures += 1
+            logger.error(f"{ticker}: {e}")
+            if args.best_effort and checked and os.path.exists(path):
+                # A missing export makes the loaders use the .joblib file
+                os.remove(path)
+                logger.warning(f"{ticker}: removed {path}, the model will be served from {native_path}")
+            continue
+        logger.info(f"{ticker}: {path} matches the native model (max relative difference {difference:.2e})")
+    if failures and args.best_effort:
+        logger.warning(f"{failures}/{len(native_paths)} models were not exported and will run on their joblib files")
+        sys.exit(0)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
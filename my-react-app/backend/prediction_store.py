@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Prediction Store
+
+Local SQLite store of the latest forecast per ticker and horizon.
+update_predictions.py writes the default horizon's forecast of every ticker
+with a model here, in the API's /predict response schema, and the API can
+answer /predict from it with a single primary-key lookup instead of fetching
+bars and running the model (PREDICTION_SERVING=precomputed).
+
+The database uses WAL journaling so a batch run writing predictions never
+blocks the API reading them, and each thread keeps its connection open.
+
+Run this script directly to list the stored forecasts and their age.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+logger = logging.getLogger('prediction_store')
+
+DEFAULT_DB_PATH = os.environ.get('PREDICTION_STORE_PATH') or \
+    os.path.join(os.path.dirname(__file__), 'market_data', 'predictions.sqlite')
+# Predictions made from replayed market data are kept apart from the live store
+REPLAY_DB_PATH = os.path.join(os.path.dirname(__file__), 'market_data', 'replay_predictions.sqlite')
+
+# Oldest prediction served by default: a daily update run plus two hours of slack
+DEFAULT_MAX_AGE = 26 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    ticker TEXT NOT NULL,
+    horizon INTEGER NOT NULL,
+    computed_at REAL NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (ticker, horizon)
+);
+"""
+
+
+class PredictionStore:
+    """Latest forecast per ticker and horizon, with the time it was computed."""
+
+    def __init__(self, db_path=None, provider=None):
+        replay = provider is not None and provider.name == 'replay'
+        self.db_path = db_path or (REPLAY_DB_PATH if replay else DEFAULT_DB_PATH)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        with self._schema_lock:
+            if not self._schema_ready:
+                os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            if not self._schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+        self._local.conn = conn
+        return conn
+
+    def put_many(self, predictions, computed_at=None):
+        """
+        Store forecasts, replacing each ticker's previous entry for the horizon.
+
+        Args:
+            predictions: Iterable of /predict responses; the horizon is taken
+                from their 'predictionDays'
+            computed_at: Optional UNIX time of the predictions (default: now)
+
+        Returns:
+            Number of predictions written
+        """
+        computed_at = time.time() if computed_at is None else computed_at
+        rows = [(p['ticker'], int(p['predictionDays']), computed_at, json.dumps(p, default=str))
+                for p in predictions if p]
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def put(self, prediction, computed_at=None):
+        """Store a single prediction."""
+        return self.put_many([prediction], computed_at)
+
+    def get(self, ticker, horizon, max_age=DEFAULT_MAX_AGE, now=None):
+        """
+        Return the stored forecast for a ticker and horizon if it is recent enough.
+
+        Args:
+            ticker: Stock ticker symbol
+            horizon: Number of forecast days
+            max_age: Oldest acceptable entry in seconds, or None for any age
+            now: Optional UNIX time used for the age check
+
+        Returns:
+            Prediction dictionary with computedAt added, or None if there is no
+            entry for the ticker and horizon or it is older than max_age
+        """
+        row = self._connect().execute(
+            "SELECT computed_at, payload FROM forecasts WHERE ticker = ? AND horizon = ?",
+            (ticker, horizon)).fetchone()
+        if row is None:
+            return None
+        computed_at, payload = row
+        now = time.time() if now is None else now
+        if max_age is not None and now - computed_at > max_age:
+            return None
+        prediction = json.loads(payload)
+        prediction['computedAt'] = datetime.fromtimestamp(computed_at).isoformat()
+        return prediction
+
+    def ages(self, now=None):
+        """Return the age in seconds of every stored forecast, keyed by (ticker, horizon)."""
+        now = time.time() if now is None else now
+        rows = self._connect().execute(
+            "SELECT ticker, horizon, computed_at FROM forecasts ORDER BY ticker, horizon").fetchall()
+        return {(ticker, horizon): now - computed_at for ticker, horizon, computed_at in rows}
+
+
+def main():
+    """List the stored forecasts and how old they are."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Inspect the local prediction store')
+    parser.add_argument('--path', default=DEFAULT_DB_PATH, help='Prediction store file')
+    parser.add_argument('--max-age', type=float, default=DEFAULT_MAX_AGE, help='Age in seconds reported as stale')
+    args = parser.parse_args()
+
+    ages = PredictionStore(args.path).ages()
+    for (ticker, horizon), age in ages.items():
+        logger.info(f"{ticker:<8} {horizon:>3}d {age / 3600:8.1f} h{'  STALE' if age > args.max_age else ''}")
+    logger.info(f"{len(ages)} forecasts in {args.path}")
+
+
+if __name__ == "__main__":
+    main()
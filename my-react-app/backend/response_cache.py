@@ -0,0 +1,136 @@
+"""
+Response Cache
+
+Size-bounded LRU cache with a TTL for prediction responses. Concurrent misses
+for the same key are coalesced (single-flight): the first caller computes the
+value and the others wait for its result instead of repeating the work.
+Waiting happens on the event loop, so coalesced requests never hold an
+executor thread.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger('response_cache')
+
+DEFAULT_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 300))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_SIZE', 256))
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU cache with single-flight computation."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        _, expires_at = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key):
+        """Return the cached value for the key, or None if absent or expired."""
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_compute(self, key, compute):
+        """
+        Return the cached value, computing it once if missing.
+
+        If another request is already computing the same key, await its result
+        (or its exception) on the event loop. Exceptions are not cached; if the
+        computing request is cancelled, a waiting request takes over.
+
+        Args:
+            key: Hashable cache key
+            compute: Zero-argument coroutine function producing the value, e.g.
+                one that submits the work to an executor
+        """
+        while True:
+            with self._lock:
+                entry = self._lookup(key, time.monotonic())
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+                flight = self._flights.get(key)
+                if flight is None:
+                    self.misses += 1
+                    flight = self._flights[key] = asyncio.get_running_loop().create_future()
+                    break
+                self.coalesced += 1
+            try:
+                # Shielded so a waiter's cancellation does not cancel the flight
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Mark it retrieved so a flight without waiters is not logged
+            flight.exception()
+            raise
+        else:
+            self.put(key, value)
+            flight.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'ttlSeconds': self.ttl,
+                'hitRate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
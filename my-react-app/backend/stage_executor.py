@@ -0,0 +1,150 @@
+"""
+Stage Executors
+
+Runs the blocking parts of a prediction request off the event loop. Network
+fetches and CPU work (feature building, model inference) use separately sized
+thread pools, every stage has a timeout, and the number of requests in flight
+is capped. All limits can be set per deployment through environment variables:
+
+    PREDICT_MAX_CONCURRENCY  requests processed at once (default 32)
+    PREDICT_IO_WORKERS       threads for market data and metadata fetches (default 16)
+    PREDICT_CPU_WORKERS      threads for features and inference (default: CPU count)
+    PREDICT_FETCH_TIMEOUT    seconds allowed for the fetch stage (default 15)
+    PREDICT_INFERENCE_TIMEOUT  seconds allowed for the inference stage (default 10)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('stage_executor')
+
+MAX_CONCURRENCY = int(os.environ.get('PREDICT_MAX_CONCURRENCY', 32))
+IO_WORKERS = int(os.environ.get('PREDICT_IO_WORKERS', 16))
+CPU_WORKERS = int(os.environ.get('PREDICT_CPU_WORKERS', os.cpu_count() or 1))
+STAGE_TIMEOUTS = {
+    'fetch': float(os.environ.get('PREDICT_FETCH_TIMEOUT', 15)),
+    'inference': float(os.environ.get('PREDICT_INFERENCE_TIMEOUT', 10)),
+}
+
+
+class StageTimeoutError(Exception):
+    """Raised when a request stage runs longer than its timeout."""
+
+
+class StageExecutors:
+    """I/O and CPU thread pools with per-stage timeouts and a concurrency cap."""
+
+    def __init__(self, io_workers=IO_WORKERS, cpu_workers=CPU_WORKERS,
+                 max_concurrency=MAX_CONCURRENCY, timeouts=None):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.max_concurrency = max_concurrency
+        self.timeouts = dict(STAGE_TIMEOUTS, **(timeouts or {}))
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='predict-io')
+        self.cpu_executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix='predict-cpu')
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.queued = 0
+        self.stages = {}
+
+    def _stage_stats(self, stage):
+        return self.stages.setdefault(stage, {'count': 0, 'timeouts': 0, 'errors': 0, 'totalSeconds': 0.0, 'maxSeconds': 0.0})
+
+    def slot(self):
+        """
+        Async context manager admitting one request under the concurrency cap.
+
+        Requests beyond the cap wait for a free slot instead of tying up
+        executor threads.
+        """
+        return _Slot(self)
+
+    async def run(self, stage, fn, *args):
+        """
+        Run a blocking function for a stage and wait for it with a timeout.
+
+        Args:
+            stage: 'fetch' runs on the I/O pool; any other stage on the CPU pool
+            fn: Callable to run
+            *args: Arguments for fn
+
+        Returns:
+            The function's result
+
+        Raises:
+            StageTimeoutError: If the stage exceeds its timeout. The worker
+                thread finishes in the background and its result is dropped.
+        """
+        executor = self.io_executor if stage == 'fetch' else self.cpu_executor
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(executor, fn, *args), self.timeouts.get(stage))
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stage_stats(stage)['timeouts'] += 1
+            logger.warning(f"Stage '{stage}' timed out after {self.timeouts.get(stage)}s")
+            raise StageTimeoutError(f"{stage} stage timed out after {self.timeouts.get(stage)}s")
+        except Exception:
+            with self._lock:
+                self._stage_stats(stage)['errors'] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats = self._stage_stats(stage)
+                stats['count'] += 1
+                stats['totalSeconds'] += elapsed
+                stats['maxSeconds'] = max(stats['maxSeconds'], elapsed)
+
+    def stats(self):
+        """Return pool sizes, concurrency counters and per-stage timings."""
+        with self._lock:
+            return {
+                'maxConcurrency': self.max_concurrency,
+                'ioWorkers': self.io_workers,
+                'cpuWorkers': self.cpu_workers,
+                'timeouts': dict(self.timeouts),
+                'inFlight': self.in_flight,
+                'peakInFlight': self.peak_in_flight,
+                'queued': self.queued,
+                'stages': {stage: dict(stats) for stage, stats in self.stages.items()},
+            }
+
+    def shutdown(self):
+        """Stop both pools without waiting for abandoned work."""
+        self.io_executor.shutdown(wait=False)
+        self.cpu_executor.shutdown(wait=False)
+
+
+class _Slot:
+    def __init__(self, executors):
+        self._executors = executors
+
+    async def __aenter__(self):
+        executors = self._executors
+        # Created lazily so it binds to the running event loop
+        if executors._semaphore is None:
+            executors._semaphore = asyncio.Semaphore(executors.max_concurrency)
+        with executors._lock:
+            executors.queued += 1
+        try:
+            await executors._semaphore.acquire()
+        finally:
+            with executors._lock:
+                executors.queued -= 1
+        with executors._lock:
+            executors.in_flight += 1
+            executors.peak_in_flight = max(executors.peak_in_flight, executors.in_flight)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        executors = self._executors
+        with executors._lock:
+            executors.in_flight -= 1
+        executors._semaphore.release()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Startup Report
+
+Tracks how long the API takes to become ready: the phases from process start
+to warm models (StartupReport, served by /ready), the import time of each
+top-level package, and the time from launching a fresh interpreter to the
+first successful /predict.
+
+Run this script directly to print both measurements for a cold process:
+
+    python startup.py
+    python startup.py --mode fast --replay
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import subprocess
+from collections import Counter
+
+logger = logging.getLogger('startup')
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Line format of python -X importtime: "import time: self [us] | cumulative | name"
+IMPORT_TIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)')
+
+# Runs in a fresh interpreter; prints the seconds to the first successful /predict
+FIRST_PREDICT_SCRIPT = '''
+import sys, json, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+imported = time.perf_counter()
+with TestClient(main.app) as client:
+    started = time.perf_counter()
+    response = client.post('/predict', json={'stock_ticker': sys.argv[1]})
+    done = time.perf_counter()
+    print(json.dumps({
+        'status': response.status_code,
+        'importSeconds': imported - start,
+        'startupSeconds': started - imported,
+        'predictSeconds': done - started,
+        'ready': client.get('/ready').status_code == 200,
+    }))
+'''
+
+
+def process_start_time():
+    """Return the UNIX time this process started, or now if psutil is unavailable."""
+    try:
+        import psutil
+        return psutil.Process().create_time()
+    except Exception:
+        return time.time()
+
+
+class StartupReport:
+    """Durations of the startup phases, measured from process start."""
+
+    def __init__(self, started_at=None):
+        self.started_at = process_start_time() if started_at is None else started_at
+        self.phases = {}
+        self.ready_at = None
+        self._last = self.started_at
+
+    def mark(self, phase):
+        """Record the time since the previous mark (or process start) as a phase."""
+        now = time.time()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    def ready(self):
+        """Record that the models are warm and the API can serve predictions."""
+        self.ready_at = time.time()
+        logger.info(f"Ready {self.ready_at - self.started_at:.2f}s after process start ("
+                    + ', '.join(f"{phase} {seconds:.2f}s" for phase, seconds in self.phases.items()) + ")")
+
+    def as_dict(self):
+        return {
+            'startedAt': self.started_at,
+            'phases': dict(self.phases),
+            'readyAfterSeconds': None if self.ready_at is None else self.ready_at - self.started_at,
+        }
+
+
+def import_times(module='main', top=None):
+    """
+    Measure the import time of each top-level package in a fresh interpreter.
+
+    Args:
+        module: Module whose import is measured
+        top: Optional number of slowest packages to return
+
+    Returns:
+        List of (package, seconds) pairs, slowest first; a package's time
+        is the sum of the self time of its submodules
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=BACKEND_DIR, capture_output=True, text=True)
+    totals = Counter()
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            totals[match.group(3).split('.')[0]] += int(match.group(1)) / 1e6
+    return totals.most_common(top)
+
+
+def time_to_first_predict(ticker='AAPL', env=None):
+    """
+    Launch a fresh interpreter and time it until /predict first succeeds.
+
+    Args:
+        ticker: Ticker to request
+        env: Extra environment variables for the child process
+
+    Returns:
+        Dictionary with the child's phase timings and totalSeconds (including
+        interpreter start), or None if the child failed
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', FIRST_PREDICT_SCRIPT, ticker], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, env=dict(os.environ, **(env or {})))
+    total = time.perf_counter() - start
+    try:
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+    except Exception:
+        logger.error(f"First /predict run failed: {result.stderr.strip()[-2000:]}")
+        return None
+    return dict(timings, totalSeconds=total)
+
+
+def main():
+    """Report import times and the time to the first successful /predict."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Measure API cold start')
+    parser.add_argument('--ticker', default='AAPL', help='Ticker used for the first /predict')
+    parser.add_argument('--mode', choices=['eager', 'fast'], help='STARTUP_MODE for the measured process')
+    parser.add_argument('--replay', action='store_true', help='Use the offline replay market data provider')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to show')
+    args = parser.parse_args()
+
+    for package, seconds in import_times('main', args.top):
+        logger.info(f"import {package:<30} {seconds * 1000:8.1f} ms")
+
+    env = {}
+    if args.mode:
+        env['STARTUP_MODE'] = args.mode
+    if args.replay:
+        env['MARKET_DATA_PROVIDER'] = 'replay'
+    timings = time_to_first_predict(args.ticker, env)
+    if timings is None or timings['status'] != 200:
+        logger.error(f"/predict for {args.ticker} did not succeed: {timings}")
+        sys.exit(1)
+    logger.info(f"First /predict succeeded {timings['totalSeconds']:.2f}s after launch "
+                f"(imports {timings['importSeconds']:.2f}s, startup {timings['startupSeconds']:.2f}s, "
+                f"request {timings['predictSeconds']:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
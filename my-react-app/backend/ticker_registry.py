@@ -0,0 +1,99 @@
+"""
+Ticker Registry
+
+The universe of supported tickers, shared by the API and the update job. It is
+loaded from a file (tickers.txt by default, or TICKER_UNIVERSE_FILE), keeps the
+file order for iteration and answers membership checks in O(1).
+
+Update runs can be split across workers with shard(index, count): a ticker
+belongs to shard crc32(ticker) % count, so every worker computes the same
+split independently and adding symbols does not move existing ones between
+shards.
+"""
+
+import os
+import csv
+import json
+import zlib
+import logging
+
+logger = logging.getLogger('ticker_registry')
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'tickers.txt')
+
+
+def parse_shard(value):
+    """
+    Parse a shard spec of the form 'i/N' with 0 <= i < N.
+
+    Returns:
+        Tuple of (index, count)
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard {value!r}, expected i/N such as 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {value!r}, need 0 <= i < N")
+    return index, count
+
+
+def shard_of(ticker, count):
+    """Return the shard a ticker belongs to when the universe is split count ways."""
+    return zlib.crc32(ticker.encode()) % count
+
+
+class TickerRegistry:
+    """Ordered, de-duplicated set of ticker symbols."""
+
+    def __init__(self, tickers):
+        self._tickers = tuple(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+        self._members = frozenset(self._tickers)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load tickers from a text, CSV or JSON file.
+
+        Text files hold one symbol per line (# starts a comment). CSV files need
+        a header row with a 'ticker' or 'symbol' column. JSON files hold a list
+        of symbols.
+
+        Raises:
+            ValueError: If a CSV file has no 'ticker' or 'symbol' column
+        """
+        with open(path) as f:
+            if path.endswith('.json'):
+                tickers = json.load(f)
+            elif path.endswith('.csv'):
+                rows = list(csv.reader(f))
+                header = [column.strip().lower() for column in rows[0]] if rows else []
+                column = next((header.index(name) for name in ('ticker', 'symbol') if name in header), None)
+                if column is None:
+                    raise ValueError(f"{path} needs a header row with a 'ticker' or 'symbol' column")
+                tickers = [row[column] for row in rows[1:] if len(row) > column]
+            else:
+                tickers = [line.split('#', 1)[0] for line in f]
+        registry = cls(tickers)
+        logger.info(f"Loaded {len(registry)} tickers from {path}")
+        return registry
+
+    @classmethod
+    def load(cls, path=None):
+        """Load the registry from path, TICKER_UNIVERSE_FILE or tickers.txt."""
+        return cls.from_file(path or os.environ.get('TICKER_UNIVERSE_FILE') or DEFAULT_PATH)
+
+    def __contains__(self, ticker):
+        return ticker in self._members
+
+    def __iter__(self):
+        return iter(self._tickers)
+
+    def __len__(self):
+        return len(self._tickers)
+
+    def shard(self, index, count):
+        """Return the tickers in shard index of count, in registry order."""
+        if count == 1:
+            return list(self._tickers)
+        return [ticker for ticker in self._tickers if shard_of(ticker, count) == index]
@@ -8,14 +8,26 @@ This script updates stock predictions in Firebase. It's designed to be run as a
 import os
 import sys
 import json
+import time
 import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
-import joblib
-import yfinance as yf
 from datetime import datetime, timedelta
-import firebase_admin
-from firebase_admin import credentials, firestore
+from market_data_provider import create_provider, OHLCV_COLUMNS
+from ticker_registry import TickerRegistry, parse_shard
+from market_data_cache import MarketDataCache
+from company_metadata import CompanyMetadataCache
+from prediction_store import PredictionStore
+from drift_monitor import DriftMonitor
+from feature_snapshots import save_features, DEFAULT_FORMAT as DEFAULT_SNAPSHOT_FORMAT
+from indicators import add_technical_indicators
+from forecast_engine import model_inputs, ForecastEngine, forecast_response, DEFAULT_HORIZON as FORECAST_HORIZON
+from model_registry import ModelRegistry
+from firestore_writer import BatchPredictionWriter, InMemoryFirestore, MAX_BATCH_SIZE
+from metrics import MetricsRegistry
 
 # Configure logging
 logging.basicConfig(
@@ -30,14 +42,32 @@ logger = logging.getLogger('prediction_updater')
 # Path to the service account file
 SERVICE_ACCOUNT_PATH = os.path.join(os.path.dirname(__file__), 'firebase-service-account.json')
 
-# List of stock tickers to update
-STOCK_TICKERS = [
-    'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'TSLA', 'NVDA',
-    'JPM', 'V', 'WMT', 'DIS', 'NFLX', 'INTC', 'AMD', 'PYPL'
-]
+# Market index used for the SP500_Return and Beta features
+BENCHMARK_TICKER = '^GSPC'
+
+# Market data comes from Yahoo, or from offline replay when MARKET_DATA_PROVIDER=replay
+market_data_provider = create_provider()
+
+# Local store of daily bars so each run only downloads new bars
+market_data_cache = MarketDataCache(provider=market_data_provider)
+
+# Company info cached on disk and refreshed in bulk at the start of a run
+company_metadata = CompanyMetadataCache(provider=market_data_provider)
+
+# Latest forecasts in the API's response schema, served in precomputed mode
+prediction_store = PredictionStore(provider=market_data_provider)
+
+# Live models for the stored forecasts, loaded on first use in each process
+model_registry = ModelRegistry()
+
+# Running feature statistics compared with each model's training baseline
+drift_monitor = DriftMonitor(provider=market_data_provider)
 
 def initialize_firebase():
     """Initialize Firebase Admin SDK with service account credentials."""
+    # Imported here so dry runs and worker processes never load the SDK
+    import firebase_admin
+    from firebase_admin import credentials, firestore
     try:
         # Check if already initialized
         if not firebase_admin._apps:
@@ -49,45 +79,62 @@ def initialize_firebase():
         logger.error(f"Failed to initialize Firebase: {e}")
         raise
 
-def fetch_stock_data(ticker, days=60):
+def fetch_market_data(tickers, days=60):
+    """
+    Acquire daily bars for a whole run in one multi-symbol request.
+    
+    All tickers and the S&P 500 benchmark are refreshed together, and the
+    benchmark's daily returns are computed once so every ticker shares them.
+    
+    Args:
+        tickers: List of stock ticker symbols
+        days: Number of days of historical data to fetch (default: 60)
+    
+    Returns:
+        Dictionary mapping each symbol (including BENCHMARK_TICKER) to its DataFrame or None
+    """
+    end_date = market_data_provider.now()
+    logger.info(f"Fetching data for {len(tickers)} tickers and {BENCHMARK_TICKER} from {(end_date - timedelta(days=days)).date()} to {end_date.date()}")
+    
+    market_data = market_data_cache.get_histories(list(tickers) + [BENCHMARK_TICKER], days=days, now=end_date)
+    
+    benchmark = market_data.get(BENCHMARK_TICKER)
+    if benchmark is not None and not benchmark.empty:
+        # Calculate S&P 500 daily returns once for the whole run
+        benchmark['SP500_Return'] = benchmark['Close'].pct_change()
+    
+    logger.info(f"Fetched data for {sum(data is not None for data in market_data.values())}/{len(market_data)} symbols")
+    return market_data
+
+def fetch_stock_data(ticker, days=60, market_data=None):
     """
     Fetch historical stock data for the given ticker.
     
     Args:
         ticker: Stock ticker symbol
         days: Number of days of historical data to fetch (default: 60)
+        market_data: Optional result of fetch_market_data to take the ticker's
+            bars and the benchmark from instead of fetching them
     
     Returns:
         DataFrame with historical stock data
     """
     try:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        logger.info(f"Fetching data for {ticker} from {start_date.date()} to {end_date.date()}")
+        if market_data is None:
+            market_data = fetch_market_data([ticker], days=days)
         
-        # Try to fetch data with 1-minute intervals for the most recent day
-        try:
-            # Get intraday data for the most recent trading day
-            intraday_data = yf.download(ticker, period="1d", interval="1m")
-            logger.info(f"Successfully fetched {len(intraday_data)} minutes of intraday data for {ticker}")
-        except Exception as e:
-            logger.warning(f"Could not fetch intraday data for {ticker}: {e}")
-            intraday_data = None
-        
-        # Get daily data for the historical period
-        data = yf.download(ticker, start=start_date, end=end_date)
+        data = market_data.get(ticker)
         
-        if data.empty:
+        if data is None or data.empty:
             logger.warning(f"No data returned for {ticker}")
             return None
             
-        logger.info(f"Successfully fetched {len(data)} days of data for {ticker}")
+        logger.info(f"Using {len(data)} days of data for {ticker}")
         
         # Get additional market data
         try:
-            # Get company info
-            ticker_info = yf.Ticker(ticker).info
+            # Get company info from the metadata cache
+            ticker_info = company_metadata.get(ticker) or {}
             market_cap = ticker_info.get('marketCap', None)
             sector = ticker_info.get('sector', None)
             industry = ticker_info.get('industry', None)
@@ -100,13 +147,10 @@ def fetch_stock_data(ticker, days=60):
         except Exception as e:
             logger.warning(f"Could not fetch company info for {ticker}: {e}")
         
-        # Try to get S&P 500 data for the same period for market comparison
+        # Add the shared S&P 500 series for market comparison
         try:
-            sp500 = yf.download('^GSPC', start=start_date, end=end_date)
-            if not sp500.empty:
-                # Calculate S&P 500 daily returns
-                sp500['SP500_Return'] = sp500['Close'].pct_change()
-                
+            sp500 = market_data.get(BENCHMARK_TICKER)
+            if sp500 is not None and not sp500.empty:
                 # Merge with stock data
                 data['SP500_Close'] = sp500['Close']
                 data['SP500_Return'] = sp500['SP500_Return']
@@ -119,20 +163,22 @@ def fetch_stock_data(ticker, days=60):
                 
                 logger.info(f"Added S&P 500 comparison data for {ticker}")
         except Exception as e:
-            logger.warning(f"Could not fetch S&P 500 data: {e}")
+            logger.warning(f"Could not add S&P 500 data: {e}")
         
         return data
     except Exception as e:
         logger.error(f"Error fetching data for {ticker}: {e}")
         return None
 
-def prepare_prediction_data(ticker, stock_data):
+def prepare_prediction_data(ticker, stock_data, snapshot_format=DEFAULT_SNAPSHOT_FORMAT):
     """
     Prepare data for prediction with enhanced feature engineering.
     
     Args:
         ticker: Stock ticker symbol
         stock_data: DataFrame with historical stock data
+        snapshot_format: Optional 'npy' or 'parquet' to also save the
+            features to predicting_data/ for debugging (default: disabled)
     
     Returns:
         DataFrame with features for prediction
@@ -141,146 +187,128 @@ def prepare_prediction_data(ticker, stock_data):
         # Make a copy of the data to avoid modifying the original
         df = stock_data.copy()
         
-        # Basic features
-        # Moving averages
-        df['MA5'] = df['Close'].rolling(window=5).mean()
-        df['MA10'] = df['Close'].rolling(window=10).mean()
-        df['MA20'] = df['Close'].rolling(window=20).mean()
-        
-        # Calculate RSI (Relative Strength Index)
-        delta = df['Close'].diff()
-        gain = delta.where(delta > 0, 0).rolling(window=14).mean()
-        loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-        
-        # Calculate MACD (Moving Average Convergence Divergence)
-        ema12 = df['Close'].ewm(span=12, adjust=False).mean()
-        ema26 = df['Close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = ema12 - ema26
-        df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        
-        # Calculate daily returns
-        df['Daily_Return'] = df['Close'].pct_change()
-        
-        # Calculate volatility (standard deviation of returns)
-        df['Volatility'] = df['Daily_Return'].rolling(window=20).std()
+        # Add moving averages, RSI, MACD, daily returns and volatility
+        add_technical_indicators(df)
         
         # Drop NaN values
         df = df.dropna()
         
-        # Ensure predicting_data directory exists
-        predicting_data_dir = os.path.join(os.path.dirname(__file__), 'predicting_data')
-        os.makedirs(predicting_data_dir, exist_ok=True)
-        
         # Add ticker column
         df['Ticker'] = ticker
         
         # Reset index to get Date as a column
         df = df.reset_index()
         
-        # Save to CSV for model prediction
-        output_path = os.path.join(predicting_data_dir, f'{ticker}.csv')
-        df.to_csv(output_path, index=False)
-        logger.info(f"Saved prediction data for {ticker} to {output_path}")
+        # Optionally keep a typed snapshot of the features for auditing
+        save_features(ticker, df, snapshot_format)
         
         return df
     except Exception as e:
         logger.error(f"Error preparing prediction data for {ticker}: {e}")
         return None
 
-def run_prediction(ticker):
-    """Run prediction for the given ticker."""
+def live_model(ticker):
+    """Return the ticker's model from the registry, or None if it has no live model."""
+    if model_registry.loaded_at is None:
+        model_registry.load_all()
+    return model_registry.get(ticker) if ticker in model_registry else None
+
+def run_prediction(ticker, X_predict, model=None):
+    """
+    Run prediction for the given ticker.
+    
+    Args:
+        ticker: Stock ticker symbol
+        X_predict: DataFrame with prepared prediction data
+        model: Optional model already taken from the registry (default: live_model(ticker))
+    
+    Returns:
+        Dictionary with prediction results, or None on failure
+    """
     try:
-        # Load the prediction data
-        data_path = os.path.join(os.path.dirname(__file__), 'predicting_data', f'{ticker}.csv')
-        if not os.path.exists(data_path):
-            logger.error(f"Prediction data not found for {ticker} at {data_path}")
+        if X_predict is None or X_predict.empty:
+            logger.error(f"Prediction data not available for {ticker}")
             return None
-            
-        X_predict = pd.read_csv(data_path)
-        
-        # Check if TensorFlow is available
-        tensorflow_available = False
-        try:
-            import tensorflow as tf
-            tensorflow_available = True
-            logger.info(f"TensorFlow is available, will use model-based prediction for {ticker}")
-        except ImportError:
-            logger.warning(f"TensorFlow is not available, will use fallback prediction for {ticker}")
-        
-        # If TensorFlow is not available, use the fallback prediction method
-        if not tensorflow_available:
-            logger.info(f"Using enhanced fallback prediction method for {ticker}")
-            return run_fallback_prediction(ticker, X_predict)
-        
-        # Ensure live_models directory exists
-        live_models_dir = os.path.join(os.path.dirname(__file__), 'live_models')
-        os.makedirs(live_models_dir, exist_ok=True)
         
-        # Load the model
-        model_path = os.path.join(live_models_dir, f'{ticker}_model.joblib')
-        if not os.path.exists(model_path):
-            logger.error(f"Model not found for {ticker} at {model_path}")
-            logger.info(f"Falling back to enhanced prediction method for {ticker}")
+        # Models are loaded once per process by the registry (ONNX preferred)
+        model = model if model is not None else live_model(ticker)
+        if model is None:
+            logger.info(f"No live model for {ticker}, using enhanced fallback prediction method")
             return run_fallback_prediction(ticker, X_predict)
-            
-        model = joblib.load(model_path)
-        logger.info(f"Loaded model for {ticker}")
         
         # Get the current price (last closing price)
         current_price = X_predict['Close'].iloc[-1]
         
-        # Prepare data for prediction
-        X_features = X_predict.drop(['Date', 'Ticker'], axis=1, errors='ignore')
+        # Prepare data for prediction in the model's input layout
+        X_features = model_inputs(model, X_predict)
         
         # Make prediction
-        raw_predictions = model.predict(X_features).tolist()
-        
-        # Calculate the average predicted price (last 5 days)
-        predicted_price = np.mean(raw_predictions[-5:])
-        
-        # Calculate change percentage
-        change = ((predicted_price - current_price) / current_price) * 100
-        
-        # Calculate confidence (simplified)
-        confidence = 0.75  # Default confidence
-        
-        # Get company name
-        try:
-            ticker_info = yf.Ticker(ticker).info
-            company_name = ticker_info.get('shortName', ticker)
-        except:
-            company_name = ticker
-        
-        # Create prediction object
-        prediction = {
-            'ticker': ticker,
-            'name': company_name,
-            'currentPrice': float(current_price),
-            'predictedPrice': float(predicted_price),
-            'change': float(change),
-            'confidence': float(confidence),
-            'rawPredictions': raw_predictions,
-            'lastUpdated': datetime.now(),
-            'method': 'model'
-        }
+        raw_predictions = np.asarray(model.predict(X_features), dtype=np.float64).ravel().tolist()
         
-        logger.info(f"Generated prediction for {ticker}: current=${current_price:.2f}, predicted=${predicted_price:.2f}, change={change:.2f}%")
-        return prediction
+        return model_prediction(ticker, current_price, raw_predictions)
     except Exception as e:
         logger.error(f"Error running prediction for {ticker}: {e}")
         # Try the fallback method if the model-based prediction fails
         logger.info(f"Trying fallback prediction method for {ticker}")
         try:
-            X_predict = pd.read_csv(data_path)
             return run_fallback_prediction(ticker, X_predict)
         except Exception as fallback_error:
             logger.error(f"Fallback prediction also failed for {ticker}: {fallback_error}")
             return None
 
-def update_firebase_prediction(db, prediction):
-    """Update prediction in Firebase."""
+def model_prediction(ticker, current_price, raw_predictions):
+    """
+    Create the prediction object for a model's predictions over the window.
+    
+    Args:
+        ticker: Stock ticker symbol
+        current_price: Last closing price
+        raw_predictions: Model predictions for each row of the window, oldest first
+    
+    Returns:
+        Dictionary with prediction results
+    """
+    # Calculate the average predicted price (last 5 days)
+    predicted_price = np.mean(raw_predictions[-5:])
+    
+    # Calculate change percentage
+    change = ((predicted_price - current_price) / current_price) * 100
+    
+    # Calculate confidence (simplified)
+    confidence = 0.75  # Default confidence
+    
+    # Get company name
+    company_name = company_metadata.name(ticker)
+    
+    # Create prediction object
+    prediction = {
+        'ticker': ticker,
+        'name': company_name,
+        'currentPrice': float(current_price),
+        'predictedPrice': float(predicted_price),
+        'change': float(change),
+        'confidence': float(confidence),
+        'rawPredictions': raw_predictions,
+        'lastUpdated': datetime.now(),
+        'method': 'model'
+    }
+    
+    logger.info(f"Generated prediction for {ticker}: current=${current_price:.2f}, predicted=${predicted_price:.2f}, change={change:.2f}%")
+    return prediction
+
+def update_firebase_prediction(db, prediction, writer=None):
+    """
+    Update prediction in Firebase.
+    
+    Args:
+        db: Firestore client
+        prediction: Prediction dictionary
+        writer: Optional BatchPredictionWriter that buffers the document for a
+            later batch commit instead of writing it immediately
+    
+    Returns:
+        True if the prediction was written or buffered
+    """
     try:
         if not prediction:
             return False
@@ -294,6 +322,11 @@ def update_firebase_prediction(db, prediction):
         # Add a timestamp string
         prediction['storedAt'] = datetime.now().isoformat()
         
+        if writer is not None:
+            writer.add(ticker, prediction)
+            logger.info(f"Queued prediction for {ticker} for batch commit")
+            return True
+        
         # Store in Firestore
         db.collection('predictions').document(ticker).set(prediction)
         logger.info(f"Updated prediction for {ticker} in Firebase")
@@ -315,10 +348,6 @@ def run_fallback_prediction(ticker, data):
         Dictionary with prediction results
     """
     try:
-        # Convert Close column to numeric if it's not already
-        if 'Close' in data.columns:
-            data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
-        
         # Get the last 30 days of data
         recent_data = data.tail(30).copy()
         
@@ -469,11 +498,7 @@ def run_fallback_prediction(ticker, data):
             confidence = 0.5  # Default confidence
         
         # Get company name
-        try:
-            ticker_info = yf.Ticker(ticker).info
-            company_name = ticker_info.get('shortName', ticker)
-        except:
-            company_name = ticker
+        company_name = company_metadata.name(ticker)
         
         # Create prediction object
         prediction = {
@@ -520,47 +545,262 @@ def run_fallback_prediction(ticker, data):
             logger.error(f"Even simple fallback prediction failed for {ticker}: {e2}")
             return None
 
-def main():
+# Pipeline stages timed for the end-of-run summary
+STAGES = ['fetch', 'prepare', 'predict', 'forecast', 'store']
+
+def forecast_ticker(ticker, stock_data, horizon=FORECAST_HORIZON, model=None):
+    """
+    Forecast the API's default horizon for precomputed serving.
+    
+    The model, the price history and the response schema are the ones a live
+    /predict uses, so a stored forecast means the same as a computed one.
+    
+    Args:
+        ticker: Stock ticker symbol
+        stock_data: DataFrame with historical stock data
+        horizon: Number of days to forecast
+        model: Optional model already taken from the registry
+    
+    Returns:
+        /predict response dictionary, or None if the ticker has no live model
+    """
+    model = model if model is not None else live_model(ticker)
+    if model is None:
+        return None
+    history = stock_data[OHLCV_COLUMNS]
+    raw_predictions = ForecastEngine(model).forecast([history], horizon)[0]
+    return forecast_response(ticker, company_metadata.name(ticker), history['Close'].iloc[-1], raw_predictions,
+                             source='precomputed')
+
+def predict_ticker(ticker, stock_data):
+    """
+    Run the CPU-bound stages for one ticker: feature preparation, prediction
+    and the forecast stored for the API.
+    
+    This is a module-level function so it can run in a worker process.
+    
+    Args:
+        ticker: Stock ticker symbol
+        stock_data: DataFrame with historical stock data
+    
+    Returns:
+        Tuple of (prediction or None, forecast or None, stage timings in
+        seconds, failure reason or None)
+    """
+    timings = {}
+    
+    start = time.perf_counter()
+    prepared_data = prepare_prediction_data(ticker, stock_data)
+    timings['prepare'] = time.perf_counter() - start
+    if prepared_data is None:
+        return None, None, timings, 'data preparation failure'
+    
+    # Add the new bars to the ticker's drift statistics
+    try:
+        drift_monitor.observe(ticker, prepared_data)
+    except Exception as e:
+        logger.error(f"Error updating drift statistics for {ticker}: {e}")
+    
+    # One registry model serves both the Firestore prediction and the stored forecast
+    model = live_model(ticker)
+    
+    start = time.perf_counter()
+    prediction = run_prediction(ticker, prepared_data, model)
+    timings['predict'] = time.perf_counter() - start
+    if prediction is None:
+        return None, None, timings, 'prediction failure'
+    
+    if model is None:
+        return prediction, None, timings, None
+    
+    start = time.perf_counter()
+    try:
+        forecast = forecast_ticker(ticker, stock_data, model=model)
+    except Exception as e:
+        logger.error(f"Error forecasting {ticker} for the prediction store: {e}")
+        forecast = None
+    timings['forecast'] = time.perf_counter() - start
+    
+    return prediction, forecast, timings, None
+
+def process_ticker(ticker, db, market_data, cpu_executor=None, writer=None):
+    """
+    Fetch, predict and store one ticker (the prediction in Firestore and the
+    forecast in the local prediction store), isolating any failure to that ticker.
+    
+    Args:
+        ticker: Stock ticker symbol
+        db: Firestore client
+        market_data: Run-level bars from fetch_market_data
+        cpu_executor: Optional process pool for the CPU-bound stages
+        writer: Optional BatchPredictionWriter buffering the Firestore writes
+    
+    Returns:
+        Tuple of (success flag, stage timings in seconds)
+    """
+    timings = {}
+    try:
+        logger.info(f"Processing {ticker}")
+        
+        # Fetch stock data
+        start = time.perf_counter()
+        stock_data = fetch_stock_data(ticker, market_data=market_data)
+        timings['fetch'] = time.perf_counter() - start
+        if stock_data is None:
+            logger.warning(f"Skipping {ticker} due to data fetch failure")
+            return False, timings
+        
+        # Prepare prediction data and run prediction
+        if cpu_executor is None:
+            prediction, forecast, cpu_timings, failure = predict_ticker(ticker, stock_data)
+        else:
+            prediction, forecast, cpu_timings, failure = cpu_executor.submit(predict_ticker, ticker, stock_data).result()
+        timings.update(cpu_timings)
+        if prediction is None:
+            logger.warning(f"Skipping {ticker} due to {failure}")
+            return False, timings
+        
+        # Update Firebase
+        start = time.perf_counter()
+        stored = update_firebase_prediction(db, prediction, writer)
+        try:
+            if forecast is not None:
+                prediction_store.put(forecast)
+        except Exception as e:
+            logger.error(f"Error saving the forecast for {ticker} to the local store: {e}")
+        timings['store'] = time.perf_counter() - start
+        return stored, timings
+    except Exception as e:
+        logger.error(f"Error processing {ticker}: {e}")
+        return False, timings
+
+def log_stage_summary(stage_timings, wall_time):
+    """Log count, total, mean and max duration for each pipeline stage."""
+    logger.info(f"Stage timing summary (wall time {wall_time:.2f}s):")
+    for stage in STAGES:
+        durations = [t[stage] for t in stage_timings.values() if stage in t]
+        if not durations:
+            continue
+        logger.info(
+            f"  {stage:<8} n={len(durations):<4} total={sum(durations):.2f}s "
+            f"mean={sum(durations) / len(durations):.2f}s max={max(durations):.2f}s"
+        )
+
+def write_run_metrics(path, stage_timings, wall_time, acquire_time, success_count, shard, writer=None):
+    """
+    Write the run's stage latencies and totals for node_exporter's textfile collector.
+    
+    Args:
+        path: Output .prom file
+        stage_timings: Dictionary mapping ticker to its stage timings
+        wall_time: Duration of the whole run in seconds
+        acquire_time: Duration of the bulk market data acquisition in seconds
+        success_count: Number of tickers updated
+        shard: Shard label such as '0/1'
+        writer: Optional BatchPredictionWriter whose commit latencies are included
+    """
+    metrics = MetricsRegistry()
+    stage_seconds = metrics.histogram('tikr_stage_duration_seconds', 'Time spent in each prediction stage', ['stage', 'shard'])
+    for timings in stage_timings.values():
+        for stage, duration in timings.items():
+            stage_seconds.observe(duration, stage=stage, shard=shard)
+    stage_seconds.observe(acquire_time, stage='acquire', shard=shard)
+    if writer is not None:
+        for latency in writer.commit_latencies:
+            stage_seconds.observe(latency, stage='commit', shard=shard)
+    
+    run_seconds = metrics.gauge('tikr_update_run_duration_seconds', 'Wall time of the last update run', ['shard'])
+    run_seconds.set(wall_time, shard=shard)
+    tickers = metrics.gauge('tikr_update_tickers', 'Tickers in the last update run by outcome', ['shard', 'outcome'])
+    tickers.set(success_count, shard=shard, outcome='ok')
+    tickers.set(len(stage_timings) - success_count, shard=shard, outcome='failed')
+    finished = metrics.gauge('tikr_update_last_run_timestamp_seconds', 'Time the last update run finished', ['shard'])
+    finished.set(time.time(), shard=shard)
+    
+    metrics.write_textfile(path)
+    logger.info(f"Wrote run metrics to {path}")
+
+def parse_args(argv=None):
+    """Parse command line options for the update run."""
+    parser = argparse.ArgumentParser(description='Update stock predictions in Firebase')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of tickers processed concurrently (default: 1, serial)')
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f'Predictions per Firestore batch commit (default: {MAX_BATCH_SIZE}, 0 writes each one directly)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Write predictions to an in-memory Firestore stand-in instead of Firebase')
+    parser.add_argument('--universe',
+                        help='Ticker universe file (default: TICKER_UNIVERSE_FILE or tickers.txt)')
+    parser.add_argument('--shard', type=parse_shard, default=(0, 1), metavar='i/N',
+                        help='Only update shard i of N (0-based), e.g. 0/4 on the first of four workers')
+    parser.add_argument('--metrics-file', default=os.environ.get('UPDATE_METRICS_FILE'),
+                        help='Write run metrics to this .prom file for the node_exporter textfile collector')
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function to update all predictions."""
     try:
+        args = parse_args(argv)
+        workers = max(args.workers, 1)
+        
+        shard_index, shard_count = args.shard
+        tickers = TickerRegistry.load(args.universe).shard(shard_index, shard_count)
+        
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        logger.info(f"Starting prediction update process at {current_time}")
+        logger.info(f"Starting prediction update process at {current_time} with {workers} worker(s) "
+                    f"for {len(tickers)} tickers (shard {shard_index}/{shard_count})")
         
         # Initialize Firebase
-        db = initialize_firebase()
+        db = InMemoryFirestore() if args.dry_run else initialize_firebase()
+        writer = BatchPredictionWriter(db, batch_size=args.batch_size) if args.batch_size > 0 else None
+        
+        run_start = time.perf_counter()
+        
+        # Download bars for every ticker and the benchmark in one request
+        market_data = fetch_market_data(tickers)
+        # Refresh expired company info up front so workers only read the cache
+        company_metadata.refresh_stale(tickers)
+        acquire_time = time.perf_counter() - run_start
         
         # Process each ticker
+        stage_timings = {}
         success_count = 0
-        for ticker in STOCK_TICKERS:
-            try:
-                logger.info(f"Processing {ticker}")
-                
-                # Fetch stock data
-                stock_data = fetch_stock_data(ticker)
-                if stock_data is None:
-                    logger.warning(f"Skipping {ticker} due to data fetch failure")
-                    continue
-                
-                # Prepare prediction data
-                prepared_data = prepare_prediction_data(ticker, stock_data)
-                if prepared_data is None:
-                    logger.warning(f"Skipping {ticker} due to data preparation failure")
-                    continue
-                
-                # Run prediction
-                prediction = run_prediction(ticker)
-                if prediction is None:
-                    logger.warning(f"Skipping {ticker} due to prediction failure")
-                    continue
-                
-                # Update Firebase
-                if update_firebase_prediction(db, prediction):
-                    success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing {ticker}: {e}")
-        
-        logger.info(f"Prediction update completed. Updated {success_count}/{len(STOCK_TICKERS)} tickers.")
+        if workers == 1:
+            for ticker in tickers:
+                success, stage_timings[ticker] = process_ticker(ticker, db, market_data, writer=writer)
+                success_count += success
+        else:
+            # Threads overlap the network-bound fetch and store stages, while
+            # feature preparation and prediction run in separate processes.
+            # Workers are spawned rather than forked: the pool starts them lazily
+            # from io threads, and forking while other threads hold locks (e.g.
+            # the logging handlers') can deadlock the child
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as cpu_executor, \
+                    ThreadPoolExecutor(max_workers=workers) as io_executor:
+                futures = {
+                    io_executor.submit(process_ticker, ticker, db, market_data, cpu_executor, writer): ticker
+                    for ticker in tickers
+                }
+                for future in as_completed(futures):
+                    success, stage_timings[futures[future]] = future.result()
+                    success_count += success
+        
+        if writer is not None:
+            # Commit every buffered prediction in chunked batch writes
+            success_count = writer.flush()
+            commits = writer.latency_summary()
+            logger.info(
+                f"Firestore batch commits: n={commits['commits']} total={commits['total']:.2f}s "
+                f"mean={commits['mean']:.2f}s max={commits['max']:.2f}s"
+            )
+        
+        logger.info(f"Prediction update completed. Updated {success_count}/{len(tickers)} tickers.")
+        logger.info(f"Run-level market data acquisition took {acquire_time:.2f}s")
+        wall_time = time.perf_counter() - run_start
+        log_stage_summary(stage_timings, wall_time)
+        if args.metrics_file:
+            write_run_metrics(args.metrics_file, stage_timings, wall_time, acquire_time, success_count,
+                              f'{shard_index}/{shard_count}', writer)
     except Exception as e:
         logger.error(f"Error in main function: {e}")
         sys.exit(1)
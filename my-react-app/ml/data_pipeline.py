@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Data Pipeline
+
+The download and preprocessing steps of Updated_MLE_Pipeline.ipynb as an
+importable module. Each ticker is brought up to date independently, in
+parallel across processes:
+
+    raw_stock_data/{TICKER}.csv                 daily OHLCV bars since START_DATE
+    processed_stock_data/{TICKER}_processed.csv bars plus the training features
+
+Only bars newer than the last raw row are downloaded, and only the matching
+processed rows are computed (from a short lookback of raw rows) and appended.
+yfinance adjusts prices as of the download date, so the last stored bar is
+downloaded again with them; if its close has changed (a split or dividend
+since the last run), both files are rebuilt from START_DATE instead.
+data_manifest.json records a SHA-256 of both files per ticker, so tickers
+that are up to date are skipped without parsing them, and files changed outside
+the pipeline are rebuilt in full. Files that predate the manifest are
+adopted as they are on the first run.
+
+Usage:
+    python data_pipeline.py                       # refresh every ticker in raw_stock_data/
+    python data_pipeline.py AAPL MSFT --workers 2
+    python data_pipeline.py --full                # rebuild from START_DATE
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+logger = logging.getLogger('data_pipeline')
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(ML_DIR, 'raw_stock_data')
+PROCESSED_DIR = os.path.join(ML_DIR, 'processed_stock_data')
+MANIFEST_PATH = os.path.join(ML_DIR, 'data_manifest.json')
+
+# Tickers the models are trained on
+STOCKS = ["AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA"]
+
+# First date of the training history
+START_DATE = '2015-01-01'
+
+RAW_COLUMNS = ["Date", "Open", "High", "Low", "Close", "Volume", "Ticker"]
+
+# Raw rows before the first new bar needed to compute its features (longest rolling window)
+LOOKBACK_ROWS = 10
+
+# Relative change of the re-downloaded last close taken as a new price adjustment
+ADJUSTMENT_TOLERANCE = 1e-6
+
+
+def download_and_clean_stock_data(ticker, start=START_DATE, end=None):
+    """
+    Download daily bars for one ticker from yfinance in the raw CSV layout.
+
+    Args:
+        ticker: Stock ticker symbol
+        start: First date to download (inclusive)
+        end: Last date to download (exclusive, default: today)
+
+    Returns:
+        DataFrame with RAW_COLUMNS, oldest bar first
+    """
+    import yfinance as yf
+    data = yf.download(ticker, start=start, end=end, progress=False)
+    if isinstance(data.columns, pd.MultiIndex):
+        # The ticker level is what the notebook removed by re-reading the CSV without its first row
+        data.columns = data.columns.get_level_values(0)
+    data = data.reset_index()
+    data["Ticker"] = ticker
+    return data[RAW_COLUMNS]
+
+
+def preprocess_data(data):
+    """
+    Add the training features to raw bars and drop the rows where a rolling
+    window is not yet full.
+
+    Args:
+        data: DataFrame in the raw CSV layout
+
+    Returns:
+        DataFrame in the processed CSV layout
+    """
+    data = data.sort_values(by="Date").copy()
+    data["Daily Return"] = data["Close"].pct_change()
+    data["5-Day Moving Avg"] = data["Close"].rolling(window=5).mean()
+    data["10-Day Volatility"] = data["Close"].rolling(window=10).std()
+    return data.dropna()
+
+
+def read_csv(path):
+    # round_trip keeps the float values written by to_csv unchanged on re-read
+    return pd.read_csv(path, parse_dates=["Date"], float_precision='round_trip')
+
+
+def file_hash(path):
+    """Return the SHA-256 of a file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Return the per-ticker file hashes of the last run, or an empty dict."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """Write the manifest atomically."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def last_expected_session(end):
+    """Return the last business day before end, the newest bar a download up to end can return."""
+    return (pd.Timestamp(end).normalize() - pd.offsets.BDay(1)).normalize()
+
+
+def refresh_ticker(ticker, end, entry=None, full=False, raw_dir=RAW_DIR, processed_dir=PROCESSED_DIR,
+                   download=download_and_clean_stock_data):
+    """
+    Bring one ticker's raw and processed CSVs up to date.
+
+    This is a module-level function so it can run in a worker process.
+
+    Args:
+        ticker: Stock ticker symbol
+        end: Download bars before this date
+        entry: The ticker's manifest entry from the previous run, if any
+        full: Rebuild both files from START_DATE
+        raw_dir: Directory of raw CSVs
+        processed_dir: Directory of processed CSVs
+        download: Function (ticker, start, end) returning raw bars
+
+    Returns:
+        Dictionary with the ticker's new manifest entry and what was done
+    """
+    raw_path = os.path.join(raw_dir, f'{ticker}.csv')
+    processed_path = os.path.join(processed_dir, f'{ticker}_processed.csv')
+    raw_hash = file_hash(raw_path)
+    processed_hash = file_hash(processed_path)
+    result = {'ticker': ticker, 'downloaded': 0, 'processed': 0, 'action': 'unchanged'}
+
+    # Both files are as the last run left them and already hold the newest session
+    if not full and entry is not None and entry.get('raw') == raw_hash and entry.get('processed') == processed_hash \
+            and pd.Timestamp(entry['lastDate']) >= last_expected_session(end):
+        result['entry'] = entry
+        return result
+
+    # Raw bars: download only what is newer than the last stored bar
+    raw = None if full or raw_hash is None else read_csv(raw_path)
+    rebuild = full
+    if raw is not None and raw["Date"].iloc[-1] < last_expected_session(end):
+        last_date = raw["Date"].iloc[-1]
+        # The last stored bar comes along to check the adjustment has not changed
+        new = download(ticker, last_date.strftime('%Y-%m-%d'), end)
+        overlap = new[new["Date"] == last_date]
+        new = new[new["Date"] > last_date]
+        stored_close = float(raw["Close"].iloc[-1])
+        if len(new) and not (len(overlap) == 1 and math.isclose(
+                float(overlap["Close"].iloc[0]), stored_close, rel_tol=ADJUSTMENT_TOLERANCE)):
+            logger.info(f"{ticker}: close of {last_date.date()} is now "
+                        f"{overlap['Close'].iloc[0] if len(overlap) else 'missing'} (stored {stored_close}), "
+                        f"prices were re-adjusted; rebuilding from {START_DATE}")
+            raw = None
+            rebuild = True
+        elif len(new):
+            new.to_csv(raw_path, mode='a', header=False, index=False)
+            raw = pd.concat([raw, new], ignore_index=True)
+        new_rows = len(new)
+    else:
+        new_rows = 0
+    if raw is None:
+        raw = download(ticker, START_DATE, end)
+        os.makedirs(raw_dir, exist_ok=True)
+        raw.to_csv(raw_path, index=False)
+        new_rows = len(raw)
+    result['downloaded'] = new_rows
+
+    raw_unchanged = entry is None or entry.get('raw') == raw_hash
+    processed_unchanged = processed_hash is not None and (entry is None or entry.get('processed') == processed_hash)
+
+    if not rebuild and new_rows == 0 and raw_unchanged and processed_unchanged:
+        # Nothing new; a ticker without an entry yet has its existing files adopted
+        result['action'] = 'unchanged' if entry is not None else 'adopted'
+    elif not rebuild and raw_unchanged and processed_unchanged:
+        # Append the features of the new bars, computed over a lookback of raw rows
+        last_processed = read_csv(processed_path)["Date"].iloc[-1]
+        first_new = int((raw["Date"] <= last_processed).sum())
+        window = raw.iloc[max(first_new - LOOKBACK_ROWS, 0):]
+        features = preprocess_data(window)
+        features = features[features["Date"] > last_processed]
+        if len(features):
+            features.to_csv(processed_path, mode='a', header=False, index=False)
+        result['processed'] = len(features)
+        result['action'] = 'appended'
+    else:
+        # No trusted processed file, or new prices: rebuild it from the raw bars
+        processed = preprocess_data(raw)
+        os.makedirs(processed_dir, exist_ok=True)
+        processed.to_csv(processed_path, index=False)
+        result['processed'] = len(processed)
+        result['action'] = 'rebuilt'
+
+    result['entry'] = {
+        'raw': file_hash(raw_path),
+        'processed': file_hash(processed_path),
+        'lastDate': raw["Date"].iloc[-1].strftime('%Y-%m-%d'),
+    }
+    return result
+
+
+def refresh(tickers, end=None, workers=None, full=False, raw_dir=RAW_DIR, processed_dir=PROCESSED_DIR,
+            manifest_path=MANIFEST_PATH, download=download_and_clean_stock_data):
+    """
+    Refresh several tickers in parallel and update the manifest.
+
+    Args:
+        tickers: Ticker symbols to refresh
+        end: Download bars before this date (default: today)
+        workers: Worker processes (default: one per CPU, 1 runs serially)
+        full: Rebuild every file from START_DATE
+
+    Returns:
+        List of per-ticker result dictionaries; failed tickers have an 'error'
+    """
+    end = end or pd.Timestamp.now().strftime('%Y-%m-%d')
+    manifest = load_manifest(manifest_path)
+    workers = min(workers or os.cpu_count() or 1, max(len(tickers), 1))
+    args = [(ticker, end, manifest.get(ticker), full, raw_dir, processed_dir, download) for ticker in tickers]
+
+    outcomes = []
+    if workers == 1:
+        for a in args:
+            try:
+                outcomes.append(refresh_ticker(*a))
+            except Exception as e:
+                outcomes.append(e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(refresh_ticker, *a) for a in args]
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append(e)
+
+    results = []
+    for ticker, outcome in zip(tickers, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Failed to refresh {ticker}: {outcome}")
+            results.append({'ticker': ticker, 'error': str(outcome)})
+            continue
+        manifest[ticker] = outcome.pop('entry')
+        results.append(outcome)
+    save_manifest(manifest, manifest_path)
+    return results
+
+
+def main():
+    """Refresh the training corpus incrementally."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description='Refresh raw_stock_data and processed_stock_data')
+    parser.add_argument('tickers', nargs='*', help='Tickers to refresh (default: every CSV in raw_stock_data, else STOCKS)')
+    parser.add_argument('--end', help='Download bars before this date, YYYY-MM-DD (default: today)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--full', action='store_true', help='Rebuild every file from START_DATE')
+    args = parser.parse_args()
+
+    tickers = [ticker.upper() for ticker in args.tickers]
+    if not tickers:
+        existing = sorted(f[:-4] for f in os.listdir(RAW_DIR) if f.endswith('.csv')) if os.path.isdir(RAW_DIR) else []
+        tickers = existing or STOCKS
+
+    start = time.perf_counter()
+    results = refresh(tickers, args.end, args.workers, args.full)
+    for result in results:
+        if 'error' not in result:
+            logger.info(f"{result['ticker']:<6} {result['action']:<9} downloaded={result['downloaded']} "
+                        f"processed={result['processed']}")
+    failures = sum('error' in result for result in results)
+    logger.info(f"Refreshed {len(results) - failures}/{len(results)} tickers in {time.perf_counter() - start:.2f}s")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()